@@ -0,0 +1,77 @@
+"""Benchmarks the full refresh of the code completion catalog
+
+Compares the queries Refresher.refresh_all used to send one at a time
+(databases, tables, columns, users, functions, SHOW candidates, database
+tables, global and session variables) with the single round trip of
+SqlFetch.catalog(), the rest coming from the static catalog. The server
+and client are the ones of the kernel configuration (mariadb_config.json),
+the server has to be running.
+
+    python benchmarks/completion_refresh.py [rounds] [database]
+
+The median wall time of every refresh is printed. Pass a database with
+many tables to see the difference the catalog size makes.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import statistics
+import sys
+import time
+from unittest.mock import Mock
+
+from mariadb_kernel.client_config import ClientConfig
+from mariadb_kernel.client_factory import create_client
+from mariadb_kernel.code_completion.sql_fetch import SqlFetch
+
+
+def one_query_at_a_time(executor):
+    executor.databases()
+    executor.tables()
+    executor.table_columns()
+    executor.users()
+    executor.functions()
+    executor.show_candidates()
+    executor.database_tables()
+    executor.global_variables()
+    executor.session_variables()
+
+
+def single_round_trip(executor):
+    executor.catalog()
+
+
+def timed(refresh, executor, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        refresh(executor)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(rounds, database):
+    log = Mock()
+    config = ClientConfig(log)
+    client = create_client(log, config)
+    client.start()
+    if database:
+        client.run_statement(f"use {database}")
+    executor = SqlFetch(client, log)
+
+    print(f"client: {config.client_backend()}, database: {executor.dbname or '-'}")
+    print(f"{'refresh':>20} {'seconds':>10}")
+    for name, refresh in (
+        ("one query at a time", one_query_at_a_time),
+        ("single round trip", single_round_trip),
+    ):
+        print(f"{name:>20} {timed(refresh, executor, rounds):>10.3f}")
+    client.stop()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    )
@@ -0,0 +1,82 @@
+"""Benchmarks the rendering of result sets for display
+
+Compares the renderer of the kernel (the client output decoded into a
+ResultSet, rendered by MariaDBKernel._render_result) with the BeautifulSoup
+based renderer it replaced, which set an inline style on every cell. For
+every result size the render time and the size of the HTML sent to the
+notebook are printed.
+
+    python benchmarks/styled_result.py [cells ...]
+
+The default sizes are 10k, 100k and 1M cells (10 columns).
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import sys
+import time
+from unittest.mock import Mock
+
+from bs4 import BeautifulSoup
+
+from mariadb_kernel.client_config import ClientConfig
+from mariadb_kernel.kernel import MariaDBKernel
+from mariadb_kernel.mariadb_native_client import html_table
+from mariadb_kernel.result_set import decode_html
+
+COLUMNS = 10
+
+
+def soup_styled_result(result_html):
+    """The renderer styled_result used before the stylesheet"""
+    soup = BeautifulSoup(result_html, "lxml")
+    cells = soup.find_all(["td", "th"])
+    for cell in cells:
+        cell["style"] = "text-align:left;white-space:pre"
+
+    table = soup.find("table")
+    table["style"] = "margin-left: 0"
+
+    return str(soup)
+
+
+def kernel_renderer():
+    # Only what rendering results needs, no client is started
+    kernel = MariaDBKernel.__new__(MariaDBKernel)
+    kernel.client_config = ClientConfig(Mock(), name="nonexistentcfg.json")
+
+    def render(result_html):
+        [result_set] = decode_html(result_html)
+        return kernel._render_result(result_set)["text/html"]
+
+    return render
+
+
+def timed(render, result):
+    start = time.perf_counter()
+    html = render(result)
+    return time.perf_counter() - start, len(html.encode())
+
+
+def main(sizes):
+    render_result = kernel_renderer()
+    columns = [f"column_{i}" for i in range(COLUMNS)]
+
+    print(f"{'cells':>10} {'renderer':>13} {'seconds':>10} {'bytes':>12}")
+    for cells in sizes:
+        rows = [
+            [f"value {row} {i}" for i in range(COLUMNS)]
+            for row in range(cells // COLUMNS)
+        ]
+        result = html_table(columns, rows)
+        for name, render in (
+            ("beautifulsoup", soup_styled_result),
+            ("kernel", render_result),
+        ):
+            seconds, size = timed(render, result)
+            print(f"{cells:>10} {name:>13} {seconds:>10.3f} {size:>12}")
+
+
+if __name__ == "__main__":
+    main([int(cells) for cells in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
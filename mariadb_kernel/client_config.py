@@ -19,6 +19,10 @@ class ClientConfig:
         if "NB_USER" in os.environ:
             datadir = os.path.join("/home/", os.environ["NB_USER"], "work", ".db")
 
+        cachedir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+
         self.default_config = {
             "user": "root",
             "host": "localhost",
@@ -42,6 +46,59 @@ class ClientConfig:
             ],
             "debug": "False",
             "code_completion": "True",
+            # Where the completion catalog of every server is kept between
+            # kernel starts, an empty string disables the cache
+            "completion_cache_dir": os.path.join(cachedir, "mariadb_kernel"),
+            # Either "repl" (drive the mysql command line client) or
+            # "native" (talk the MariaDB protocol directly through PyMySQL)
+            "client_backend": "repl",
+            # How the mysql command line client prints result sets, either
+            # "html" or "tsv" (tab separated values, cheaper to parse)
+            "result_format": "html",
+            # How results are displayed in the notebook, any of "html",
+            # "text" (fixed-width, for jupyter console and nbconvert) and
+            # "dataresource" (application/vnd.dataresource+json, for
+            # frontends with data grids). Each format is sent along with
+            # every result, so only list the ones the frontend renders
+            "display_formats": ["html"],
+            # Print how long every statement took, how many rows it returned
+            # or changed and the size of its output after its result
+            "show_metrics": "False",
+            # Show the first rows of long running queries while they are
+            # still being received
+            "stream_results": "True",
+            "stream_preview_rows": "50",
+            # Bigger results only get their first and last rows displayed
+            "max_display_rows": "1000",
+            "max_display_bytes": "10000000",
+            # Results with more rows or a bigger output are kept on disk
+            # instead of in memory
+            "spill_rows": "1000",
+            "spill_bytes": "10000000",
+            # Results with more rows can also be paged through by a result
+            # viewer, which fetches the pages through a comm
+            "result_page_size": "100",
+            # How many of the last paginated results can still be browsed
+            "result_cursors": "10",
+            # How many results magic commands can refer to as Out[n], and
+            # how much memory they can take before the least recently used
+            # are moved to disk
+            "result_history": "50",
+            "result_history_bytes": "100000000",
+            # How many times to try reconnecting when the connection to the
+            # server is lost, the session state is restored afterwards
+            "reconnect_attempts": "3",
+            # Seconds between the pings that keep an idle connection from
+            # being closed by the server (wait_timeout), 0 disables them
+            "keepalive_interval": "300",
+            # Client connections shared by code completion, introspection
+            # and magic commands, and how many each of them can hold
+            "pool_size": "4",
+            "pool_quotas": {
+                "completion": "2",
+                "introspection": "1",
+                "magics": "1",
+            },
         }
 
         self._load_config()
@@ -105,6 +162,21 @@ class ClientConfig:
         params += "--disable-progress-reports"
         return params
 
+    def get_connection_args(self):
+        params = {
+            "user": self.default_config["user"],
+            "password": self.default_config["password"],
+            "database": self.default_config["database"],
+        }
+        # Same rule as the command line client: when connecting to localhost
+        # the unix socket is used, otherwise TCP/IP
+        if self.default_config["host"] == "localhost" and self.default_config["socket"]:
+            params["unix_socket"] = self.default_config["socket"]
+        else:
+            params["host"] = self.default_config["host"]
+            params["port"] = int(self.default_config["port"])
+        return params
+
     def get_server_args(self):
         params = []
         params.extend(self.default_config["extra_server_config"])
@@ -151,5 +223,62 @@ class ClientConfig:
     def autocompletion_enabled(self):
         return self.default_config["code_completion"] == "True"
 
+    def completion_cache_dir(self):
+        return self.default_config["completion_cache_dir"]
+
     def server_name(self):
         return self.default_config["server_name"]
+
+    def client_backend(self):
+        return self.default_config["client_backend"]
+
+    def result_format(self):
+        return self.default_config["result_format"]
+
+    def display_formats(self):
+        return self.default_config["display_formats"]
+
+    def show_metrics(self):
+        return self.default_config["show_metrics"] == "True"
+
+    def stream_results(self):
+        return self.default_config["stream_results"] == "True"
+
+    def stream_preview_rows(self):
+        return int(self.default_config["stream_preview_rows"])
+
+    def spill_rows(self):
+        return int(self.default_config["spill_rows"])
+
+    def spill_bytes(self):
+        return int(self.default_config["spill_bytes"])
+
+    def max_display_rows(self):
+        return int(self.default_config["max_display_rows"])
+
+    def max_display_bytes(self):
+        return int(self.default_config["max_display_bytes"])
+
+    def result_page_size(self):
+        return int(self.default_config["result_page_size"])
+
+    def result_cursors(self):
+        return int(self.default_config["result_cursors"])
+
+    def result_history(self):
+        return int(self.default_config["result_history"])
+
+    def result_history_bytes(self):
+        return int(self.default_config["result_history_bytes"])
+
+    def reconnect_attempts(self):
+        return int(self.default_config["reconnect_attempts"])
+
+    def keepalive_interval(self):
+        return int(self.default_config["keepalive_interval"])
+
+    def pool_size(self):
+        return int(self.default_config["pool_size"])
+
+    def pool_quotas(self):
+        return self.default_config["pool_quotas"]
@@ -0,0 +1,27 @@
+"""Creates the MariaDB client selected through the kernel config"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+from mariadb_kernel.mariadb_client import MariaDBClient
+from mariadb_kernel.mariadb_native_client import MariaDBNativeClient
+
+
+def get():
+    return {
+        "repl": MariaDBClient,
+        "native": MariaDBNativeClient,
+    }
+
+
+def create_client(log, config):
+    backends = get()
+    backend = config.client_backend()
+    if backend not in backends:
+        log.error(
+            f"Unknown client_backend {backend}, "
+            f"supported backends are: {', '.join(backends)}"
+        )
+        backend = "repl"
+
+    return backends[backend](log, config)
@@ -1,26 +1,98 @@
+import copy
 from logging import Logger
 import threading
+import time
 from typing import Callable, List
 from mycli.packages.special.main import COMMANDS
 from .sql_analyze import SQLAnalyze
 from .sql_fetch import SqlFetch
+from . import catalog_cache, schema_fingerprint, statement_kind
 from mariadb_kernel.mariadb_client import MariaDBClient
 from mariadb_kernel.client_config import ClientConfig
+from mariadb_kernel.connection_pool import ConnectionPool, PooledClient
 from prompt_toolkit.document import Document
 from threading import Thread, Event
 
+# The fingerprints telling whether the slices refreshed after a statement
+# changed at all
+_FINGERPRINTED_SLICES = {
+    statement_kind.DATABASES: {
+        schema_fingerprint.DATABASES,
+        schema_fingerprint.DATABASE_TABLES,
+    },
+    statement_kind.TABLES: {
+        schema_fingerprint.TABLES,
+        schema_fingerprint.DATABASE_TABLES,
+    },
+    statement_kind.FUNCTIONS: {schema_fingerprint.FUNCTIONS},
+}
+
+# Seconds between two fingerprints after cells that can't change the
+# catalog, the changes of other sessions are only caught then
+_FINGERPRINT_INTERVAL = 10
+
 
 class Refresher(object):
-    def __init__(self, executor: SqlFetch, log: Logger) -> None:
+    def __init__(
+        self,
+        executor: SqlFetch,
+        log: Logger,
+        cache: catalog_cache.CatalogCache = None,
+        static: catalog_cache.StaticCatalog = None,
+    ) -> None:
         self.executor = executor
-        self.fetch_keywords = self.executor.keywords()
-        self.fetch_functions = self.executor.sql_functions()
         self.log = log
+        self.cache = cache
+        self.static = static
+        self.fetch_keywords = self.static_data("keywords", self.executor.keywords)
+        self.fetch_functions = self.static_data(
+            "functions", self.executor.sql_functions
+        )
+        catalog = cache.load() if cache else None
 
         self.completer = None
         self.refresh_thread = None
         self.stop_condition = Event()
 
+        # Whether self.completer holds the whole catalog, it doesn't after a
+        # full refresh was stopped
+        self.complete = False
+        # The slices and tables left to refresh, they are kept when a refresh
+        # is stopped to be picked up by the next one
+        self.pending_slices = set()
+        self.pending_tables = []
+        # When the catalog was last checked against the server
+        self.checked_at = None
+
+        if catalog is not None:
+            self.load_catalog(catalog)
+
+    def load_catalog(self, catalog):
+        """Starts from a saved catalog, refresh() revalidates it"""
+        self.completer = SQLAnalyze(self.log, True)
+        self.refresh_special()
+        catalog_cache.restore(self.completer, catalog)
+        self.completer.set_keywords(self.fetch_keywords)
+        self.completer.set_functions(self.fetch_functions)
+        self.complete = True
+        # Users aren't fingerprinted, the variables come from the static
+        # catalog
+        self.pending_slices = {statement_kind.USERS}
+        if self.completer.dbname != self.executor.dbname:
+            self.pending_slices.add(statement_kind.CURRENT_DATABASE)
+
+    def save_catalog(self):
+        if self.cache:
+            self.cache.save(catalog_cache.dump(self.completer))
+
+    def static_data(self, name, fetch, refetch=False):
+        """What fetch returns, from the static catalog when there is one"""
+        if not self.static:
+            return fetch()
+        if refetch:
+            return self.static.refetch(name, fetch)
+        return self.static.get(name, fetch)
+
     def stop_and_wait(self):
         # No previous refresh sequence was executed
         if not self.refresh_thread:
@@ -30,7 +102,8 @@ class Refresher(object):
         self.stop_condition.clear()
 
     def wait_for_results(self):
-        self.refresh_thread.join()
+        if self.refresh_thread:
+            self.refresh_thread.join()
         return self.completer
 
     def refresh_databases(self):
@@ -56,26 +129,202 @@ class Refresher(object):
         self.completer.extend_special_commands(COMMANDS.keys())
 
     def refresh_show_commands(self):
-        self.completer.extend_show_items(self.executor.show_candidates())
+        self.completer.extend_show_items(
+            self.static_data("show_candidates", self.executor.show_candidates)
+        )
 
     def refresh_database_tables(self):
         self.completer.extend_tables(self.executor.database_tables())
 
-    def refresh_variables(self):
-        self.completer.extend_global_variables(self.executor.global_variables())
-        self.completer.extend_session_variables(self.executor.session_variables())
+    def refresh_variables(self, refetch=False):
+        self.completer.extend_global_variables(
+            self.static_data(
+                "global_variables", self.executor.global_variables, refetch
+            )
+        )
+        self.completer.extend_session_variables(
+            self.static_data(
+                "session_variables", self.executor.session_variables, refetch
+            )
+        )
+
+    def refresh_catalog(self):
+        # databases, schemata, tables, users, functions and database tables
+        # from a single round trip
+        catalog = self.executor.catalog()
+        self.completer.extend_database_names(catalog["databases"])
+        self.refresh_schemata()
+        self.completer.extend_relations(catalog["tables"], kind="tables")
+        self.completer.extend_columns(catalog["columns"], kind="tables")
+        self.completer.extend_users(catalog["users"])
+        self.completer.extend_functions(catalog["functions"])
+        self.completer.extend_tables(catalog["database_tables"])
+
+    def refresh_database_names(self):
+        self.completer.databases = []
+        self.refresh_databases()
+        # The tables of the dropped databases are gone too
+        databases = {name.lower() for name in self.completer.databases}
+        self.completer.database_tables = [
+            (database, table)
+            for database, table in self.completer.database_tables
+            if database in databases
+        ]
+
+    def refresh_current_database(self):
+        self.refresh_schemata()
+        self.refresh_tables()
+        self.refresh_functions()
+
+    def refresh_changed_tables(self):
+        completer = self.completer
+        tables = [
+            (database or self.executor.dbname, table)
+            for database, table in self.pending_tables
+        ]
+        tables = [(database, table) for database, table in tables if database]
+        columns = self.executor.columns_of(tables)
+
+        # The tables are dropped from the catalog and added back with their
+        # columns if they still exist
+        changed = {(database.lower(), table.lower()) for database, table in tables}
+        completer.database_tables = [
+            pair for pair in completer.database_tables if pair not in changed
+        ]
+        relations = completer.dbmetadata["tables"].get(completer.dbname)
+        if relations is not None:
+            for name in list(relations):
+                if (completer.dbname.lower(), name.lower()) in changed:
+                    del relations[name]
+
+        for database, table, column in columns:
+            pair = (database.lower(), table.lower())
+            if pair in changed:
+                completer.extend_tables([pair])
+                changed.discard(pair)
+            if relations is not None and database == completer.dbname:
+                if table not in relations:
+                    completer.extend_relations([(table,)], kind="tables")
+                completer.extend_columns([(table, column)], kind="tables")
+
+    def refresh_current_tables(self):
+        tables = self.completer.dbmetadata["tables"]
+        if self.completer.dbname in tables:
+            tables[self.completer.dbname] = {}
+        self.refresh_tables()
+
+    def refresh_all_database_tables(self):
+        self.completer.database_tables = []
+        self.refresh_database_tables()
+
+    def refresh_current_functions(self):
+        functions = self.completer.dbmetadata["functions"]
+        if self.completer.dbname in functions:
+            functions[self.completer.dbname] = {}
+        self.refresh_functions()
+
+    def refresh_user_names(self):
+        self.completer.users = []
+        self.refresh_users()
+
+    def refresh_variable_names(self):
+        self.completer.global_variable = []
+        self.completer.session_variable = []
+        # Only refreshed after INSTALL PLUGIN and such, which add variables.
+        # The files of the previous plugins stay for the servers still
+        # running them.
+        if self.static:
+            try:
+                self.static.plugins_changed(self.executor.plugins())
+            except Exception as e:
+                # Not written to disk, the file of other servers is kept
+                self.log.info(f"Plugins unknown, not caching the variables: {e}")
+                self.static = None
+        self.refresh_variables(refetch=True)
+
+    def _copy_completer(self):
+        """A copy of the catalog that can be changed while the current one is
+        used by the introspection"""
+        completer = copy.copy(self.completer)
+        completer.dbmetadata = {
+            kind: {schema: dict(relations) for schema, relations in schemas.items()}
+            for kind, schemas in completer.dbmetadata.items()
+        }
+        completer.database_tables = list(completer.database_tables)
+        completer.all_completions = set(completer.all_completions)
+        return completer
+
+    def fetch_fingerprint(self):
+        self.checked_at = time.monotonic()
+        try:
+            return self.executor.schema_fingerprint()
+        except Exception as e:
+            # The whole slices changed by the statements get refreshed
+            self.log.info(f"Schema fingerprint failed, not checking it: {e}")
+            return None
+
+    def _slice_done(self, name):
+        self.pending_slices.discard(name)
+        if name == statement_kind.TABLES:
+            self.pending_tables = []
+
+    def refresh_pending(self):
+        self.completer = self._copy_completer()
+        fingerprint = self.fetch_fingerprint()
+        if fingerprint is not None:
+            # What the statements should have changed didn't, e.g. they failed
+            stale = schema_fingerprint.stale(fingerprint, self.completer)
+            for name, fingerprints in _FINGERPRINTED_SLICES.items():
+                if not stale & fingerprints:
+                    self._slice_done(name)
+
+        refresh_func_list = [
+            (statement_kind.CURRENT_DATABASE, self.refresh_current_database),
+            (statement_kind.DATABASES, self.refresh_database_names),
+            (statement_kind.TABLES, self.refresh_changed_tables),
+            (statement_kind.FUNCTIONS, self.refresh_current_functions),
+            (statement_kind.USERS, self.refresh_user_names),
+            (statement_kind.VARIABLES, self.refresh_variable_names),
+        ]
+        refreshed = False
+        for name, refresh_func in refresh_func_list:
+            if name not in self.pending_slices:
+                continue
+            if self.stop_condition.is_set():
+                return
+            refresh_func()
+            self._slice_done(name)
+            refreshed = True
+
+        if fingerprint is not None:
+            refreshed |= self.refresh_stale(fingerprint)
+        if refreshed and not self.stop_condition.is_set():
+            self.save_catalog()
+
+    def refresh_stale(self, fingerprint):
+        # What is still stale was changed by other sessions
+        stale_refresh_funcs = {
+            schema_fingerprint.DATABASES: self.refresh_database_names,
+            schema_fingerprint.DATABASE_TABLES: self.refresh_all_database_tables,
+            schema_fingerprint.TABLES: self.refresh_current_tables,
+            schema_fingerprint.FUNCTIONS: self.refresh_current_functions,
+        }
+        stale = schema_fingerprint.stale(fingerprint, self.completer)
+        for name in sorted(stale):
+            if self.stop_condition.is_set():
+                break
+            stale_refresh_funcs[name]()
+        return bool(stale)
 
     def refresh_all(self):
+        self.complete = False
+        self.pending_slices = set()
+        self.pending_tables = []
         self.completer = SQLAnalyze(self.log, True)
         refresh_func_list: List[Callable] = [
-            self.refresh_databases,
-            self.refresh_schemata,
-            self.refresh_tables,
-            self.refresh_users,
-            self.refresh_functions,
+            self.refresh_catalog,
             self.refresh_special,
             self.refresh_show_commands,
-            self.refresh_database_tables,
             self.refresh_variables,
         ]
         for refresh_func in refresh_func_list:
@@ -85,9 +334,35 @@ class Refresher(object):
 
         self.completer.set_keywords(self.fetch_keywords)
         self.completer.set_functions(self.fetch_functions)
+        self.complete = True
+        self.checked_at = time.monotonic()
+        self.save_catalog()
+
+    def _checked_recently(self):
+        return (
+            self.checked_at is not None
+            and time.monotonic() - self.checked_at < _FINGERPRINT_INTERVAL
+        )
 
-    def refresh(self):
-        self.refresh_thread = Thread(target=self.refresh_all)
+    def refresh(self, slices=None, tables=()):
+        """Refreshes the given slices of the catalog, all of it by default
+
+        :param slices: slices from statement_kind
+        :param tables: (database, table) pairs changed, for the TABLES slice
+        """
+        if slices is None or statement_kind.ALL in slices or not self.complete:
+            target = self.refresh_all
+        else:
+            self.pending_slices.update(slices)
+            for table in tables:
+                if table not in self.pending_tables:
+                    self.pending_tables.append(table)
+            # Statements that can't change the schema only check it for the
+            # changes of other sessions, at most every few seconds
+            if not self.pending_slices and self._checked_recently():
+                return
+            target = self.refresh_pending
+        self.refresh_thread = Thread(target=target)
         self.refresh_thread.start()
 
 
@@ -97,38 +372,90 @@ class Autocompleter(object):
         mariadb_client: MariaDBClient,
         config: ClientConfig,
         log: Logger,
+        pool: ConnectionPool = None,
     ) -> None:
         self.log = log
 
         self.completer = SQLAnalyze(log, True)
 
+        # The kernel shares its pool, a standalone autocompleter has its own
+        self.own_pool = pool is None
+        if self.own_pool:
+            pool = ConnectionPool(log, config)
+        self.pool = pool
+
         # A client connection is already established, so things shouldn't go wrong here
         # But in case the unexpected happens, there's nothing we can do here, exception
         # needs to be propagated upwards
-        self.log.info("Starting a client connection used in code completion")
-        self.completion_mariadb_client = MariaDBClient(log, config)
-        self.completion_mariadb_client.start()
-
+        self.completion_mariadb_client = PooledClient(pool, "completion")
         self.executor = SqlFetch(self.completion_mariadb_client, log)
+        # Introspection runs while the refresher may be busy, with clients
+        # of its own
+        self.introspection_executor = SqlFetch(
+            PooledClient(pool, "introspection", self.completion_mariadb_client.session),
+            log,
+        )
         self.code_block_executor = SqlFetch(mariadb_client, log)
 
-        self.refresher = Refresher(self.executor, log)
+        self.refresher = Refresher(self.executor, log, *self._catalog_caches(config))
 
-        self.refresh()
+        if self.refresher.complete:
+            # The catalog was loaded from the cache, it is only revalidated
+            self._refresh({statement_kind.CURRENT_DATABASE}, [])
+        else:
+            self.refresh()
+
+    def _catalog_caches(self, config: ClientConfig):
+        directory = config.completion_cache_dir()
+        if not directory:
+            return None, None
+        try:
+            identity = self.executor.server_identity()
+        except Exception as e:
+            self.log.info(f"Completion cache disabled, unknown server: {e}")
+            return None, None
+        version = {
+            "version": identity["version"],
+            "version_comment": identity["version_comment"],
+            "plugins": identity["plugins"],
+        }
+        return (
+            catalog_cache.CatalogCache(self.log, directory, identity),
+            catalog_cache.StaticCatalog(self.log, directory, version),
+        )
 
-    def refresh(self):
-        code_block_db_name = self.code_block_executor.get_db_name()
-        if self.executor.dbname != code_block_db_name and code_block_db_name != "":
-            self.completion_mariadb_client.run_statement(
-                f"use {code_block_db_name}"
-            )  # TODO: to be replaced with SQLFetch functionality
-            self.executor.dbname = code_block_db_name
+    def refresh(self, statements=None):
+        """Refreshes the catalog after the statements ran, all of it when they
+        aren't given"""
+        slices = {statement_kind.ALL}
+        tables = []
+        if statements is not None:
+            slices, tables = statement_kind.affected(statements)
+        self._refresh(slices, tables)
+
+    def _refresh(self, slices, tables):
+
+        # Only USE and dropping the current database change it
+        if slices & {
+            statement_kind.ALL,
+            statement_kind.CURRENT_DATABASE,
+            statement_kind.DATABASES,
+        }:
+            slices.discard(statement_kind.CURRENT_DATABASE)
+            code_block_db_name = self.code_block_executor.get_db_name()
+            if self.executor.dbname != code_block_db_name:
+                if code_block_db_name != "":
+                    self.completion_mariadb_client.run_statement(
+                        f"use {code_block_db_name}"
+                    )  # TODO: to be replaced with SQLFetch functionality
+                self.executor.dbname = code_block_db_name
+                slices.add(statement_kind.CURRENT_DATABASE)
 
         # Stop any previous refresh operation and wait for child thread to die
         self.refresher.stop_and_wait()
 
         # Dispatch refresh sequence again
-        self.refresher.refresh()
+        self.refresher.refresh(slices, tables)
 
     # Sync with refresher to get an up-to-date SQLAnalyze object
     def sync_data(self):
@@ -147,5 +474,7 @@ class Autocompleter(object):
         return list(result)
 
     def shutdown(self):
-        self.log.info("Shutting down code completion client connection")
-        self.completion_mariadb_client.stop()
+        self.refresher.stop_and_wait()
+        if self.own_pool:
+            self.log.info("Shutting down code completion client connections")
+            self.pool.close()
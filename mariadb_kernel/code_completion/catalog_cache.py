@@ -0,0 +1,145 @@
+"""Keeps the completion catalog on disk between kernel starts
+
+Loading the whole catalog takes a dozen queries, some of them slow on
+servers with many tables. The catalog is saved after it is refreshed, in
+a gzipped JSON file per server and user, and loaded back when a kernel
+starts: completions work right away, while the catalog is revalidated in
+the background (see schema_fingerprint).
+
+The file name is a hash of the host name, port and version of the server
+and of the user, the catalog of one server is never used for another.
+
+The keywords, functions, SHOW commands and variable names only change
+with the version of the server and its plugins. StaticCatalog keeps them
+apart, in files shared by all the servers of the same version with the
+same active plugins, read only when needed.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+# Changes whenever the content of the files changes
+FORMAT = 2
+
+# The attributes of SQLAnalyze holding the catalog, as in reset_completions
+_CATALOG = [
+    "databases",
+    "database_tables",
+    "global_variable",
+    "session_variable",
+    "users",
+    "show_items",
+    "dbname",
+    "dbmetadata",
+    "all_completions",
+]
+
+
+def dump(completer):
+    """The catalog held by a SQLAnalyze object, ready to be saved"""
+    catalog = {name: getattr(completer, name) for name in _CATALOG}
+    catalog["all_completions"] = sorted(
+        str(word) for word in catalog["all_completions"]
+    )
+    return catalog
+
+
+def restore(completer, catalog):
+    """Sets the catalog of a SQLAnalyze object from a loaded one"""
+    for name in _CATALOG:
+        setattr(completer, name, catalog[name])
+    completer.database_tables = [tuple(pair) for pair in completer.database_tables]
+    completer.all_completions = set(completer.all_completions)
+
+
+class CatalogCache:
+    def __init__(self, log, directory, identity, prefix="catalog"):
+        self.log = log
+        key = json.dumps(identity, sort_keys=True, default=str)
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        self.path = os.path.join(directory, f"{prefix}-{name}.json.gz")
+        self.prefix = prefix
+        self.identity = identity
+
+    def load(self):
+        """The saved catalog, None when there is none or it can't be used"""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as file:
+                content = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.log.info(f"Ignoring the completion cache {self.path}: {e}")
+            return None
+        # A hash collision or a file written by another version
+        if content.get("format") != FORMAT or content.get("identity") != self.identity:
+            return None
+        return content["catalog"]
+
+    def save(self, catalog):
+        content = {"format": FORMAT, "identity": self.identity, "catalog": catalog}
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Written aside and renamed, other kernels only ever see a
+            # complete file
+            fd, temp_path = tempfile.mkstemp(prefix=f"{self.prefix}-", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.open(
+                    raw, "wt", encoding="utf-8"
+                ) as file:
+                    json.dump(content, file, default=str)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            self.log.info(f"Couldn't save the completion cache {self.path}: {e}")
+
+
+class StaticCatalog:
+    """The parts of the catalog that only change with the server version"""
+
+    def __init__(self, log, directory, version):
+        self.log = log
+        self.directory = directory
+        # @@version, @@version_comment and the fingerprint of the plugins
+        self.version = version
+        self.items = {}
+
+    def plugins_changed(self, plugins):
+        """Switches to the files of the server with the plugins now active"""
+        if plugins != self.version.get("plugins"):
+            self.version = {**self.version, "plugins": plugins}
+            self.items = {}
+
+    def _file(self, name):
+        return CatalogCache(
+            self.log, self.directory, {**self.version, "item": name}, prefix="static"
+        )
+
+    def get(self, name, fetch):
+        """The item from memory or disk, fetched from the server the first
+        time a server of this version is seen"""
+        if name not in self.items:
+            data = self._file(name).load()
+            if data is None:
+                return self.refetch(name, fetch)
+            self.items[name] = data
+        return self.items[name]
+
+    def refetch(self, name, fetch):
+        """Fetches the item again, e.g. after a plugin added variables"""
+        data = fetch()
+        self.items[name] = data
+        # Nothing may also mean the query failed, it is tried again by the
+        # next kernel
+        if data:
+            self._file(name).save(data)
+        return data
@@ -231,10 +231,8 @@ class Introspector:
                     database_table_dict = completer.dbmetadata["tables"].get(database)
                     if database_table_dict is None:
                         # fetch the table's column
-                        column_list = (
-                            autocompleter.executor.get_specific_table_columns_list(
-                                table, database
-                            )
+                        column_list = autocompleter.introspection_executor.get_specific_table_columns_list(
+                            table, database
                         )
                         if word.lower() in [column.lower() for column in column_list]:
                             return {
@@ -285,7 +283,7 @@ class Introspector:
                 if word:
                     if word == "user":
                         # would show all user list
-                        users = autocompleter.executor.users(html=True)
+                        users = autocompleter.introspection_executor.users(html=True)
                         df = re.sub(
                             " +",
                             "",
@@ -299,7 +297,9 @@ class Introspector:
                 return "", ""
             elif word_type == "function":
                 if word:
-                    plain_help = autocompleter.executor.get_help_text(word)
+                    plain_help = autocompleter.introspection_executor.get_help_text(
+                        word
+                    )
                     # convert text to html and beautify plain_help
                     html = convert_help_text_to_beautiful_html(plain_help)
                     return (
@@ -309,7 +309,9 @@ class Introspector:
                 return f"{self.render_doc_header('function')}", ""
             elif word_type == "database":
                 if word:
-                    tables_html = autocompleter.executor.get_tables_in_db_html(word)
+                    tables_html = (
+                        autocompleter.introspection_executor.get_tables_in_db_html(word)
+                    )
 
                     try:
                         df = re.sub(
@@ -332,12 +334,16 @@ class Introspector:
             elif word_type == "table":
                 db_name = result.get("database")
                 if word and db_name:
-                    table_html = autocompleter.executor.get_table_schema_html(
-                        word, db_name
+                    table_html = (
+                        autocompleter.introspection_executor.get_table_schema_html(
+                            word, db_name
+                        )
                     )
                     limit_num = 5
-                    table_rows_html = autocompleter.executor.get_partial_table_row_html(
-                        word, db_name, limit_num
+                    table_rows_html = (
+                        autocompleter.introspection_executor.get_partial_table_row_html(
+                            word, db_name, limit_num
+                        )
                     )
 
                     plain_mime = (
@@ -358,12 +364,16 @@ class Introspector:
                 table_name = result.get("table")
                 db_name = result.get("database")
                 if word and db_name and table_name:
-                    column_html = autocompleter.executor.get_column_type_html(
-                        word, table_name, db_name
+                    column_html = (
+                        autocompleter.introspection_executor.get_column_type_html(
+                            word, table_name, db_name
+                        )
                     )
                     limit_num = 5
-                    column_rows_html = autocompleter.executor.get_column_row_html(
-                        word, table_name, db_name, limit_num
+                    column_rows_html = (
+                        autocompleter.introspection_executor.get_column_row_html(
+                            word, table_name, db_name, limit_num
+                        )
                     )
 
                     try:
@@ -411,7 +421,7 @@ class Introspector:
                     and value_index != None
                     and table_name != None
                 ):
-                    result = autocompleter.executor.get_column_type_list(
+                    result = autocompleter.introspection_executor.get_column_type_list(
                         table_name, autocompleter.completer.dbname
                     )
                     if hint == "":
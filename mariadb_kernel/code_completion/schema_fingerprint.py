@@ -0,0 +1,75 @@
+"""Cheap checks of whether the completion catalog is still up to date
+
+Statements classified by statement_kind only tell what the cells of the
+notebook changed, DDL can also come from other sessions. A single query
+computes, for every slice of the catalog, the number of names in it and
+the sum of their CRC32. The same fingerprint is computed from the catalog
+already loaded: the slices whose fingerprints differ are the only ones
+that need to be loaded again. After cells with statements that can't
+change the catalog, the query runs at most every few seconds, to catch the
+changes of other sessions.
+
+Only names are part of the fingerprints, e.g. changing the type of a
+column doesn't make the catalog stale.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import zlib
+
+DATABASES = "databases"
+# The tables of all the databases, for completing db.table
+DATABASE_TABLES = "database_tables"
+# The tables and columns of the current database
+TABLES = "tables"
+# The functions of the current database
+FUNCTIONS = "functions"
+
+
+def _aggregate(expression):
+    return f"CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32({expression})), 0))"
+
+
+QUERY = f"""SELECT
+    (SELECT {_aggregate("SCHEMA_NAME")}
+     FROM information_schema.SCHEMATA) AS `{DATABASES}`,
+    (SELECT {_aggregate("CONCAT(LOWER(TABLE_SCHEMA), '.', LOWER(TABLE_NAME))")}
+     FROM information_schema.TABLES) AS `{DATABASE_TABLES}`,
+    (SELECT {_aggregate("CONCAT(TABLE_NAME, '.', COLUMN_NAME)")}
+     FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE()) AS `{TABLES}`,
+    (SELECT {_aggregate("LOWER(ROUTINE_NAME)")}
+     FROM information_schema.ROUTINES
+     WHERE ROUTINE_TYPE = 'FUNCTION' AND ROUTINE_SCHEMA = DATABASE()) AS `{FUNCTIONS}`;"""
+
+
+def _fingerprint(names):
+    names = [str(name) for name in names]
+    checksum = sum(zlib.crc32(name.encode("utf-8")) for name in names)
+    return f"{len(names)}:{checksum}"
+
+
+def local(completer):
+    """The fingerprints of the catalog held by a SQLAnalyze object"""
+    relations = completer.dbmetadata["tables"].get(completer.dbname, {})
+    functions = completer.dbmetadata["functions"].get(completer.dbname, {})
+    return {
+        DATABASES: _fingerprint(completer.databases),
+        DATABASE_TABLES: _fingerprint(
+            f"{database}.{table}" for database, table in completer.database_tables
+        ),
+        # The columns come after the "*" every table starts with
+        TABLES: _fingerprint(
+            f"{table}.{column}"
+            for table, columns in relations.items()
+            for column in columns[1:]
+        ),
+        FUNCTIONS: _fingerprint(functions),
+    }
+
+
+def stale(server, completer):
+    """The slices whose fingerprints on the server differ from the catalog"""
+    catalog = local(completer)
+    return {name for name, value in server.items() if catalog.get(name) != value}
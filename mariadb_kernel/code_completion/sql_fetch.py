@@ -2,10 +2,20 @@ from collections import namedtuple
 import enum
 from typing import Callable, List, NamedTuple, Tuple
 import pandas
+from pymysql.converters import escape_string
 from pandas.core.frame import DataFrame
 from mariadb_kernel.mariadb_client import MariaDBClient
+from . import schema_fingerprint
 import logging
-import math
+
+
+# Name of the column of the rows starting every section of catalog()
+CATALOG_SECTION = "mariadb_kernel_catalog_section"
+
+# A fingerprint of the active plugins, which bring variables and functions
+# of their own
+_PLUGINS = """(SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(PLUGIN_NAME)), 0))
+               FROM information_schema.PLUGINS WHERE PLUGIN_STATUS = 'ACTIVE')"""
 
 
 class SqlFetch:
@@ -30,10 +40,10 @@ class SqlFetch:
             elif html:
                 rv = result_html
             else:
-                df = pandas.read_html(result_html)
+                df = self.mariadb_client.result_frames(result_html)
                 rv = function(df)
         except Exception:
-            self.log.error(f"Pandas failed to parse html : {result_html}")
+            self.log.error(f"Pandas failed to parse result : {result_html}")
             raise
         return rv
 
@@ -115,7 +125,7 @@ class SqlFetch:
         try:
             if result_html == "Query OK":
                 return []
-            df = pandas.read_html(result_html)
+            df = self.mariadb_client.result_frames(result_html)
             table_name_list = list(df[0]["TABLE_NAME"].values)
             column_name_list = list(df[0]["COLUMN_NAME"].values)
             table_column_list = [
@@ -123,10 +133,131 @@ class SqlFetch:
                 for i, _ in enumerate(table_name_list)
             ]
         except Exception:
-            self.log.error(f"Pandas failed to parse html : {result_html}")
+            self.log.error(f"Pandas failed to parse result : {result_html}")
             raise
         return table_column_list
 
+    def columns_of(self, tables: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+        """Yields (database name, table name, column name) of the given tables
+
+        The tables that don't exist have no rows
+        """
+        if not tables:
+            return []
+        pairs = ", ".join(
+            f"('{escape_string(database)}', '{escape_string(table)}')"
+            for database, table in tables
+        )
+        columns_query = f"""SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME
+                            FROM information_schema.columns
+                            WHERE (TABLE_SCHEMA, TABLE_NAME) IN ({pairs})
+                            ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION;"""
+        return self.fetch_info(
+            columns_query,
+            lambda df: [
+                (str(database), str(table), str(column))
+                for database, table, column in zip(
+                    df[0]["TABLE_SCHEMA"], df[0]["TABLE_NAME"], df[0]["COLUMN_NAME"]
+                )
+            ],
+        )
+
+    def _catalog_sections(self):
+        sections = [("databases", "SHOW DATABASES")]
+        if self.dbname != "":
+            dbname = escape_string(self.dbname)
+            sections += [
+                ("tables", "SHOW TABLES"),
+                (
+                    "columns",
+                    f"""SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.columns
+                        WHERE table_schema = '{dbname}'
+                        ORDER BY table_name, ordinal_position""",
+                ),
+                (
+                    "functions",
+                    f"""SELECT lower(ROUTINE_NAME) FROM INFORMATION_SCHEMA.ROUTINES
+                        WHERE ROUTINE_TYPE = "FUNCTION"
+                        AND ROUTINE_SCHEMA = '{dbname}'""",
+                ),
+            ]
+        sections += [
+            (
+                "database_tables",
+                """SELECT lower(TABLE_SCHEMA), lower(TABLE_NAME)
+                   FROM information_schema.TABLES""",
+            ),
+            (
+                "users",
+                """SELECT CONCAT("'", user, "'@'", host, "'") AS All_Users
+                   FROM mysql.user""",
+            ),
+        ]
+        return sections
+
+    def catalog(self):
+        """Fetches the dynamic parts of the completion catalog in one go
+
+        The queries of databases(), tables(), table_columns(), functions(),
+        database_tables() and users() are sent to the client together, every
+        one of them after a row naming its section: the sections are found
+        again in the output, even the ones without rows, and decoded in a
+        single pass. Returns a dict of section name to the list of rows,
+        shaped like what the methods above return.
+        """
+        sections = self._catalog_sections()
+        script = "\n".join(
+            f"SELECT '{name}' AS `{CATALOG_SECTION}`;\n{query};"
+            for name, query in sections
+        )
+        output = self.mariadb_client.run_statement(script)
+        if self.mariadb_client.iserror():
+            raise Exception(f"Client returned an error : {output}")
+
+        rows = {name: [] for name, _ in sections}
+        section = None
+        for result_set in self.mariadb_client.decode(output):
+            values = result_set.values
+            if [column.name for column in result_set.columns] == [CATALOG_SECTION]:
+                section = values.iloc[0, 0]
+                continue
+            if section in rows:
+                rows[section] = list(values.itertuples(index=False, name=None))
+
+        return {
+            "databases": [name for name, in rows["databases"]],
+            "tables": rows.get("tables", []),
+            "columns": rows.get("columns", []),
+            "functions": rows.get("functions", []),
+            "database_tables": rows["database_tables"],
+            "users": rows["users"],
+        }
+
+    def server_identity(self):
+        """What tells the server and the user apart from any other"""
+        identity_query = f"""SELECT @@hostname AS host, @@port AS port,
+                                    @@datadir AS datadir, @@version AS version,
+                                    @@version_comment AS version_comment,
+                                    {_PLUGINS} AS plugins,
+                                    CURRENT_USER() AS user;"""
+        return self.fetch_info(
+            identity_query,
+            lambda df: {name: str(df[0][name].values[0]) for name in df[0].columns},
+        )
+
+    def plugins(self) -> str:
+        """The fingerprint of the active plugins"""
+        return self.fetch_info(
+            f"SELECT {_PLUGINS} AS plugins;", lambda df: str(df[0]["plugins"].values[0])
+        )
+
+    def schema_fingerprint(self):
+        """The fingerprints of the slices of the catalog, see schema_fingerprint"""
+        return self.fetch_info(
+            schema_fingerprint.QUERY,
+            lambda df: {name: str(df[0][name].values[0]) for name in df[0].columns},
+        )
+
     def keywords(self) -> List[str]:
         # need consider no information_schema.keywords table
         fetch_keywords_query = "select lower(word) from information_schema.keywords;"
@@ -168,7 +299,7 @@ class SqlFetch:
         try:
             if result_html == "Query OK":
                 return []
-            df = pandas.read_html(result_html)
+            df = self.mariadb_client.result_frames(result_html)
             database_name_list = list(df[0]["lower(TABLE_SCHEMA)"].values)
             table_name_list = list(df[0]["lower(TABLE_NAME)"].values)
             database_table_list = [
@@ -176,7 +307,7 @@ class SqlFetch:
                 for i, _ in enumerate(database_name_list)
             ]
         except Exception:
-            self.log.error(f"Pandas failed to parse html : {result_html}")
+            self.log.error(f"Pandas failed to parse result : {result_html}")
             raise
         return database_table_list
 
@@ -199,9 +330,9 @@ class SqlFetch:
             current_use_database_query,
             lambda df: list(df[0][df[0].columns[0]].values),
         )[0]
-        if type(result) != str:
-            if math.isnan(result):
-                return ""
+        # NULL when no database is selected
+        if pandas.isna(result):
+            return ""
         return result
 
     def get_tables_in_db_html(self, db: str):
@@ -265,7 +396,7 @@ class SqlFetch:
         else:
             ColumnType = namedtuple("ColumnType", ["name", "type"])
             column_type_list = []
-            df = pandas.read_html(result_html)
+            df = self.mariadb_client.result_frames(result_html)
             pandas_table = df[0]
             for i, column_name in enumerate(pandas_table["lower(COLUMN_NAME)"]):
                 column_type = ColumnType(column_name, pandas_table["COLUMN_TYPE"][i])
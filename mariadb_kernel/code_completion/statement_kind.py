@@ -0,0 +1,218 @@
+"""Tells which parts of the completion catalog a statement can change
+
+After a cell ran, the autocompleter only refreshes what the statements of
+the cell may have changed instead of reloading the whole catalog: nothing
+after a SELECT or an INSERT, the columns of t after ALTER TABLE t, the list
+of users after CREATE USER... Statements that can't be classified, e.g. a
+CALL whose procedure may run anything, get the whole catalog refreshed.
+
+Whether USE really changed the current database isn't known here, the
+autocompleter asks the server after the cells that ran a USE or dropped
+a database.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import re
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
+
+import sqlparse
+
+READ_ONLY = "read-only"
+DML = "dml"
+DDL = "ddl"
+USE = "use"
+GRANT = "grant"
+SET = "set"
+UNKNOWN = "unknown"
+
+# The slices of the catalog that can be refreshed on their own
+DATABASES = "databases"
+TABLES = "tables"
+FUNCTIONS = "functions"
+USERS = "users"
+VARIABLES = "variables"
+# The tables and functions of the current database, after it changed
+CURRENT_DATABASE = "current database"
+ALL = "all"
+
+_READ_ONLY_WORDS = {
+    "select",
+    "show",
+    "describe",
+    "desc",
+    "explain",
+    "analyze",
+    "help",
+    "do",
+    "with",
+    "values",
+    "check",
+    "checksum",
+    "optimize",
+    "repair",
+    "handler",
+}
+_DML_WORDS = {
+    "insert",
+    "update",
+    "delete",
+    "replace",
+    "load",
+    "truncate",
+    "start",
+    "commit",
+    "rollback",
+    "savepoint",
+    "release",
+    "lock",
+    "unlock",
+    "xa",
+}
+
+_NAME = r"(?:`(?:[^`]|``)+`|[\w$]+)"
+_QUALIFIED_NAME = rf"{_NAME}(?:\s*\.\s*{_NAME})?"
+_NAMES = re.compile(rf"{_QUALIFIED_NAME}(?:\s*,\s*{_QUALIFIED_NAME})*")
+_QUALIFIED = re.compile(_QUALIFIED_NAME)
+_PART = re.compile(_NAME)
+
+_DDL = re.compile(
+    r"(create|alter|drop|rename)\s+(?:or\s+replace\s+)?"
+    r"(?:(?:online|ignore|temporary|definer\s*=\s*\S+|"
+    r"sql\s+security\s+\w+|algorithm\s*=\s*\w+|aggregate)\s+)*"
+    r"(table|tables|view|sequence|database|schema|function|procedure|package"
+    r"(?:\s+body)?|user|role|index|trigger|event|server|tablespace|logfile|"
+    r"unique|fulltext|spatial)\b\s*(?:if\s+(?:not\s+)?exists\s+)?",
+    re.IGNORECASE,
+)
+_RENAME_TO = re.compile(
+    rf"\brename\s+(?:to\s+|as\s+)?(?!column\b|index\b|key\b)({_QUALIFIED_NAME})",
+    re.IGNORECASE,
+)
+_RENAME_PAIRS = re.compile(
+    rf"({_QUALIFIED_NAME})\s+to\s+({_QUALIFIED_NAME})", re.IGNORECASE
+)
+_PLUGIN = re.compile(r"(install|uninstall)\s+(plugin|soname)\b", re.IGNORECASE)
+_TRANSACTION = re.compile(r"begin(\s+work)?$", re.IGNORECASE)
+
+
+class StatementKind(NamedTuple):
+    # One of READ_ONLY, DML, DDL, USE, GRANT, SET or UNKNOWN
+    kind: str
+    # The slices of the catalog the statement can change
+    slices: FrozenSet[str] = frozenset()
+    # (database or None for the current one, table) pairs of the tables
+    # created, changed or dropped by the statement
+    tables: Tuple[Tuple[Optional[str], str], ...] = ()
+
+
+def _unquote(name):
+    if name.startswith("`"):
+        return name[1:-1].replace("``", "`")
+    return name
+
+
+def _table(qualified_name):
+    parts = [_unquote(part) for part in _PART.findall(qualified_name)]
+    if len(parts) == 1:
+        return (None, parts[0])
+    return (parts[0], parts[1])
+
+
+def _tables(names):
+    match = _NAMES.match(names)
+    if not match:
+        return None
+    return tuple(_table(name) for name in _QUALIFIED.findall(match.group(0)))
+
+
+def _ddl(sql):
+    match = _DDL.match(sql)
+    if not match:
+        return StatementKind(UNKNOWN, frozenset([ALL]))
+    verb = match.group(1).lower()
+    what = match.group(2).lower().split()[0]
+    rest = sql[match.end() :]
+
+    if what in ("database", "schema"):
+        # ALTER DATABASE changes the options of the database, not its name
+        if verb == "alter":
+            return StatementKind(DDL)
+        return StatementKind(DDL, frozenset([DATABASES]))
+    if what in ("function", "procedure", "package"):
+        return StatementKind(DDL, frozenset([FUNCTIONS]))
+    if what in ("user", "role"):
+        return StatementKind(DDL, frozenset([USERS]))
+    if what in ("table", "tables", "view", "sequence"):
+        if verb == "rename":
+            pairs = _RENAME_PAIRS.findall(rest)
+            if not pairs:
+                return StatementKind(UNKNOWN, frozenset([ALL]))
+            tables = tuple(_table(name) for pair in pairs for name in pair)
+            return StatementKind(DDL, frozenset([TABLES]), tables)
+
+        tables = _tables(rest)
+        if tables is None:
+            return StatementKind(UNKNOWN, frozenset([ALL]))
+        if verb == "alter":
+            # The table keeps its name unless renamed at the same time
+            renamed = _RENAME_TO.search(rest)
+            if renamed:
+                tables += (_table(renamed.group(1)),)
+        return StatementKind(DDL, frozenset([TABLES]), tables)
+    # Indexes, triggers, events... aren't part of the catalog
+    return StatementKind(DDL)
+
+
+def _strip(sql):
+    """The statement without its leading comments and trailing delimiter"""
+    # Executable comments are run by the server, they can hold anything
+    if sql.lstrip().startswith("/*!"):
+        return None
+    sql = sqlparse.format(sql, strip_comments=True).strip()
+    return sql.rstrip(";").strip()
+
+
+def classify(sql: str) -> StatementKind:
+    """Classifies a statement by the parts of the catalog it can change"""
+    sql = _strip(sql)
+    if sql is None:
+        return StatementKind(UNKNOWN, frozenset([ALL]))
+    if not sql:
+        return StatementKind(READ_ONLY)
+    word = sql.split(None, 1)[0].lower()
+    # SELECT can't be followed by a word character, e.g. SELECT(1)
+    word = re.match(r"[\w$]*", word).group(0) or word
+
+    if word in _READ_ONLY_WORDS:
+        return StatementKind(READ_ONLY)
+    if word in _DML_WORDS or _TRANSACTION.match(sql):
+        return StatementKind(DML)
+    if word == "use":
+        return StatementKind(USE, frozenset([CURRENT_DATABASE]))
+    if word in ("grant", "revoke"):
+        # GRANT creates the user when it doesn't exist yet
+        return StatementKind(GRANT, frozenset([USERS]))
+    if word == "set":
+        # SET changes values, the names of the variables stay the same
+        return StatementKind(SET)
+    if word in ("create", "alter", "drop", "rename"):
+        return _ddl(sql)
+    if _PLUGIN.match(sql):
+        # Plugins come with variables and functions of their own
+        return StatementKind(DDL, frozenset([VARIABLES, FUNCTIONS]))
+    return StatementKind(UNKNOWN, frozenset([ALL]))
+
+
+def affected(statements: List[str]):
+    """The slices and tables the statements can change, all together"""
+    slices = set()
+    tables = []
+    for statement in statements:
+        found = classify(statement)
+        slices.update(found.slices)
+        for table in found.tables:
+            if table not in tables:
+                tables.append(table)
+    return slices, tables
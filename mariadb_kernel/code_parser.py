@@ -12,20 +12,22 @@ their duties.
 # Distributed under the terms of the Modified BSD License.
 
 from mariadb_kernel.maria_magics.magic_factory import MagicFactory
+from mariadb_kernel import statement_splitter
 
 
 class CodeParser:
     def __init__(self, log, cell_code, delimiter):
         self.code = cell_code
         self.magics = []
-        self.sql = []
+        self.statements = []
         self.log = log
         self.delimiter = delimiter
         self.magic_factory = MagicFactory(log)
         self._parse()
 
-    def get_sql(self):
-        return self.sql
+    def get_statements(self):
+        """Returns the SQL statements of the cell, without their delimiter"""
+        return self.statements
 
     def get_magics(self):
         return self.magics
@@ -63,10 +65,10 @@ class CodeParser:
                 self.magics.append(magic_obj)
             return
 
-        code = self.code.strip()
-        if not code.endswith(self.delimiter):
+        split_code = statement_splitter.split(self.code, self.delimiter)
+        if split_code.remainder:
             raise ValueError(
-                f"Your SQL code doesn't end with delimiter `{self.delimiter}`"
+                f"Your SQL code doesn't end with delimiter `{split_code.delimiter}`"
             )
 
-        self.sql.append(code)
+        self.statements = split_code.statements
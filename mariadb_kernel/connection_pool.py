@@ -0,0 +1,177 @@
+"""A pool of client connections shared by the kernel subsystems
+
+The cells of the notebook run on the kernel's own client, which holds the
+session of the user. Background work (the code completion refresher, the
+introspection of the word under the cursor, magic commands) draws client
+connections from a ConnectionPool instead. A checked out client is only
+used by one thread at a time, so two subsystems never interleave their
+statements on the same client stream.
+
+Every subsystem has a quota of clients it can hold at once, so that e.g.
+a slow refresh can't starve the introspection of clients. Clients that sat
+idle in the pool for a while are pinged before being handed out again,
+which reconnects them if the server closed their connection.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import contextlib
+import threading
+import time
+
+from mariadb_kernel.client_factory import create_client
+from mariadb_kernel.session_state import SessionState
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    # Idle clients older than this are pinged before being handed out
+    HEALTH_CHECK_INTERVAL = 30
+
+    def __init__(self, log, config):
+        self.log = log
+        self.config = config
+        self.size = config.pool_size()
+        self.quotas = config.pool_quotas()
+        # Never started, only used for the result helpers (decode,
+        # styled_result...) which are the same for every client of the pool
+        self.template = create_client(log, config)
+
+        # (client, time it was checked in) pairs, the most recent last
+        self.idle = []
+        self.in_use = {}
+        self.clients = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def _quota(self, subsystem):
+        return min(int(self.quotas.get(subsystem, self.size)), self.size)
+
+    def _can_checkout(self, subsystem):
+        if self.in_use.get(subsystem, 0) >= self._quota(subsystem):
+            return False
+        return bool(self.idle) or self.clients < self.size
+
+    def checkout(self, subsystem, timeout=30):
+        """Returns a started client for subsystem, to be given back with checkin()"""
+        with self.condition:
+            if self.closed:
+                raise PoolTimeoutError("The connection pool is closed")
+            if not self.condition.wait_for(
+                lambda: self._can_checkout(subsystem), timeout
+            ):
+                raise PoolTimeoutError(
+                    f"No client connection available for {subsystem} "
+                    f"after {timeout} seconds"
+                )
+            self.in_use[subsystem] = self.in_use.get(subsystem, 0) + 1
+            client = checked_in = None
+            if self.idle:
+                client, checked_in = self.idle.pop()
+            else:
+                # Reserve the slot, the client is started outside of the lock
+                self.clients += 1
+
+        try:
+            if client is None:
+                self.log.info(f"Starting a pooled client connection for {subsystem}")
+                client = create_client(self.log, self.config)
+                client.start()
+            elif time.monotonic() - checked_in >= self.HEALTH_CHECK_INTERVAL:
+                client.ping()
+        except Exception:
+            with self.condition:
+                self.in_use[subsystem] -= 1
+                self.clients -= 1
+                self.condition.notify_all()
+            raise
+        return client
+
+    def checkin(self, client, subsystem):
+        with self.condition:
+            self.in_use[subsystem] -= 1
+            if self.closed:
+                self.clients -= 1
+                client.stop()
+            else:
+                self.idle.append((client, time.monotonic()))
+            self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def connection(self, subsystem, timeout=30):
+        client = self.checkout(subsystem, timeout)
+        try:
+            yield client
+        finally:
+            self.checkin(client, subsystem)
+
+    def open_clients(self):
+        with self.condition:
+            return self.clients
+
+    def close(self):
+        """Stops the idle clients, the ones in use are stopped on checkin"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.clients -= len(idle)
+            self.condition.notify_all()
+        for client, _ in idle:
+            client.stop()
+
+
+class PooledClient:
+    """Runs every statement on a client checked out from the pool
+
+    It can stand in for a MariaDBClient where only statements are run
+    (e.g. SqlFetch). The current database is kept across the pooled clients:
+    it follows the USE statements run through this object, or those of the
+    given session (e.g. the session of the kernel's own client).
+    """
+
+    def __init__(self, pool, subsystem, session=None):
+        self.pool = pool
+        self.subsystem = subsystem
+        self.follows = session is not None
+        self.session = session if session is not None else SessionState()
+        # Errors are kept per thread, different threads run statements
+        # through the same object at the same time
+        self.state = threading.local()
+
+    def iserror(self):
+        return getattr(self.state, "error", False)
+
+    def error_message(self):
+        return getattr(self.state, "errormsg", "")
+
+    def _use_database(self, client):
+        database = self.session.database
+        if database and client.session.database != database:
+            client.run_statement(f"USE {database};")
+
+    def run_statement(self, code, timeout=-1, on_progress=None):
+        with self.pool.connection(self.subsystem) as client:
+            self._use_database(client)
+            result = client.run_statement(code, timeout, on_progress)
+            self.state.error = client.iserror()
+            self.state.errormsg = client.error_message()
+
+        if not self.follows and not self.state.error:
+            self.session.track(code)
+        return result
+
+    def is_result_set(self, result):
+        return self.pool.template.is_result_set(result)
+
+    def decode(self, result):
+        return self.pool.template.decode(result)
+
+    def result_frames(self, result):
+        return self.pool.template.result_frames(result)
+
+    def styled_result(self, result_html):
+        return self.pool.template.styled_result(result_html)
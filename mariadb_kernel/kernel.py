@@ -2,27 +2,41 @@
 # Copyright (c) MariaDB Foundation.
 # Distributed under the terms of the Modified BSD License.
 
+import inspect
 import os
 import signal
 import logging
+import uuid
 import pandas
 
+from ipykernel.comm import CommManager
 from ipykernel.kernelbase import Kernel
 
 from mariadb_kernel._version import version as __version__
 from mariadb_kernel.client_config import ClientConfig
-from mariadb_kernel.mariadb_client import (
-    MariaDBClient,
-    ServerIsDownError,
-)
+from mariadb_kernel.mariadb_client import ServerIsDownError
+from mariadb_kernel.client_factory import create_client
+from mariadb_kernel.connection_pool import ConnectionPool, PooledClient
 from mariadb_kernel.code_parser import CodeParser
+from mariadb_kernel import keyset_browser
 from mariadb_kernel.mariadb_server import MariaDBServer
+from mariadb_kernel.result_cursor import (
+    COMM_TARGET,
+    MIME_TYPE,
+    ResultCursor,
+    ResultCursors,
+)
+from mariadb_kernel.result_history import ResultHistory
+from mariadb_kernel.result_set import RESULT_STYLE, LazyFrame, rows_to_keep
+from mariadb_kernel.result_spill import SpilledResult
+from mariadb_kernel.statement_metrics import summarize
 from .code_completion.sql_fetch import SqlFetch
 from .code_completion.autocompleter import Autocompleter
 from .code_completion.introspector import Introspector
 
 
 _EXPERIMENTAL_KEY_NAME = "_jupyter_types_experimental"
+DATARESOURCE_TYPE = "application/vnd.dataresource+json"
 
 
 class MariaDBKernel(Kernel):
@@ -39,9 +53,35 @@ class MariaDBKernel(Kernel):
         Kernel.__init__(self, **kwargs)
         self.delimiter = ";"
         self.client_config = ClientConfig(self.log)
-        self.mariadb_client = MariaDBClient(self.log, self.client_config)
+        self.mariadb_client = create_client(self.log, self.client_config)
         self.mariadb_server = None
-        self.data = {"last_select": pandas.DataFrame([])}
+        # Results of the session the magic commands can refer to as Out[n]
+        self.history = ResultHistory(
+            self.client_config.result_history(),
+            self.client_config.result_history_bytes(),
+        )
+        self.data = {"last_select": pandas.DataFrame([]), "history": self.history}
+        # StatementMetrics of the statements of the cell being executed
+        self.cell_metrics = []
+
+        # Large results are browsed page by page through a comm
+        self.result_cursors = ResultCursors(
+            self.client_config.result_cursors(),
+            self.client_config.result_page_size(),
+        )
+        self.comm_manager = CommManager(parent=self, kernel=self)
+        for msg_type in ("comm_open", "comm_msg", "comm_close"):
+            self.shell_handlers[msg_type] = getattr(self.comm_manager, msg_type)
+        self.comm_manager.register_target(COMM_TARGET, self.result_cursors.open_comm)
+        # Results of %%browse stay on the server, their pages are fetched
+        # when asked for
+        self.browsers = keyset_browser.KeysetBrowsers(
+            self.client_config.result_cursors(),
+            self.client_config.result_page_size(),
+        )
+        self.comm_manager.register_target(
+            keyset_browser.COMM_TARGET, self.browsers.open_comm
+        )
 
         if self.client_config.debug_logging():
             self.log.setLevel(logging.DEBUG)
@@ -68,6 +108,13 @@ class MariaDBKernel(Kernel):
             if self.mariadb_server.is_up():
                 self.mariadb_client.start()
 
+        # Background work and magic commands run on pooled clients, the
+        # statements of the cells on the client above
+        self.pool = ConnectionPool(self.log, self.client_config)
+        self.magic_client = PooledClient(
+            self.pool, "magics", self.mariadb_client.session
+        )
+
         # Create autocompletion/introspection objects based on whether
         # the user enabled this feature or not
         self.autocompleter = None
@@ -75,7 +122,7 @@ class MariaDBKernel(Kernel):
         if self.client_config.autocompletion_enabled():
             try:
                 self.autocompleter = Autocompleter(
-                    self.mariadb_client, self.client_config, self.log
+                    self.mariadb_client, self.client_config, self.log, self.pool
                 )
                 self.introspector = Introspector()
             except Exception:
@@ -93,63 +140,215 @@ class MariaDBKernel(Kernel):
         self.mariadb_client.run_statement(f"delimiter {delimiter}")
         self.delimiter = delimiter
 
-    def _execute_magics(self, magics):
+    async def _execute_magics(self, magics):
         for magic in magics:
-            magic.execute(self, self.data)
-
-    def _update_data(self, result_html):
-        if not result_html or not result_html.startswith("<TABLE"):
-            return
-
-        data = pandas.read_html(result_html)
-        self.data["last_select"] = data[0]
+            # Magics that run SQL (e.g. %%delimiter) are coroutines
+            result = magic.execute(self, self.data)
+            if inspect.isawaitable(result):
+                await result
+
+    def _spilled(self, result_set):
+        """Writes the values of result_set to disk if they are too large to keep"""
+        if (
+            len(result_set) > self.client_config.spill_rows()
+            or result_set.size > self.client_config.spill_bytes()
+        ):
+            return SpilledResult(result_set.values)
+        return None
+
+    def _update_data(self, result_set, spilled, index):
+        # The DataFrame is only built if a magic command reads it
+        result = LazyFrame(result_set, spilled)
+        self.data["last_select"] = result
+        self.history.add(self.execution_count, index, result)
+
+    def _render_result(self, result_set, limit=None, note=None, highlight=()):
+        """Returns the display data of result_set in the configured formats
+
+        Only the first limit rows are rendered when limit is given, note is
+        shown under them. The rows at the positions in highlight stand out
+        in HTML.
+        """
+        formats = self.client_config.display_formats()
+        data = {}
+        if "html" in formats:
+            note_html = f"<b>{note}</b>" if note else ""
+            html = result_set.to_html(limit, highlight)
+            data["text/html"] = RESULT_STYLE + html + note_html
+        if "text" in formats:
+            note_text = f"\n{note}" if note else ""
+            data["text/plain"] = result_set.to_text(limit) + note_text
+        if "dataresource" in formats:
+            data[DATARESOURCE_TYPE] = result_set.to_dataresource(limit)
+        return data
+
+    def _display_result(self, result, result_sets, spilled):
+        """Returns the display data of every result set of a statement"""
+        if not result_sets:
+            # Messages of the client (e.g. Query OK), plain text either way
+            return [{"text/plain": result}]
+
+        page_size = self.client_config.result_page_size()
+        max_rows = self.client_config.max_display_rows()
+        max_bytes = self.client_config.max_display_bytes()
+        displays = []
+        for result_set, values_spilled in zip(result_sets, spilled):
+            rows = len(result_set)
+            keep = min(rows, rows_to_keep(rows, result_set.size, max_rows, max_bytes))
+            if keep == rows:
+                data = self._render_result(result_set)
+            else:
+                note = (
+                    f"{rows} rows in set, {rows - keep} rows in the middle "
+                    "are not displayed"
+                )
+                data = self._render_result(result_set.head_and_tail(keep), note=note)
+            if rows > page_size:
+                # Frontends with a result viewer page through the whole
+                # result from the cursor, the others show the rows above
+                cursor = ResultCursor(result_set, values_spilled)
+                self.result_cursors.add(cursor)
+                data[MIME_TYPE] = {"cursors": [cursor.describe(page_size)]}
+            displays.append(data)
+        return displays
 
     def _send_message(self, stream, message):
         error = {"name": stream, "text": message + "\n"}
         self.send_response(self.iopub_socket, "stream", error)
 
-    def do_execute(
+    def _progress_display(self, preview_display):
+        """Returns the callback that shows the first rows of a running query"""
+
+        def on_progress(preview, rows):
+            result_sets = self.mariadb_client.decode(preview)
+            if not result_sets:
+                return
+
+            msg_type = "update_display_data"
+            if preview_display["id"] is None:
+                preview_display["id"] = str(uuid.uuid4())
+                msg_type = "display_data"
+
+            display_content = {
+                "data": self._render_result(
+                    result_sets[0], note=f"{rows} rows received so far..."
+                ),
+                "metadata": {},
+                "transient": {"display_id": preview_display["id"]},
+            }
+            self.send_response(self.iopub_socket, msg_type, display_content)
+
+        return on_progress
+
+    def _publish_result(self, data, preview_display, metadata=None):
+        display_content = {
+            "data": data,
+            "metadata": metadata or {},
+        }
+        msg_type = "display_data"
+        # Replace the preview of the rows with the whole result
+        if preview_display["id"] is not None:
+            display_content["transient"] = {"display_id": preview_display["id"]}
+            msg_type = "update_display_data"
+            # The next statement of the cell gets a preview of its own
+            preview_display["id"] = None
+        self.send_response(self.iopub_socket, msg_type, display_content)
+
+    def _clear_preview(self, preview_display):
+        display_content = {
+            "data": {"text/plain": ""},
+            "metadata": {},
+            "transient": {"display_id": preview_display["id"]},
+        }
+        self.send_response(self.iopub_socket, "update_display_data", display_content)
+
+    async def do_execute(
         self, code, silent, store_history=True, user_expressions=None, allow_stdin=False
     ):
-        result = {
+        reply = {
             "status": "ok",
             # The base class increments the execution count
             "execution_count": self.execution_count,
             "payload": [],
             "user_expressions": {},
         }
+        self.cell_metrics = []
 
         try:
             parser = CodeParser(self.log, code, self.delimiter)
         except ValueError as exception:
             self._send_message("stderr", str(exception))
-            return result
-
-        statements = parser.get_sql()
-        for statement in statements:
-            result = self.mariadb_client.run_statement(statement)
-
-            if self.mariadb_client.iserror():
+            return reply
+
+        preview_display = {"id": None}
+        on_progress = None
+        if not silent and self.client_config.stream_results():
+            on_progress = self._progress_display(preview_display)
+        errors = []
+
+        def on_result(result):
+            # Called as soon as each statement of the batch completed
+            errors.append(self.mariadb_client.iserror())
+            metrics = self.mariadb_client.statement_metrics()
+            if errors[-1]:
+                self.cell_metrics.append(metrics)
+                if preview_display["id"] is not None:
+                    self._clear_preview(preview_display)
+                    preview_display["id"] = None
                 self._send_message("stderr", self.mariadb_client.error_message())
-                continue
+                return
 
-            self._update_data(result)
-            result_str = str(result)
+            # Decoded once for both last_select and the display
+            result_sets = self.mariadb_client.decode(result)
+            if result_sets:
+                metrics = metrics._replace(rows=sum(map(len, result_sets)))
+            self.cell_metrics.append(metrics)
+            spilled = [self._spilled(result_set) for result_set in result_sets]
+            if result_sets:
+                self._update_data(result_sets[0], spilled[0], len(errors) - 1)
             if not silent:
-                display_content = {
-                    "data": {
-                        "text/html": self.mariadb_client.styled_result(result_str)
-                    },
-                    "metadata": {},
-                }
-                self.send_response(self.iopub_socket, "display_data", display_content)
+                metadata = {"mariadb_kernel": {"metrics": metrics.to_dict()}}
+                for data in self._display_result(str(result), result_sets, spilled):
+                    self._publish_result(data, preview_display, metadata)
+                if self.client_config.show_metrics():
+                    self._send_message("stdout", metrics.footer())
+
+        # The statements of the cell go to the client at once, their results
+        # are published as they complete
+        statements = [statement.sql for statement in parser.get_statements()]
+        # User statements run for as long as they need, interrupting the
+        # kernel is how they are stopped
+        await self.mariadb_client.run_batch_async(
+            statements, timeout=None, on_progress=on_progress, on_result=on_result
+        )
 
-        self._execute_magics(parser.get_magics())
+        if self.mariadb_client.isinterrupted():
+            if not errors or not errors[-1]:
+                self._send_message("stderr", self.mariadb_client.error_message())
+            # Don't run the magics of the cell after an interrupt
+            return {
+                "status": "error",
+                "execution_count": self.execution_count,
+                "ename": "KeyboardInterrupt",
+                "evalue": self.mariadb_client.error_message(),
+                "traceback": [],
+            }
+
+        await self._execute_magics(parser.get_magics())
 
         if self.autocompleter:
-            self.autocompleter.refresh()
+            # Only what the statements of the cell may have changed
+            self.autocompleter.refresh(statements)
+
+        return reply
 
-        return result
+    def finish_metadata(self, parent, metadata, reply_content):
+        metadata = super().finish_metadata(parent, metadata, reply_content)
+        # The totals of the statements of the cell
+        totals = summarize(self.cell_metrics)
+        if totals is not None:
+            metadata["mariadb_kernel"] = {"metrics": totals}
+        return metadata
 
     def kill_server(self):
         if self.mariadb_server and self.mariadb_server.is_up():
@@ -182,11 +381,15 @@ class MariaDBKernel(Kernel):
                 )
 
         self.mariadb_client.stop()
-        expected_clients = 1
+        # The kernel's own client plus the pooled ones
+        expected_clients = 1 + self.pool.open_clients()
 
         if self.autocompleter:
             self.autocompleter.shutdown()
-            expected_clients = 2
+        self.pool.close()
+        self.result_cursors.clear()
+        self.browsers.clear()
+        self.history.clear()
 
         if num_clients is not None and num_clients <= expected_clients:
             self.log.info("No more clients connected to server")
@@ -0,0 +1,217 @@
+"""Browses results too large to be pulled into the kernel
+
+A SELECT ordered by a unique key is rewritten into keyset paginated
+queries: every page is the next `page_size` rows after the key of the last
+row of the previous page,
+
+    SELECT * FROM (<query>) AS browsed
+    WHERE browsed.`key` > <last key> ORDER BY browsed.`key` LIMIT <n>
+
+so that the server can walk the index of the key instead of skipping the
+rows of the previous pages, and only the page being looked at ever leaves
+the server. The pages are fetched when a result viewer asks for them
+through a comm opened on COMM_TARGET:
+
+    {"id": ..., "browser": ..., "page": 3}
+
+and the kernel replies with
+
+    {"id": ..., "browser": ..., "page": 3, "rows": [...], "last": false}
+
+Pages are numbered from 0 and can only be fetched in order the first time,
+the key a page starts after is only known once the previous page was read.
+Without a viewer, the next page is shown by running the cell again with
+the key of the last row shown (%%browse after=<key>).
+
+Numeric keys are compared unquoted, a quoted one would be compared as a
+DOUBLE and skip or repeat rows past 2^53. The type of the key comes from
+the result when the client reports column types, otherwise it is asked
+from the server once, when the second page is fetched.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import re
+import threading
+import uuid
+
+from pymysql.converters import escape_string
+
+from mariadb_kernel.result_cursor import ResultCursors
+from mariadb_kernel.result_set import NUMERIC_TYPES
+
+COMM_TARGET = "mariadb_kernel.keyset_browser"
+MIME_TYPE = "application/vnd.mariadb-kernel.keyset-browser+json"
+
+_SELECT = re.compile(r"^\(?\s*select\b", re.IGNORECASE)
+# SELECT * over several tables, whose columns can have the same names
+_SELECT_ALL = re.compile(r"^\(?\s*select\s+(?:distinct\s+)?\*", re.IGNORECASE)
+_JOIN = re.compile(r"\bjoin\b", re.IGNORECASE)
+_NUMBER = re.compile(r"-?\d+(\.\d+)?(e[-+]?\d+)?", re.IGNORECASE)
+# The server error of a derived table with the same column name twice
+_DUPLICATE_COLUMN = re.compile(r"^ERROR 1060\b|Duplicate column name")
+_DUPLICATE_COLUMNS = (
+    "The selected columns must have distinct names to be browsed, select "
+    "them by name or give them aliases instead of SELECT * over a join"
+)
+_IDENTIFIER = r"(?:`(?:[^`]|``)+`|[\w$]+)"
+_ORDER_BY = re.compile(
+    rf"\border\s+by\s+(?P<key>{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})*)"
+    r"(?:\s+(?P<direction>asc|desc))?\s*$",
+    re.IGNORECASE,
+)
+
+
+class BrowseError(Exception):
+    pass
+
+
+def _unquote(identifier):
+    if identifier.startswith("`"):
+        return identifier[1:-1].replace("``", "`")
+    return identifier
+
+
+class KeysetQuery:
+    def __init__(self, query):
+        query = query.strip().rstrip(";").rstrip()
+        if not _SELECT.match(query):
+            raise BrowseError("Only SELECT statements can be browsed")
+        match = _ORDER_BY.search(query)
+        if not match:
+            raise BrowseError(
+                "The SELECT statement must end with ORDER BY <unique key> "
+                "and have no LIMIT"
+            )
+
+        self.base = query[: match.start()].rstrip()
+        if _SELECT_ALL.match(self.base) and _JOIN.search(self.base):
+            raise BrowseError(_DUPLICATE_COLUMNS)
+        # The key is looked up in the derived table, without its table name
+        key = re.findall(_IDENTIFIER, match.group("key"))[-1]
+        self.key = _unquote(key)
+        self.descending = (match.group("direction") or "").lower() == "desc"
+
+    def _key(self):
+        name = self.key.replace("`", "``")
+        return f"browsed.`{name}`"
+
+    def key_type(self):
+        """Returns the query of the JSON type of the key, e.g. INTEGER or STRING"""
+        value = f"JSON_EXTRACT(JSON_ARRAY({self._key()}), '$[0]')"
+        return f"SELECT JSON_TYPE({value}) FROM ({self.base}) AS browsed LIMIT 1;"
+
+    def page(self, after, limit, numeric=False):
+        """Returns the query of the limit rows that come after the key `after`
+
+        after is the key as printed by the client, numeric tells whether
+        the key is a number.
+        """
+        key = self._key()
+        sql = f"SELECT * FROM ({self.base}) AS browsed"
+        if after is not None:
+            operator = "<" if self.descending else ">"
+            if not (numeric and _NUMBER.fullmatch(after)):
+                after = f"'{escape_string(after)}'"
+            sql += f" WHERE {key} {operator} {after}"
+        direction = "DESC" if self.descending else "ASC"
+        return f"{sql} ORDER BY {key} {direction} LIMIT {limit};"
+
+
+class KeysetBrowser:
+    def __init__(self, client, query: KeysetQuery, page_size, after=None):
+        """after is the key the first page starts after, None for the first row"""
+        self.id = uuid.uuid4().hex
+        self.client = client
+        self.query = query
+        self.page_size = page_size
+        self.after = after
+        # The key of the last row of every page read so far
+        self.last_keys = []
+        # Whether the key is a number, None until known
+        self.numeric_key = None
+        self.lock = threading.Lock()
+
+    def _key_index(self, result_set):
+        names = [column.name.lower() for column in result_set.columns]
+        try:
+            return names.index(self.query.key.lower())
+        except ValueError:
+            raise BrowseError(
+                f"The key `{self.query.key}` must be one of the selected columns"
+            ) from None
+
+    def _run(self, sql):
+        result = self.client.run_statement(sql, timeout=None)
+        if self.client.iserror():
+            error = self.client.error_message()
+            if _DUPLICATE_COLUMN.search(error):
+                raise BrowseError(_DUPLICATE_COLUMNS)
+            raise BrowseError(error)
+        return self.client.decode(result)
+
+    def _numeric_key(self):
+        if self.numeric_key is None:
+            result_sets = self._run(self.query.key_type())
+            key_type = result_sets[0].values.iloc[0, 0] if result_sets else None
+            self.numeric_key = key_type in ("INTEGER", "DOUBLE")
+        return self.numeric_key
+
+    def page(self, number):
+        """Fetches page number from the server, returns its ResultSet or None"""
+        with self.lock:
+            if not 0 <= number <= len(self.last_keys):
+                raise BrowseError(
+                    f"Page {number} can't be fetched before page {number - 1}"
+                )
+
+            after = self.after
+            if number > 0:
+                after = self.last_keys[number - 1]
+            numeric = after is not None and self._numeric_key()
+            result_sets = self._run(self.query.page(after, self.page_size, numeric))
+            if not result_sets or not result_sets[0]:
+                return None
+            result_set = result_sets[0]
+            key_index = self._key_index(result_set)
+            key_type = result_set.columns[key_index].type
+            if key_type is not None:
+                self.numeric_key = key_type in NUMERIC_TYPES
+            if number == len(self.last_keys):
+                self.last_keys.append(result_set.values.iloc[-1, key_index])
+            return result_set
+
+    def describe(self):
+        """The MIME_TYPE data pointing the viewer to this browser"""
+        return {
+            "browser": self.id,
+            "key": self.query.key,
+            "page_size": self.page_size,
+        }
+
+
+class KeysetBrowsers(ResultCursors):
+    """The browsers of the last %%browse cells, served through a comm"""
+
+    handle_field = "browser"
+
+    def reply(self, request):
+        reply = {"id": request.get("id"), "browser": request.get("browser")}
+        browser = self.get(request.get("browser"))
+        if browser is None:
+            reply["error"] = "The result is no longer available, run the cell again"
+            return reply
+
+        try:
+            number = int(request.get("page", 0))
+            result_set = browser.page(number)
+        except (BrowseError, ValueError, TypeError) as exception:
+            reply["error"] = str(exception)
+            return reply
+
+        rows = [] if result_set is None else result_set.values.values.tolist()
+        reply.update(
+            {"page": number, "rows": rows, "last": len(rows) < browser.page_size}
+        )
+        return reply
@@ -0,0 +1,101 @@
+"""This class implements the %%browse magic command"""
+
+help_text = """
+The %%browse magic command is a cell magic. It shows a SELECT
+statement one page at a time, without ever transferring the whole
+result from the server. This makes it possible to look at tables that
+are too large to be run as a regular statement.
+
+The SELECT statement must end with ORDER BY on a unique, NOT NULL key,
+which also needs to be one of the selected columns. Only the first page
+is displayed when the cell runs, a result viewer fetches the others from
+the server when they are looked at. Without a viewer, the page after a
+given key is displayed with the after=<key> argument, the command for
+the next page is printed under every page.
+
+Example:
+--------cell
+%%browse 50
+SELECT * FROM orders WHERE status = 'shipped' ORDER BY id;
+--------end-of-cell
+--------cell
+%%browse 50 after=1234
+SELECT * FROM orders WHERE status = 'shipped' ORDER BY id;
+--------end-of-cell
+
+The optional number is the number of rows per page, it defaults to
+the result_page_size option of the kernel.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+import shlex
+
+from mariadb_kernel.maria_magics.cell_magic import CellMagic
+from mariadb_kernel.keyset_browser import (
+    MIME_TYPE,
+    BrowseError,
+    KeysetBrowser,
+    KeysetQuery,
+)
+
+
+class Browse(CellMagic):
+    def __init__(self, args):
+        self.args = args
+
+    def name(self):
+        return "%%browse"
+
+    def help(self):
+        return help_text
+
+    def _parse_args(self, page_size):
+        """Returns the number of rows per page and the key to start after"""
+        after = None
+        for arg in shlex.split(self.args["args"]):
+            if arg.startswith("after="):
+                after = arg[len("after=") :]
+            else:
+                page_size = int(arg)
+        return page_size, after
+
+    def _next_page(self, page_size, after):
+        return f"Next page: %%browse {page_size} after={shlex.quote(str(after))}"
+
+    def execute(self, kernel, data):
+        try:
+            page_size, after = self._parse_args(kernel.client_config.result_page_size())
+            query = KeysetQuery(self.args["code"])
+            # Pages are fetched on a client of the pool, the cells keep
+            # running meanwhile
+            browser = KeysetBrowser(kernel.magic_client, query, page_size, after)
+            result_set = browser.page(0)
+        except ValueError:
+            kernel._send_message(
+                "stderr",
+                "The arguments of %%browse are the number of rows per page "
+                "and after=<key>",
+            )
+            return
+        except BrowseError as exception:
+            kernel._send_message("stderr", str(exception))
+            return
+
+        if result_set is None:
+            kernel._send_message("stdout", "Empty set")
+            return
+
+        kernel.browsers.add(browser)
+        display_content = {
+            "data": {
+                **kernel._render_result(result_set),
+                MIME_TYPE: browser.describe(),
+            },
+            "metadata": {},
+        }
+        kernel.send_response(kernel.iopub_socket, "display_data", display_content)
+        if len(result_set) == page_size:
+            kernel._send_message(
+                "stdout", self._next_page(page_size, browser.last_keys[0])
+            )
@@ -37,12 +37,12 @@ class Delimiter(CellMagic):
     def help(self):
         return help_text
 
-    def execute(self, kernel, data):
+    async def execute(self, kernel, data):
         delimiter = self.args["args"]
         code = self.args["code"]
         delimiter_bkp = kernel.get_delimiter()
         kernel.set_delimiter(delimiter)
         try:
-            kernel.do_execute(code, silent=False)
+            await kernel.do_execute(code, silent=False)
         finally:
             kernel.set_delimiter(delimiter_bkp)
@@ -2,10 +2,13 @@
 
 help_text = """
 The %df magic command has the following syntax:
-    > %df [filename]
+    > %df [Out[n]] [filename]
 
 It writes the result of the last query executed in the notebook
-into an external CSV formatted file.
+into an external CSV formatted file. The result of an earlier cell
+can be written instead by passing its Out[n] reference, e.g. Out[3]
+for the last result of cell 3 or Out[3][0] for the result of its first
+statement.
 The purpose of this magic command is to allow users to export query
 data from their MariaDB databases and then quickly import it
 into a Python Notebook where more complex analytics can be performed.
@@ -17,16 +20,15 @@ CSV file named 'last_query.csv'.
 # Copyright (c) MariaDB Foundation.
 # Distributed under the terms of the Modified BSD License.
 from mariadb_kernel.maria_magics.line_magic import LineMagic
+from mariadb_kernel import result_history
 
 
 import os
 
 
 class DF(LineMagic):
-    def __init__(self, filename):
-        self.filename = "last_query.csv"
-        if filename:
-            self.filename = filename
+    def __init__(self, args):
+        self.args = args
 
     def name(self):
         return "%df"
@@ -35,7 +37,12 @@ class DF(LineMagic):
         return help_text
 
     def execute(self, kernel, data):
-        df = data["last_select"]
+        try:
+            df, filename = result_history.load(data, self.args)
+        except LookupError as e:
+            kernel._send_message("stderr", e.args[0])
+            return
+        filename = filename or "last_query.csv"
 
         # When opening an existing notebook, the user can execute a cell
         # containing a %df magic, but kernel has no SELECT result stored
@@ -45,7 +52,7 @@ class DF(LineMagic):
             kernel._send_message("stderr", err)
             return
 
-        df.to_csv(self.filename, index=False)
+        df.to_csv(filename, index=False)
 
-        message = f"The result set was successfully written into {self.filename}"
+        message = f"The result set was successfully written into {filename}"
         kernel._send_message("stdout", message)
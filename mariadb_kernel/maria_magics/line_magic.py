@@ -10,8 +10,10 @@ it only sees what is passed as arguments, e.g. '%magic arg1 arg2'
 # Distributed under the terms of the Modified BSD License.
 
 from mariadb_kernel.maria_magics.maria_magic import MariaMagic
+from mariadb_kernel import result_history
 
 import base64
+from decimal import Decimal
 from distutils import util
 from matplotlib import pyplot
 import os
@@ -19,6 +21,8 @@ import shlex
 
 
 class LineMagic(MariaMagic):
+    args = ""
+
     def type(self):
         return "Line"
 
@@ -53,10 +57,31 @@ class LineMagic(MariaMagic):
 
         return d
 
+    """
+    DECIMAL columns hold exact Decimal values, which matplotlib can't
+    plot. Returns the DataFrame with these columns converted to floats.
+    """
+
+    def _plottable(self, df):
+        plottable = df
+        for i, (_, column) in enumerate(df.items()):
+            values = column.dropna()
+            if column.dtype != object or values.empty:
+                continue
+            if isinstance(values.iloc[0], Decimal):
+                if plottable is df:
+                    plottable = df.copy()
+                plottable.isetitem(i, column.astype("float64"))
+        return plottable
+
     def generate_plot(self, kernel, data, plot_type):
         image_name = "last_select.png"
-        df = data["last_select"]
-        # Override the plot kind in case the user passes this option
+        # The last result, or the one of the history given as Out[n]
+        try:
+            df, args = result_history.load(data, self.args)
+        except LookupError as e:
+            kernel._send_message("stderr", e.args[0])
+            return
 
         # When opening an existing notebook, the user can execute a cell
         # containing a magic command, but kernel has no SELECT result stored
@@ -67,7 +92,7 @@ class LineMagic(MariaMagic):
             return
 
         try:
-            d = self.parse_args(self.args)
+            d = self.parse_args(args)
         except ValueError:
             kernel._send_message(
                 "stderr",
@@ -92,7 +117,7 @@ class LineMagic(MariaMagic):
             d.pop("index", None)
 
         try:
-            df.plot(**d)
+            self._plottable(df).plot(**d)
         except (ValueError, AttributeError, TypeError) as e:
             kernel._send_message("stderr", str(e))
             return
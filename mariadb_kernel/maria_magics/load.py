@@ -66,13 +66,13 @@ class Load(LineMagic):
                        ENCLOSED BY '{self.encloser}'
                        IGNORE {self.skip_row_num} LINES
                        ;"""
-        kernel.mariadb_client.run_statement(use_csv_update_table_cmd)
-        if kernel.mariadb_client.iserror():
-            kernel._send_message("stderr", kernel.mariadb_client.error_message())
+        # Magic commands run on a client of the pool
+        client = kernel.magic_client
+        client.run_statement(use_csv_update_table_cmd, timeout=None)
+        if client.iserror():
+            kernel._send_message("stderr", client.error_message())
             return
-        result = kernel.mariadb_client.run_statement(
-            f"select * from {self.table_name} limit 5;"
-        )
+        result = client.run_statement(f"select * from {self.table_name} limit 5;")
         display_content = {
             "data": {"text/html": str(result + f"<b>...<b/>")},
             "metadata": {},
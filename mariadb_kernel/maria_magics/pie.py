@@ -9,6 +9,11 @@ pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.plot.pie.htm
 Example:
     > %pie y=column_name
 
+The result of an earlier cell can be plotted instead of the last one
+by passing its Out[n] reference, e.g. Out[3] for the last result of
+cell 3 or Out[3][0] for the result of its first statement:
+    > %pie Out[3] y=column_name
+
 The whole purpose of this magic command is to allow the user to display
 the result of the last query (e.g. SELECT, SHOW,...) in a nice and simple
 matplotlib plot.
@@ -0,0 +1,116 @@
+"""This class implements the %%profile magic command"""
+
+help_text = """
+The %%profile magic command is a cell magic. It runs the statement
+of the cell with ANALYZE FORMAT=JSON and displays where the time went:
+one row per operation of the query plan (query blocks, tables, sorts,
+temporary tables...) with how many times it ran, the rows the optimizer
+estimated next to the rows actually read, and the time it took. The
+operations that took the longest are highlighted.
+
+Example:
+--------cell
+%%profile
+SELECT c.name, COUNT(*) FROM orders o JOIN customers c ON o.customer = c.id
+GROUP BY c.name;
+--------end-of-cell
+
+With the stages argument, the time spent in every stage of the
+execution (e.g. opening tables, sending data) is displayed as well,
+as reported by SHOW PROFILE:
+    > %%profile stages
+
+Please note that, like ANALYZE, the magic runs the statement for real,
+an UPDATE or a DELETE changes the data. The cell can only hold a single
+statement.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+import json
+
+from mariadb_kernel import query_profile, statement_splitter
+from mariadb_kernel.maria_magics.cell_magic import CellMagic
+
+
+class Profile(CellMagic):
+    def __init__(self, args):
+        self.args = args
+
+    def name(self):
+        return "%%profile"
+
+    def help(self):
+        return help_text
+
+    def _statement(self, kernel):
+        split = statement_splitter.split(self.args["code"], kernel.get_delimiter())
+        statements = [statement.sql for statement in split.statements]
+        if split.remainder.strip():
+            statements.append(split.remainder.strip())
+        if len(statements) != 1:
+            return None
+        return statements[0]
+
+    async def _run(self, kernel, statement):
+        client = kernel.mariadb_client
+        result = await client.run_statement_async(
+            statement + kernel.get_delimiter(), timeout=None
+        )
+        if client.iserror():
+            kernel._send_message("stderr", client.error_message())
+            return None
+        return client.decode(result)
+
+    def _display(self, kernel, data):
+        display_content = {"data": data, "metadata": {}}
+        kernel.send_response(kernel.iopub_socket, "display_data", display_content)
+
+    async def execute(self, kernel, data):
+        args = self.args["args"].split()
+        if any(arg != "stages" for arg in args):
+            kernel._send_message("stderr", "The only argument of %%profile is 'stages'")
+            return
+        statement = self._statement(kernel)
+        if statement is None:
+            kernel._send_message(
+                "stderr", "%%profile takes a cell holding a single statement"
+            )
+            return
+
+        stages = "stages" in args
+        profile = None
+        # The statement runs in the session of the cells, it sees the same
+        # database, temporary tables and variables
+        if stages and await self._run(kernel, "SET profiling = 1") is None:
+            return
+        try:
+            result_sets = await self._run(kernel, f"ANALYZE FORMAT=JSON {statement}")
+            if stages and result_sets:
+                profile = await self._run(kernel, "SHOW PROFILE")
+        finally:
+            if stages:
+                await self._run(kernel, "SET profiling = 0")
+        if not result_sets:
+            return
+
+        try:
+            plan = json.loads(result_sets[0].values.iloc[0, 0])
+        except (ValueError, IndexError):
+            kernel._send_message("stderr", "The statement can't be analyzed")
+            return
+
+        found = query_profile.operations(plan)
+        note = None
+        if found and found[0].time_ms is not None:
+            note = f"The statement took {found[0].time_ms:.3f} ms"
+        self._display(
+            kernel,
+            kernel._render_result(
+                query_profile.breakdown(found),
+                note=note,
+                highlight=query_profile.most_expensive(found),
+            ),
+        )
+        if stages and profile:
+            self._display(kernel, kernel._render_result(profile[0]))
@@ -11,6 +11,8 @@ from mariadb_kernel.maria_magics.bar import Bar
 from mariadb_kernel.maria_magics.pie import Pie
 from mariadb_kernel.maria_magics.delimiter import Delimiter
 from mariadb_kernel.maria_magics.load import Load
+from mariadb_kernel.maria_magics.browse import Browse
+from mariadb_kernel.maria_magics.profile import Profile
 
 
 def get():
@@ -22,4 +24,6 @@ def get():
         "lsmagic": LSMagic,
         "delimiter": Delimiter,
         "load": Load,
+        "browse": Browse,
+        "profile": Profile,
     }
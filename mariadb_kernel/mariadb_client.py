@@ -3,60 +3,341 @@
 # Copyright (c) MariaDB Foundation.
 # Distributed under the terms of the Modified BSD License.
 
+import asyncio
+import os
 import re
-from pathlib import Path
-from uuid import uuid1
-from bs4 import BeautifulSoup
+import signal
+import tempfile
+import threading
+import time
+import uuid
+import pymysql
 from pexpect import replwrap, EOF, TIMEOUT, ExceptionPexpect
+from mariadb_kernel import result_parser
+from mariadb_kernel.result_set import RESULT_STYLE, STYLED_TABLE, decode_html
+from mariadb_kernel.session_state import SessionState
+from mariadb_kernel.statement_metrics import StatementMetrics
+
+
+def _scratch_dir():
+    # Prefer a memory backed filesystem so that writing the statement file
+    # never touches the disk (nor the notebook directory, which might be
+    # read-only or network mounted)
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return tempfile.gettempdir()
+
+
+def _count_html_rows(table):
+    # The first </TR> closes the row holding the column names
+    return table.count("</TR>") - 1
+
+
+INTERRUPTED_ERROR = "Query execution was interrupted"
+
+
+# The client couldn't send the statement, the server closed the connection
+_SERVER_GONE = re.compile(r"^ERROR 2006 ")
+# Same, or the connection was lost while the statement ran
+_CONNECTION_LOST = re.compile(r"^ERROR (2006|2013) ")
 
 
 class MariaREPL(replwrap.REPLWrapper):
+    # How much of the client output is read at once
+    CHUNK_SIZE = 1 << 16
+    # How much of the end of the output is searched for the prompt
+    SEARCH_WINDOW = 4096
+
     def __init__(self, *args, **kwargs):
         replwrap.REPLWrapper.__init__(self, *args, **kwargs)
         self.args = args
         self.kwargs = kwargs
 
+        # One scratch file per session, reused by every statement
+        fd, self.statement_file_path = tempfile.mkstemp(
+            prefix=".mariadb_statement_", dir=_scratch_dir()
+        )
+        os.close(fd)
+
+        # The prompt is the last thing the client prints, so it only needs
+        # to be looked for at the end of what was read so far. The greedy
+        # prefix makes the match start as far right as possible.
+        prompt = getattr(self.prompt, "pattern", self.prompt)
+        self.prompt_at_end = re.compile(f"(?s:.*)({prompt})\\Z")
+        # Whether a command timed out before the prompt showed up, the
+        # rest of its output comes before the output of the next command
+        self.awaiting_prompt = False
+
+    def close(self):
+        try:
+            os.unlink(self.statement_file_path)
+        except FileNotFoundError:
+            pass
+
     def _expect_prompt(self, timeout=-1, async_=False):
+        # Called by REPLWrapper.__init__, which looks for the prompt as a
+        # plain string otherwise
         patterns = [self.prompt]
         return self.child.expect(patterns, timeout=timeout, async_=async_)
 
-    def run_command(self, command, timeout=-1, async_=False):
+    def _prompt_reader(self, timeout=-1, on_output=None, interval=1.0):
+        """Reads the client output in large chunks until the prompt shows up
+
+        Unlike expect(), which searches the whole buffer again every time a
+        few bytes arrive, only the tail of the output is searched for the
+        prompt. When on_output is given, it is called with the output
+        received so far at most once every `interval` seconds.
+
+        This is a generator so that the same loop serves both the blocking
+        and the asyncio reads: it yields how many seconds to wait for more
+        output, gets sent what was read in the meantime ("" if nothing) and
+        returns the output once the prompt is found.
+        """
+        if timeout == -1:
+            timeout = self.child.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        next_report = time.monotonic() + interval
+
+        chunks = [self.child.buffer]
+        self.child.buffer = ""
+        tail = chunks[0][-self.SEARCH_WINDOW :]
+        received = len(chunks[0])
+        reported = 0
+        while True:
+            match = self.prompt_at_end.match(tail)
+            if match:
+                output = "".join(chunks)
+                output = output[: len(output) - len(tail) + match.start(1)]
+                self.child.before = output
+                self.awaiting_prompt = False
+                return output
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                self.child.before = "".join(chunks)
+                # The command keeps running, what it printed so far is read
+                # again along with the rest of its output
+                self.child.buffer = self.child.before
+                self.awaiting_prompt = True
+                raise TIMEOUT("Timeout exceeded while waiting for the prompt")
+
+            if on_output and now >= next_report:
+                next_report = now + interval
+                if received > reported:
+                    reported = received
+                    chunks = ["".join(chunks)]
+                    on_output(chunks[0])
+
+            wait = next_report - now if on_output else interval
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            try:
+                data = yield max(wait, 0)
+            except GeneratorExit:
+                # Reading was interrupted, the next read starts over with
+                # the output received so far
+                self.child.buffer = "".join(chunks)
+                raise
+            if not data:
+                continue
+            chunks.append(data)
+            tail = (tail + data)[-self.SEARCH_WINDOW :]
+            received += len(data)
+
+    def _read_until_prompt(self, timeout=-1, on_output=None):
+        reader = self._prompt_reader(timeout, on_output)
+        try:
+            wait = next(reader)
+            while True:
+                try:
+                    data = self.child.read_nonblocking(self.CHUNK_SIZE, wait)
+                except TIMEOUT:
+                    data = ""
+                wait = reader.send(data)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            reader.close()
+
+    async def _read_available(self, wait):
+        """Waits up to `wait` seconds for output without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        loop.add_reader(
+            self.child.child_fd,
+            lambda: readable.done() or readable.set_result(None),
+        )
+        try:
+            await asyncio.wait_for(readable, wait)
+        except asyncio.TimeoutError:
+            return ""
+        finally:
+            loop.remove_reader(self.child.child_fd)
+        return self.child.read_nonblocking(self.CHUNK_SIZE, 0)
+
+    async def _read_until_prompt_async(self, timeout=-1, on_output=None):
+        reader = self._prompt_reader(timeout, on_output)
+        try:
+            wait = next(reader)
+            while True:
+                wait = reader.send(await self._read_available(wait))
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            reader.close()
+
+    def wait_for_prompt(self, timeout=-1):
+        return self._read_until_prompt(timeout)
 
+    def _send_command(self, command):
         # Writing the cell code within a file and then sourcing it in the client
         # offers us a lot of advantages.
         # We avoid Pexpect's limitation of PC_MAX_CANON (1024) chars per line
         # and we also avoid more nasty issues like MariaDB client behaviour
         # sending continuation prompt when "\n" is received.
-        stmt_file = ".mariadb_statement" + "_" + str(uuid1())
-        statement_file_path = Path.cwd().joinpath(stmt_file)
-        with statement_file_path.open("w", encoding="utf-8") as file:
+        # The file is truncated and rewritten for every statement, the client
+        # is done reading it by the time the prompt shows up again.
+        with open(self.statement_file_path, "w", encoding="utf-8") as file:
             file.write(command)
-        self.child.sendline(f"source {str(statement_file_path)}")
-
-        try:
-            self._expect_prompt(timeout, async_)
-        finally:
-            statement_file_path.unlink()
+        self.child.sendline(f"source {self.statement_file_path}")
+
+    async def _run_command_async(self, command, timeout, on_output):
+        if self.awaiting_prompt:
+            await self._read_until_prompt_async(None)
+        self._send_command(command)
+        return await self._read_until_prompt_async(timeout, on_output)
+
+    def run_command(self, command, timeout=-1, async_=False, on_output=None):
+        """Runs command in the client and returns its output
+
+        With async_=True a coroutine is returned instead, which lets the
+        event loop run while waiting for the output.
+
+        When the previous command timed out, the client is still running
+        it: its output is waited for and thrown away first.
+        """
+        if async_:
+            return self._run_command_async(command, timeout, on_output)
+
+        if self.awaiting_prompt:
+            self._read_until_prompt(None)
+        self._send_command(command)
+        return self._read_until_prompt(timeout, on_output)
+
+
+class _Batch:
+    """Several statements sent to the client at once
+
+    Every statement is followed by a marker telling where the output of the
+    statement ends in the output of the whole batch. The marker is printed
+    by the client itself: the print command (\\p) shows the code typed so
+    far, a quoted marker that clear (\\c) then drops without sending it.
+    No SQL runs between the statements of the user, so ROW_COUNT(),
+    FOUND_ROWS() or SHOW WARNINGS still report the statement before them.
+    The client doesn't print the number of rows a statement changed in
+    silent mode, nor the time it took on the server, only the time between
+    two markers is known.
+    """
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.results = []
+        # Where the output of the next statement starts
+        self.offset = 0
+        # The batch is sent as soon as it is created, the first statement
+        # starts running now
+        self.last_end = time.monotonic()
+        self.marker = f"mariadb_kernel_{uuid.uuid4().hex}"
+        # What the print command writes around the code
+        self.end_of_statement = re.compile(
+            rf"-{{14}}\r?\n'{self.marker}:(\w+)'[ \t]*\r?\n-{{14}}\r?\n(\r?\n)?"
+        )
 
-        return self.child.before
+    def _print_marker(self, name):
+        return f"'{self.marker}:{name}' \\p \\c"
+
+    def script(self, delimiter):
+        """The code sourced by the client, delimiter is the one to restore"""
+        # The statements may contain the delimiter of the session (e.g. the
+        # ";" of a stored procedure body), end them with one they can't contain
+        batch_delimiter = f"//{self.marker}//"
+        lines = [f"delimiter {batch_delimiter}"]
+        lines.append(self._print_marker("start"))
+        for i, statement in enumerate(self.statements):
+            lines.append(f"{statement}{batch_delimiter}")
+            lines.append(self._print_marker(i))
+        lines.append(f"delimiter {delimiter}")
+        return "\n".join(lines)
+
+    def completed(self, output):
+        """Returns the outputs of the statements completed since the last call"""
+        outputs = []
+        for match in self.end_of_statement.finditer(output, self.offset):
+            if match.group(1) != "start":
+                outputs.append(output[self.offset : match.start()].lstrip("\r\n"))
+            self.offset = match.end()
+        return outputs
+
+    def pending(self, output):
+        """The output of the statement that is running or that failed"""
+        return output[self.offset :].lstrip("\r\n")
+
+    def done(self):
+        return len(self.results) == len(self.statements)
 
 
 class MariaDBClient:
+    # The errors raised by the client when the connection is lost
+    CONNECTION_ERRORS = (EOF,)
+    # Seconds to wait before the next reconnect attempt, times the attempt
+    RECONNECT_DELAY = 1
+
     def __init__(self, log, config):
         self.maria_repl = None
+        self.config = config
         self.client_bin = config.client_bin()
+        self.result_format = config.result_format()
         kernel_args = "-s -H"
+        if self.result_format == "tsv":
+            kernel_args = "-s --column-type-info"
+        if config.stream_results():
+            # Print the rows as they come from the server instead of
+            # buffering the whole result set first
+            kernel_args += " --quick"
+        # Reconnecting is handled here, the client would lose the session
+        # state on its own
+        kernel_args += " --disable-reconnect"
+        # A sourced batch stops at the first error instead of going on with
+        # the next statement, e.g. after the running one was killed
+        kernel_args += " --abort-source-on-error"
         args = config.get_args()
         self.cmd = f"{self.client_bin} {kernel_args} {args}"
 
         self.prompt = re.compile(config.server_name() + r" \[.*\]>[ \t]")
+        self.preview_rows = config.stream_preview_rows()
         self.log = log
         self.error = False
         self.errormsg = ""
+        self.interrupted = False
+        # Server side id of the session, used to kill its running statement
+        self.connection_id = None
+        # StatementMetrics of the last statement run by run_batch
+        self.metrics = None
+        self.session = SessionState()
+        # Keeps the keepalive pings from running in the middle of a statement
+        self.lock = threading.RLock()
+        self.keepalive_timer = None
 
     def iserror(self):
         return self.error
 
+    def isinterrupted(self):
+        return self.interrupted
+
+    def statement_metrics(self):
+        return self.metrics
+
     def error_message(self):
         return self.errormsg
 
@@ -68,10 +349,114 @@ class MariaDBClient:
             continuation_prompt=None,
         )
 
+    def _fetch_connection_id(self):
+        result = self.maria_repl.run_command("SELECT CONNECTION_ID();")
+        if not self.is_result_set(result):
+            self.log.error(f"Failed to get the connection id: {result}")
+            return None
+        return int(self.result_frames(result)[0].iloc[0, 0])
+
+    def _replay(self, statement):
+        output = self.maria_repl.run_command(statement)
+        if output.startswith("ERROR"):
+            self.log.error(
+                f'Failed to restore the session state "{statement}": {output}'
+            )
+
+    def _capture_session(self):
+        """Fetches the values of the variables set since the last capture"""
+        query = self.session.capture_query()
+        # The output of a statement that timed out would come first
+        if query is None or self.maria_repl.awaiting_prompt:
+            return
+        try:
+            result = self.maria_repl.run_command(query + self.session.delimiter)
+        except (EOF, TIMEOUT) as exception:
+            self.log.error(f"Failed to fetch the session variables: {exception}")
+            return
+        if not self.is_result_set(result):
+            self.log.error(f"Failed to fetch the session variables: {result}")
+            return
+        self.session.captured(self.result_frames(result)[0].iloc[0].tolist())
+
+    def _restart_client(self):
+        if self.maria_repl is not None:
+            self.maria_repl.child.close(force=True)
+            self.maria_repl.close()
+        self._launch_client()
+        self.connection_id = self._fetch_connection_id()
+        for statement in self.session.statements():
+            self._replay(statement)
+        # The statements above end with ";", the delimiter comes last
+        if self.session.delimiter != ";":
+            self._replay(f"delimiter {self.session.delimiter}")
+
+    def _reconnect(self):
+        """Restarts the session and restores its state, returns whether it worked"""
+        attempts = self.config.reconnect_attempts()
+        for attempt in range(1, attempts + 1):
+            self.log.info(
+                f"Reconnecting to the server, attempt {attempt} of {attempts}"
+            )
+            try:
+                self._restart_client()
+                self.log.info("Reconnected to the server")
+                return True
+            # A client that can't reach the server may also never give the
+            # prompt
+            except self.CONNECTION_ERRORS + (TIMEOUT,) as exception:
+                self.log.error(f"Failed to reconnect to the server: {exception}")
+            if attempt < attempts:
+                time.sleep(self.RECONNECT_DELAY * attempt)
+        return False
+
+    def ping(self):
+        """Checks that the connection still works, reconnects if it doesn't"""
+        # The keepalive timer and the pool ping from their own threads
+        with self.lock:
+            try:
+                lost = _CONNECTION_LOST.match(self.maria_repl.run_command("DO 1;"))
+            except self.CONNECTION_ERRORS:
+                lost = True
+            except TIMEOUT:
+                # The server is slow to answer, which doesn't make the
+                # connection broken
+                self.log.info("The server didn't answer the keepalive ping in time")
+                lost = not self.maria_repl.child.isalive()
+            if lost:
+                self.log.info("The connection to the server was lost")
+                self._reconnect()
+
+    def _keepalive(self):
+        # Only ping when the session is idle, a statement that is running
+        # keeps the connection alive by itself
+        if self.lock.acquire(blocking=False):
+            try:
+                self.ping()
+            finally:
+                self.lock.release()
+        if self.keepalive_timer is not None:
+            self._schedule_keepalive()
+
+    def _schedule_keepalive(self):
+        interval = self.config.keepalive_interval()
+        if interval <= 0:
+            return
+        self.keepalive_timer = threading.Timer(interval, self._keepalive)
+        self.keepalive_timer.daemon = True
+        self.keepalive_timer.start()
+
+    def _stop_keepalive(self):
+        timer, self.keepalive_timer = self.keepalive_timer, None
+        if timer is not None:
+            timer.cancel()
+
     def start(self):
         try:
             self._launch_client()
             self.log.info("MariaDB client was successfully started")
+            self.connection_id = self._fetch_connection_id()
+            self._schedule_keepalive()
         except EOF as exception:
             self.log.error("MariaDB client failed to start")
 
@@ -90,6 +475,7 @@ class MariaDBClient:
             self.log.error("Please install MariaDB from mariadb.org/download")
 
     def stop(self):
+        self._stop_keepalive()
         if self.maria_repl is None:
             return
 
@@ -97,28 +483,116 @@ class MariaDBClient:
         # better we just expect it
         self.maria_repl.child.sendline("quit")
         self.maria_repl.child.expect(EOF)
+        self.maria_repl.close()
         self.log.info("MariaDB client was successfully stopped")
 
-    def run_statement(self, code, timeout=-1):
-        if not code:
-            return ""
+    def _html_preview(self, output):
+        rows = _count_html_rows(output)
+        end = -1
+        for _ in range(min(rows, self.preview_rows) + 1):
+            end = output.index("</TR>", end + 1)
+        return output[: end + len("</TR>")] + "</TABLE>", rows
+
+    def preview(self, output):
+        """Returns the first rows of a partially received result set
+
+        The rows are returned in the same format as run_statement returns
+        them, along with the number of rows received so far.
+        """
+        if not self.is_result_set(output):
+            return "", 0
+
+        if self.result_format == "tsv":
+            return result_parser.preview(output, self.preview_rows)
+        return self._html_preview(output)
+
+    def cancel(self):
+        """Kills the statement running in this session
+
+        The KILL QUERY is sent through a separate, short lived connection
+        since this session is busy waiting for the statement.
+        """
+        if self.connection_id is None:
+            self.log.error("Can't cancel the statement, the connection id is unknown")
+            return
 
-        result = ""
+        self.log.info(f"Killing the statement running in session {self.connection_id}")
         try:
-            result = self.maria_repl.run_command(code, timeout)
-        except EOF as exception:
-            self.log.error(
-                f'MariaDB client failed to run command "{code}". '
-                f"Client most probably exited due to a crash: {exception}"
-            )
-            # TODO: attempt a restart and raise exception if it fails again
-        except TIMEOUT as exception:
-            self.log.error(
-                f'MariaDB client failed to run command "{code}". '
-                f"Reading from the client timed out: {exception}"
-            )
-            # TODO: attempt to rerun the cmd and raise exception if failure
+            connection = pymysql.connect(**self.config.get_connection_args())
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"KILL QUERY {self.connection_id}")
+            finally:
+                connection.close()
+        except pymysql.err.Error as exception:
+            self.log.error(f"Failed to cancel the running statement: {exception}")
+
+    def _interrupted_output(self, output):
+        # Whatever was printed before the error is an incomplete result
+        error = output.find("ERROR ")
+        if error == -1:
+            return f"ERROR 1317 (70100): {INTERRUPTED_ERROR}"
+        return output[error:]
+
+    def _run_command(self, code, timeout, on_output):
+        try:
+            return self.maria_repl.run_command(code, timeout, on_output=on_output)
+        except KeyboardInterrupt:
+            self.interrupted = True
+            self.cancel()
+            # The client prints the outcome of the killed statement and then
+            # gives the prompt back, wait for it so the session stays usable
+            return self._interrupted_output(self.maria_repl.wait_for_prompt(timeout))
+
+    def _report_progress(self, output, on_progress):
+        preview, rows = self.preview(output)
+        if rows > 0:
+            on_progress(preview, rows)
+
+    def _on_output(self, on_progress):
+        if not on_progress:
+            return None
+        return lambda output: self._report_progress(output, on_progress)
+
+    def _connection_lost(self, code, exception):
+        self.log.error(
+            f'MariaDB client failed to run command "{code}". '
+            f"Client most probably exited due to a crash: {exception}"
+        )
+        reason = "The client exited while running the statement"
 
+        self.error = True
+        if self._reconnect():
+            self.errormsg = f"{reason}, the session was restored"
+        else:
+            self.errormsg = f"{reason}, reconnecting to the server failed"
+        return self.errormsg
+
+    def _timed_out(self, code, exception):
+        self.log.error(
+            f'MariaDB client failed to run command "{code}". '
+            f"Reading from the client timed out: {exception}"
+        )
+        # The statement is neither killed nor is the session restarted, the
+        # next statement runs once the client is done with this one
+        self.error = True
+        self.errormsg = (
+            "The statement didn't complete in time, it keeps running and its "
+            "output is discarded"
+        )
+        return self.errormsg
+
+    def _read_failed(self, code, exception):
+        """Handles the client not giving the prompt back, returns the error message
+
+        Only a client that exited means the connection is lost, a timeout
+        only means the statement takes longer than the caller waits for.
+        """
+        if isinstance(exception, TIMEOUT) and self.maria_repl.child.isalive():
+            return self._timed_out(code, exception)
+        return self._connection_lost(code, exception)
+
+    def _checked_result(self, result):
         if result.startswith("ERROR"):
             self.error = True
 
@@ -137,19 +611,273 @@ class MariaDBClient:
         self.error = False
         return result
 
+    def _statement_result(self, code, result):
+        result = self._checked_result(result)
+        if not self.error:
+            self.session.track(code, self.session.delimiter)
+            self._capture_session()
+        return result
+
+    def _rerun_after_reconnect(self, result):
+        """Reconnects if the connection was lost, returns whether to run the statement again"""
+        if not _CONNECTION_LOST.match(result):
+            return False
+        self.log.info(f"The connection to the server was lost: {result}")
+        # ERROR 2006 means the statement never reached the server, other
+        # errors may come after it already ran
+        return self._reconnect() and bool(_SERVER_GONE.match(result))
+
+    def run_statement(self, code, timeout=-1, on_progress=None):
+        """Runs code in the client and returns its output
+
+        If on_progress is given, it is called as on_progress(preview, rows)
+        while the rows of a long running query are being received, with the
+        first rows received and the number of rows received so far.
+        """
+        if not code:
+            return ""
+
+        with self.lock:
+            self.interrupted = False
+            on_output = self._on_output(on_progress)
+            try:
+                result = self._run_command(code, timeout, on_output)
+                if self._rerun_after_reconnect(result):
+                    result = self._run_command(code, timeout, on_output)
+            except (EOF, TIMEOUT) as exception:
+                return self._read_failed(code, exception)
+
+            return self._statement_result(code, result)
+
+    async def _run_statement_async(self, code, timeout, on_progress):
+        with self.lock:
+            on_output = self._on_output(on_progress)
+            try:
+                result = await self.maria_repl.run_command(
+                    code, timeout, async_=True, on_output=on_output
+                )
+                if self._rerun_after_reconnect(result):
+                    result = await self.maria_repl.run_command(
+                        code, timeout, async_=True, on_output=on_output
+                    )
+            except (EOF, TIMEOUT) as exception:
+                return self._read_failed(code, exception)
+
+            return self._statement_result(code, result)
+
+    async def _cancel_on_interrupt(self, awaitable):
+        """Awaits awaitable, interrupting the kernel meanwhile kills its statement"""
+
+        def on_interrupt():
+            self.interrupted = True
+            self.cancel()
+
+        loop = asyncio.get_running_loop()
+        handled = True
+        try:
+            loop.add_signal_handler(signal.SIGINT, on_interrupt)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Signal handlers can only be set from the main thread on Unix,
+            # the statement can't be cancelled otherwise
+            handled = False
+
+        try:
+            return await awaitable
+        finally:
+            if handled:
+                loop.remove_signal_handler(signal.SIGINT)
+
+    def _set_interrupted(self):
+        self.interrupted = True
+        if not self.error:
+            # The statement completed before it could be killed
+            self.error = True
+            self.errormsg = INTERRUPTED_ERROR
+
+    async def run_statement_async(self, code, timeout=-1, on_progress=None):
+        """The asyncio counterpart of run_statement
+
+        The event loop keeps running while the statement executes. Instead
+        of raising KeyboardInterrupt, interrupting the kernel kills the
+        statement on the server, which makes the client return early.
+        """
+        if not code:
+            return ""
+
+        self.interrupted = False
+        result = await self._cancel_on_interrupt(
+            self._run_statement_async(code, timeout, on_progress)
+        )
+        if self.interrupted:
+            self._set_interrupted()
+            result = self.errormsg if self.error else result
+        return result
+
+    def _batch_result(self, batch, output, on_result):
+        statement = batch.statements[len(batch.results)]
+        now = time.monotonic()
+        self.metrics = StatementMetrics(now - batch.last_end, bytes=len(output))
+        batch.last_end = now
+        result = self._checked_result(output)
+        if not self.error:
+            self.session.track_statement(statement)
+        batch.results.append(result)
+        if on_result:
+            on_result(result)
+
+    def _on_batch_output(self, batch, on_progress, on_result):
+        def on_output(output):
+            for statement_output in batch.completed(output):
+                self._batch_result(batch, statement_output, on_result)
+            if on_progress:
+                self._report_progress(batch.pending(output), on_progress)
+
+        return on_output
+
+    def _finish_batch(self, batch, output, on_result):
+        """Handles the output left once the batch returned
+
+        Returns whether the statements that didn't run should be sent again.
+        """
+        for statement_output in batch.completed(output):
+            self._batch_result(batch, statement_output, on_result)
+        if batch.done():
+            return False
+
+        # The client stops reading the batch at the first error
+        # (--abort-source-on-error)
+        pending = batch.pending(output)
+        if not _CONNECTION_LOST.match(pending):
+            self._batch_result(batch, pending, on_result)
+            # The delimiter command at the end of the batch didn't run
+            self.maria_repl.run_command(f"delimiter {self.session.delimiter}")
+            return not self.interrupted
+
+        self.log.info(f"The connection to the server was lost: {pending}")
+        reconnected = self._reconnect()
+        # ERROR 2006 means the statement never reached the server, it is
+        # sent again along with the rest
+        if not reconnected or not _SERVER_GONE.match(pending):
+            self._batch_result(batch, pending, on_result)
+        return reconnected
+
+    def _batch_read_failed(self, batch, exception, on_result):
+        self.metrics = StatementMetrics(time.monotonic() - batch.last_end)
+        result = self._read_failed(batch.statements[len(batch.results)], exception)
+        batch.results.append(result)
+        if on_result:
+            on_result(result)
+
+    def run_batch(self, statements, timeout=-1, on_progress=None, on_result=None):
+        """Runs statements with a single round trip to the client
+
+        Returns the outputs of the statements that ran. on_result is called
+        with the output of every statement as soon as it completed, with
+        iserror() telling whether it failed. on_progress is the same as for
+        run_statement.
+
+        The client stops sourcing the batch at the first error, the
+        statements after a failed one are then sent as a new batch. Nothing
+        more runs once the statements are interrupted.
+        """
+        results = []
+        with self.lock:
+            self.interrupted = False
+            while len(results) < len(statements):
+                batch = _Batch(statements[len(results) :])
+                on_output = self._on_batch_output(batch, on_progress, on_result)
+                run_rest = False
+                try:
+                    try:
+                        output = self.maria_repl.run_command(
+                            batch.script(self.session.delimiter),
+                            timeout,
+                            on_output=on_output,
+                        )
+                    except KeyboardInterrupt:
+                        self.interrupted = True
+                        self.cancel()
+                        output = self.maria_repl.wait_for_prompt(timeout)
+                    run_rest = self._finish_batch(batch, output, on_result)
+                except (EOF, TIMEOUT) as exception:
+                    self._batch_read_failed(batch, exception, on_result)
+                results.extend(batch.results)
+                if not run_rest:
+                    break
+            self._capture_session()
+            if self.interrupted:
+                self._set_interrupted()
+        return results
+
+    async def _run_batch_async(self, statements, timeout, on_progress, on_result):
+        results = []
+        with self.lock:
+            while len(results) < len(statements):
+                batch = _Batch(statements[len(results) :])
+                on_output = self._on_batch_output(batch, on_progress, on_result)
+                run_rest = False
+                try:
+                    output = await self.maria_repl.run_command(
+                        batch.script(self.session.delimiter),
+                        timeout,
+                        async_=True,
+                        on_output=on_output,
+                    )
+                    run_rest = self._finish_batch(batch, output, on_result)
+                except (EOF, TIMEOUT) as exception:
+                    self._batch_read_failed(batch, exception, on_result)
+                results.extend(batch.results)
+                if not run_rest:
+                    break
+            self._capture_session()
+        return results
+
+    async def run_batch_async(
+        self, statements, timeout=-1, on_progress=None, on_result=None
+    ):
+        """The asyncio counterpart of run_batch, see run_statement_async"""
+        self.interrupted = False
+        results = await self._cancel_on_interrupt(
+            self._run_batch_async(statements, timeout, on_progress, on_result)
+        )
+        if self.interrupted:
+            self._set_interrupted()
+        return results
+
+    def is_result_set(self, result):
+        if not result:
+            return False
+        if self.result_format == "tsv":
+            return result_parser.is_result_set(result)
+        return result.startswith("<TABLE")
+
+    def decode(self, result):
+        """Decodes the result sets returned by run_statement into ResultSets"""
+        if not self.is_result_set(result):
+            return []
+        if self.result_format == "tsv":
+            return result_parser.decode(result)
+        return decode_html(result)
+
+    def result_frames(self, result):
+        """Decodes the result sets returned by run_statement into DataFrames"""
+        return [result_set.to_frame() for result_set in self.decode(result)]
+
     def styled_result(self, result_html):
-        if not result_html or not result_html.startswith("<TABLE"):
-            return result_html
+        """Returns result_html ready to be displayed in the notebook
 
-        soup = BeautifulSoup(result_html)
-        cells = soup.find_all(["td", "th"])
-        for cell in cells:
-            cell["style"] = "text-align:left;white-space:pre"
+        The look of the tables comes from a single stylesheet scoped to their
+        class, the cells themselves are left untouched.
+        """
+        if not self.is_result_set(result_html):
+            return result_html
 
-        table = soup.find("table")
-        table["style"] = "margin-left: 0"
+        if self.result_format == "tsv":
+            return RESULT_STYLE + "".join(
+                result_set.to_html() for result_set in self.decode(result_html)
+            )
 
-        return str(soup)
+        return RESULT_STYLE + result_html.replace("<TABLE BORDER=1>", STYLED_TABLE)
 
 
 class ServerIsDownError(Exception):
@@ -0,0 +1,372 @@
+"""A MariaDB client that speaks the MariaDB protocol directly
+
+MariaDBNativeClient is a drop-in replacement for MariaDBClient. Instead of
+driving the mysql command line client through pexpect and scraping its HTML
+output, it sends the statements over a PyMySQL connection and gets typed rows
+and column metadata back.
+
+The run_statement/iserror/error_message contract of MariaDBClient is kept:
+result sets are returned rendered the same way the command line client
+renders them when started with -H, so the rest of the kernel doesn't need
+to know which backend is in use.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import asyncio
+import html
+import time
+import pymysql
+import sqlparse
+from pymysql.constants import FIELD_TYPE, FLAG
+
+from mariadb_kernel.mariadb_client import (
+    INTERRUPTED_ERROR,
+    MariaDBClient,
+    ServerIsDownError,
+    LoginError,
+)
+from mariadb_kernel.result_set import Column, ResultSet
+from mariadb_kernel.statement_metrics import StatementMetrics
+
+# Error codes of the client library that mean the server can't be reached
+_CONNECTION_ERRORS = (2002, 2003, 2006, 2013)
+# The statement couldn't be sent, the server closed the connection
+_SERVER_GONE_ERROR = 2006
+_ACCESS_DENIED_ERROR = 1045
+# Names of the column types, as the command line client prints them
+_TYPE_NAMES = {
+    code: name
+    for name, code in vars(FIELD_TYPE).items()
+    if name.isupper() and name not in ("CHAR", "INTERVAL")
+}
+
+
+def _column_types(cursor):
+    """The type names of the columns of the result set the cursor is on
+
+    Like the command line client, ENUM columns are told apart by their
+    flags, the protocol sends them as STRING.
+    """
+    # The flags are only in the field packets, not in cursor.description
+    fields = cursor._result.fields  # pylint: disable=protected-access
+    return [
+        "ENUM" if field.flags & FLAG.ENUM else _TYPE_NAMES.get(field.type_code)
+        for field in fields
+    ]
+
+
+def _text(value):
+    """A value as printed by the command line client"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bytes, bytearray)):
+        # Binary strings are printed as they are, when they are text, and
+        # in hex otherwise
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return "0x" + value.hex().upper()
+    return str(value)
+
+
+def html_table(columns, rows):
+    """Renders a result set like `mysql -H` does"""
+    out = ["<TABLE BORDER=1><TR>"]
+    out.extend(f"<TH>{html.escape(name, quote=True)}</TH>" for name in columns)
+    out.append("</TR>")
+    for row in rows:
+        out.append("<TR>")
+        out.extend(f"<TD>{html.escape(_text(value))}</TD>" for value in row)
+        out.append("</TR>")
+    out.append("</TABLE>")
+    return "".join(out)
+
+
+def help_text(rows):
+    """Renders the result of a HELP statement like the mysql client does"""
+    name, description, example = rows[0]
+    text = f"Name: '{name}'\nDescription:\n{description}"
+    if example:
+        text += example
+    return text
+
+
+class MariaDBNativeClient(MariaDBClient):
+    # How many rows are fetched at once when streaming a result set
+    FETCH_SIZE = 1000
+    CONNECTION_ERRORS = (pymysql.err.Error,)
+
+    def __init__(self, log, config):
+        MariaDBClient.__init__(self, log, config)
+        # Result sets are always rendered like `mysql -H` does
+        self.result_format = "html"
+        self.connection_args = config.get_connection_args()
+        self.connection = None
+        self.delimiter = ";"
+        # Typed rows and column metadata of the result sets returned by the
+        # last statement, as (cursor.description, rows) pairs
+        self.result_sets = []
+        # The output of the last statement and the column types of the
+        # tables rendered into it
+        self.output = None
+        self.tables = []
+        # Rows changed by the last statement that didn't return rows
+        self.affected_rows = None
+
+    def _launch_client(self):
+        self.connection = pymysql.connect(
+            autocommit=True,
+            local_infile=True,
+            **self.connection_args,
+        )
+
+    def start(self):
+        try:
+            self._launch_client()
+            self.log.info("MariaDB native client was successfully started")
+            self.connection_id = self.connection.thread_id()
+            self._schedule_keepalive()
+        except pymysql.err.OperationalError as exception:
+            self.log.error("MariaDB client failed to start")
+
+            if exception.args[0] == _ACCESS_DENIED_ERROR:
+                self.log.error("The credentials used for connecting are wrong")
+                raise LoginError from exception
+
+            self.log.error("Most probably the MariaDB server is not started")
+
+            # Let the kernel know the server is down
+            raise ServerIsDownError from exception
+
+    def stop(self):
+        self._stop_keepalive()
+        if self.connection is None:
+            return
+
+        self.connection.close()
+        self.connection = None
+        self.log.info("MariaDB native client was successfully stopped")
+
+    def _capture_session(self):
+        query = self.session.capture_query()
+        if query is None:
+            return
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(query)
+                values = cursor.fetchone()
+        except pymysql.err.Error as exception:
+            self.log.error(f"Failed to fetch the session variables: {exception}")
+            return
+        self.session.captured(
+            [
+                value.decode(errors="replace") if isinstance(value, bytes) else value
+                for value in values
+            ]
+        )
+
+    def _restart_client(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except pymysql.err.Error:
+                # Closing sends a COM_QUIT, which fails on a dead connection
+                pass
+        self._launch_client()
+        self.connection_id = self.connection.thread_id()
+        with self.connection.cursor() as cursor:
+            for statement in self.session.statements():
+                try:
+                    cursor.execute(statement)
+                except pymysql.err.ProgrammingError as exception:
+                    self.log.error(
+                        f'Failed to restore the session state "{statement}": {exception}'
+                    )
+
+    def ping(self):
+        """Checks that the connection still works, reconnects if it doesn't"""
+        with self.lock:
+            try:
+                self.connection.ping(reconnect=False)
+            except pymysql.err.Error as exception:
+                self.log.info(f"The connection to the server was lost: {exception}")
+                self._reconnect()
+
+    def _split(self, code):
+        if self.delimiter == ";":
+            statements = sqlparse.split(code)
+        else:
+            statements = code.split(self.delimiter)
+
+        statements = [stmt.strip().rstrip(";").strip() for stmt in statements]
+        return [stmt for stmt in statements if stmt]
+
+    def _fetch_streaming(self, cursor, on_progress, interval=1.0):
+        rows = []
+        columns = [column[0] for column in cursor.description]
+        next_report = time.monotonic() + interval
+        while True:
+            chunk = cursor.fetchmany(self.FETCH_SIZE)
+            if not chunk:
+                return rows
+            rows.extend(chunk)
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + interval
+                on_progress(html_table(columns, rows[: self.preview_rows]), len(rows))
+
+    def _execute(self, statement, on_progress=None):
+        result_sets = []
+        self.affected_rows = None
+        # Unbuffered cursors hand over the rows as they arrive
+        cursor_type = pymysql.cursors.SSCursor if on_progress else None
+        with self.connection.cursor(cursor_type) as cursor:
+            cursor.execute(statement)
+            while True:
+                if cursor.description:
+                    if on_progress:
+                        rows = self._fetch_streaming(cursor, on_progress)
+                    else:
+                        rows = cursor.fetchall()
+                    result_sets.append(
+                        (cursor.description, _column_types(cursor), rows)
+                    )
+                else:
+                    self.affected_rows = cursor.rowcount
+                if not cursor.nextset():
+                    break
+        return result_sets
+
+    def _execute_reconnecting(self, statement, on_progress=None):
+        try:
+            return self._execute(statement, on_progress)
+        except pymysql.err.OperationalError as exception:
+            if exception.args[0] not in _CONNECTION_ERRORS or not self._reconnect():
+                raise
+            if exception.args[0] != _SERVER_GONE_ERROR:
+                # The statement may have run before the connection was lost
+                raise
+            # The statement never reached the server, run it again
+            return self._execute(statement, on_progress)
+
+    def _render(self, statement, result_sets):
+        output = []
+        is_help = statement.lower().startswith("help")
+        for description, types, rows in result_sets:
+            if is_help and len(description) == 3 and len(rows) == 1:
+                output.append(help_text(rows))
+                continue
+            self.tables.append(types)
+            output.append(html_table([column[0] for column in description], rows))
+        return "\n".join(output)
+
+    def run_statement(self, code, timeout=-1, on_progress=None):
+        if not code:
+            return ""
+
+        # The delimiter command is interpreted by the mysql client, there is
+        # no server side equivalent
+        words = code.strip().split(maxsplit=1)
+        if words[0].lower() == "delimiter" and len(words) > 1:
+            self.delimiter = words[1].strip()
+            self.error = False
+            return "Query OK"
+
+        with self.lock:
+            self.interrupted = False
+            return self._run_statements(self._split(code), on_progress)
+
+    def _run_statements(self, statements, on_progress):
+        self.result_sets = []
+        self.tables = []
+        output = []
+        for statement in statements:
+            try:
+                result_sets = self._execute_reconnecting(statement, on_progress)
+            except KeyboardInterrupt:
+                self.interrupted = True
+                self.cancel()
+                # The protocol state of the connection is unknown after being
+                # interrupted in the middle of a read, start a fresh one
+                self._restart_client()
+                self.error = True
+                self.errormsg = INTERRUPTED_ERROR
+                return self.errormsg
+            except pymysql.err.Error as exception:
+                self.error = True
+                # Errors raised by PyMySQL carry an (errno, message) tuple,
+                # keep only the message like MariaDBClient does
+                self.errormsg = (
+                    str(exception.args[-1]) if exception.args else str(exception)
+                )
+                if exception.args and exception.args[0] in _CONNECTION_ERRORS:
+                    self.log.error(
+                        f'MariaDB client failed to run command "{statement}". '
+                        f"The connection to the server was lost: {exception}"
+                    )
+                return self.errormsg
+            self.session.track_statement(statement)
+            self._capture_session()
+            self.result_sets.extend(
+                (description, rows) for description, _, rows in result_sets
+            )
+            output.append(self._render(statement, result_sets))
+
+        self.error = False
+        result = "\n".join(out for out in output if out)
+        if not result:
+            result = "Query OK"
+        self.output = result
+        return result
+
+    def decode(self, result):
+        result_sets = MariaDBClient.decode(self, result)
+        if result is not self.output or len(result_sets) != len(self.tables):
+            return result_sets
+
+        # The column types of the last statement are known, the values are
+        # converted according to them
+        typed = []
+        for result_set, types in zip(result_sets, self.tables):
+            columns = [
+                Column(column.name, column_type)
+                for column, column_type in zip(result_set.columns, types)
+            ]
+            typed.append(ResultSet(columns, result_set.values, result_set.size))
+        return typed
+
+    def run_batch(self, statements, timeout=-1, on_progress=None, on_result=None):
+        # There is no client process to save round trips to, the statements
+        # are sent one by one
+        results = []
+        with self.lock:
+            self.interrupted = False
+            for statement in statements:
+                start = time.monotonic()
+                result = self._run_statements([statement], on_progress)
+                # The protocol doesn't tell how long the statement took on
+                # the server
+                self.metrics = StatementMetrics(
+                    time.monotonic() - start, None, self.affected_rows, len(result)
+                )
+                results.append(result)
+                if on_result:
+                    on_result(result)
+                if self.interrupted:
+                    break
+        return results
+
+    async def _run_batch_async(self, statements, timeout, on_progress, on_result):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.run_batch, statements, timeout, on_progress, on_result
+        )
+
+    async def _run_statement_async(self, code, timeout, on_progress):
+        # PyMySQL only does blocking I/O, the statement runs in a worker
+        # thread while the event loop waits for it
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.run_statement, code, timeout, on_progress
+        )
@@ -0,0 +1,139 @@
+"""Breaks down the ANALYZE FORMAT=JSON output of a statement
+
+ANALYZE runs the statement and reports, next to the estimates of the
+optimizer, what actually happened at every step of the plan: how many
+times it ran (r_loops), how many rows it read (r_rows) and how long it
+took. The plan is a tree of query blocks, tables, sorts, temporary
+tables... which is flattened here into one row per operation, in the order
+of the plan, with the time of the operation as a share of the whole
+statement.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+from typing import List, NamedTuple, Optional
+
+import pandas
+
+from mariadb_kernel.result_set import Column, ResultSet
+
+# Keys only present in the objects of the plan that are operations
+_OPERATION_KEYS = ("r_loops", "r_rows", "rows", "r_total_time_ms", "r_table_time_ms")
+
+
+class Operation(NamedTuple):
+    name: str
+    # How deep in the plan the operation is, 0 for the outermost query
+    depth: int
+    loops: Optional[float]
+    estimated_rows: Optional[float]
+    actual_rows: Optional[float]
+    # Milliseconds, including the operations nested in this one
+    time_ms: Optional[float]
+    # Percentage of the rows read kept by the conditions
+    filtered: Optional[float]
+
+
+def _label(key, node):
+    label = key
+    if "select_id" in node:
+        label += f" #{node['select_id']}"
+    if "table_name" in node:
+        label += f" {node['table_name']}"
+    if "access_type" in node:
+        label += f" ({node['access_type']})"
+    return label
+
+
+def _time(node):
+    if "r_total_time_ms" in node:
+        return node["r_total_time_ms"]
+    times = [node[key] for key in ("r_table_time_ms", "r_other_time_ms") if key in node]
+    return sum(times) if times else None
+
+
+def _walk(key, value, depth, found):
+    if isinstance(value, list):
+        for item in value:
+            _walk(key, item, depth, found)
+        return
+    if not isinstance(value, dict):
+        return
+
+    if any(name in value for name in _OPERATION_KEYS):
+        found.append(
+            Operation(
+                _label(key, value),
+                depth,
+                value.get("r_loops"),
+                value.get("rows"),
+                value.get("r_rows"),
+                _time(value),
+                value.get("r_filtered"),
+            )
+        )
+        depth += 1
+    for child_key, child in value.items():
+        _walk(child_key, child, depth, found)
+
+
+def operations(plan) -> List[Operation]:
+    """Flattens the plan printed by ANALYZE FORMAT=JSON, parsed from JSON"""
+    found = []
+    for key, value in plan.items():
+        _walk(key, value, 0, found)
+    return found
+
+
+def most_expensive(found: List[Operation], count=3):
+    """The positions of the count operations that took the longest
+
+    Query blocks are left out, their time is the time of everything they
+    run.
+    """
+    timed = [
+        i
+        for i, operation in enumerate(found)
+        if operation.time_ms and not operation.name.startswith("query_block")
+    ]
+    return sorted(timed, key=lambda i: found[i].time_ms, reverse=True)[:count]
+
+
+def _format(value, digits=0):
+    if value is None:
+        return "NULL"
+    return f"{value:.{digits}f}"
+
+
+def breakdown(found: List[Operation]) -> ResultSet:
+    """One row per operation, ready to be displayed"""
+    total = max((operation.time_ms or 0 for operation in found), default=0)
+    rows = []
+    for operation in found:
+        share = None
+        if operation.time_ms is not None and total:
+            share = 100 * operation.time_ms / total
+        rows.append(
+            [
+                "  " * operation.depth + operation.name,
+                _format(operation.loops),
+                _format(operation.estimated_rows),
+                _format(operation.actual_rows),
+                _format(operation.filtered, 2),
+                _format(operation.time_ms, 3),
+                _format(share, 1),
+            ]
+        )
+
+    names = [
+        "operation",
+        "loops",
+        "estimated rows",
+        "actual rows",
+        "filtered %",
+        "time (ms)",
+        "time %",
+    ]
+    values = pandas.DataFrame(rows, columns=range(len(names)), dtype=object)
+    return ResultSet([Column(name) for name in names], values, 0)
@@ -0,0 +1,188 @@
+"""Kernel side cursors over the results displayed in the notebook
+
+A result set with more than a page of rows stays in the kernel (in
+memory, or on disk when it is large) behind a ResultCursor, and a frontend
+viewer fetches any page on demand through a comm opened on COMM_TARGET,
+without running the query again.
+
+The display data of such a result still holds the whole result, or its
+first and last rows when it is too large, as HTML for the frontends
+without a viewer. A MIME_TYPE entry next to it tells the viewer which
+cursor to open. The comm messages are:
+
+    {"id": ..., "cursor": ..., "offset": 0, "limit": 100,
+     "sort": <column index or null>, "ascending": true}
+
+and the kernel replies with
+
+    {"id": ..., "cursor": ..., "offset": 0, "total": 1000000,
+     "rows": [["1", "a"], ...]}
+
+or {"id": ..., "error": "..."} when the cursor is gone. Values are sent as
+the client printed them.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import collections
+import threading
+import uuid
+
+import numpy
+
+from mariadb_kernel.result_set import ResultSet
+
+COMM_TARGET = "mariadb_kernel.result_cursor"
+MIME_TYPE = "application/vnd.mariadb-kernel.result-cursor+json"
+
+
+class ResultCursor:
+    def __init__(self, result_set: ResultSet, spilled=None):
+        """spilled is the SpilledResult of result_set.values when on disk"""
+        self.id = uuid.uuid4().hex
+        self.columns = result_set.columns
+        self.total = len(result_set)
+        self.spilled = spilled
+        self.values = result_set.values if spilled is None else None
+        # Row positions sorted by (column, ascending), computed on demand
+        self.orders = {}
+
+    def _rows(self, positions):
+        if self.values is None:
+            # Only the chunks of the page are read back
+            return self.spilled.take(positions)
+        return self.values.iloc[positions]
+
+    def _column(self, column):
+        if self.values is None:
+            return self.spilled.column(column)
+        return self.values.iloc[:, [column]]
+
+    def release(self):
+        """Drops the spilled rows read back for the last page"""
+        if self.spilled is not None:
+            self.spilled.release()
+
+    def _order(self, column, ascending):
+        key = (column, ascending)
+        if key not in self.orders:
+            # Sort on the decoded values, so that numbers sort as numbers
+            decoded = ResultSet(
+                [self.columns[column]], self._column(column), 0
+            ).to_frame()
+            self.orders[key] = (
+                decoded.iloc[:, 0]
+                .sort_values(ascending=ascending, kind="stable", na_position="last")
+                .index.to_numpy()
+            )
+        return self.orders[key]
+
+    def page(self, offset, limit, sort=None, ascending=True):
+        """Returns limit rows starting at offset, sorted by the column at sort"""
+        if offset < 0 or limit < 0:
+            raise ValueError("The offset and limit of a page can't be negative")
+        if sort is not None and not 0 <= sort < len(self.columns):
+            raise ValueError(f"There is no column {sort} to sort by")
+
+        if sort is None:
+            positions = numpy.arange(
+                min(offset, self.total), min(offset + limit, self.total)
+            )
+        else:
+            positions = self._order(sort, ascending)[offset : offset + limit]
+        rows = self._rows(positions)
+        return {
+            "offset": offset,
+            "total": self.total,
+            "rows": rows.values.tolist(),
+        }
+
+    def describe(self, page_size):
+        """The MIME_TYPE data pointing the viewer to this cursor"""
+        return {
+            "cursor": self.id,
+            "columns": [column.name for column in self.columns],
+            "total": self.total,
+            "page_size": page_size,
+        }
+
+
+class ResultCursors:
+    """The cursors of the last results, served through a comm
+
+    Only the most recent `capacity` cursors are kept, the results of older
+    cells have to be run again to be browsed.
+    """
+
+    # The field of the requests naming what they are about
+    handle_field = "cursor"
+
+    def __init__(self, capacity, page_size):
+        self.capacity = capacity
+        self.page_size = page_size
+        self.cursors = collections.OrderedDict()
+        # The only cursor keeping spilled rows in memory, the one browsed
+        # last
+        self.loaded = None
+        self.lock = threading.Lock()
+
+    def add(self, cursor):
+        with self.lock:
+            self.cursors[cursor.id] = cursor
+            while len(self.cursors) > self.capacity:
+                self.cursors.popitem(last=False)
+
+    def get(self, cursor_id):
+        with self.lock:
+            cursor = self.cursors.get(cursor_id)
+            if cursor is not None:
+                self.cursors.move_to_end(cursor_id)
+            return cursor
+
+    def clear(self):
+        with self.lock:
+            self.cursors.clear()
+            self.loaded = None
+
+    def _load(self, cursor):
+        with self.lock:
+            if self.loaded is not cursor:
+                if self.loaded is not None:
+                    self.loaded.release()
+                self.loaded = cursor
+
+    def reply(self, request):
+        """Returns the reply to a page request"""
+        reply = {"id": request.get("id"), "cursor": request.get("cursor")}
+        cursor = self.get(request.get("cursor"))
+        if cursor is None:
+            reply["error"] = "The result is no longer available, run the cell again"
+            return reply
+
+        try:
+            self._load(cursor)
+            sort = request.get("sort")
+            reply.update(
+                cursor.page(
+                    int(request.get("offset", 0)),
+                    int(request.get("limit", self.page_size)),
+                    None if sort is None else int(sort),
+                    bool(request.get("ascending", True)),
+                )
+            )
+        except (ValueError, TypeError) as exception:
+            reply["error"] = str(exception)
+        return reply
+
+    def open_comm(self, comm, msg):
+        """Handler of the comms opened on COMM_TARGET"""
+
+        def on_msg(msg):
+            comm.send(self.reply(msg["content"]["data"]))
+
+        comm.on_msg(on_msg)
+        request = msg["content"]["data"]
+        if request and request.get(self.handle_field):
+            # The first page can be asked for when opening the comm
+            comm.send(self.reply(request))
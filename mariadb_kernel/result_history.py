@@ -0,0 +1,116 @@
+"""Keeps the recent results of the session for the magic commands
+
+Every result set displayed by a cell is kept in the history under the
+execution count of the cell and the position of its statement in the cell,
+so that magic commands can work on an earlier result without running its
+query again:
+
+    %bar Out[12] x=name y=total     the last result of cell 12
+    %df Out[12][0] first.csv        the result of the first statement
+
+The results are kept as LazyFrames. When the ones in memory go over the
+memory budget, the least recently used are written to disk, and only the
+most recent `capacity` results are kept at all.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import collections
+import re
+import threading
+
+from mariadb_kernel import result_spill
+
+_REFERENCE = re.compile(r"(?:^|\s)Out\[(\d+)\](?:\[(\d+)\])?(?=\s|$)")
+
+
+def split_reference(args):
+    """Splits a reference like Out[12] or Out[12][1] out of magic arguments
+
+    Returns (execution count, statement index or None) or None when args
+    holds no reference, along with the rest of args.
+    """
+    match = _REFERENCE.search(args)
+    if not match:
+        return None, args
+
+    index = None if match.group(2) is None else int(match.group(2))
+    rest = args[: match.start()] + args[match.end() :]
+    return (int(match.group(1)), index), rest.strip()
+
+
+def load(data, args):
+    """Returns the DataFrame the arguments of a magic refer to
+
+    That is last_select, or the result of the history they reference.
+    Raises LookupError when the referenced result is not in the history.
+    Returns the rest of args too.
+    """
+    reference, args = split_reference(args)
+    if reference is None:
+        return result_spill.load(data["last_select"]), args
+
+    history = data.get("history")
+    if history is None:
+        raise LookupError("There is no result history in this session")
+    return result_spill.load(history.get(*reference)), args
+
+
+class ResultHistory:
+    def __init__(self, capacity, max_bytes):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        # (execution count, statement index) -> LazyFrame, least recently
+        # used first
+        self.results = collections.OrderedDict()
+        # Size of the results that are in memory
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _in_memory(self, result):
+        return 0 if result.spilled is not None else result.size
+
+    def add(self, execution_count, index, result):
+        with self.lock:
+            key = (execution_count, index)
+            if key in self.results:
+                self.size -= self._in_memory(self.results.pop(key))
+            self.results[key] = result
+            self.size += self._in_memory(result)
+
+            while len(self.results) > self.capacity:
+                _, dropped = self.results.popitem(last=False)
+                self.size -= self._in_memory(dropped)
+            self._spill()
+
+    def _spill(self):
+        # The most recent result stays in memory, whatever its size
+        for result in list(self.results.values())[:-1]:
+            if self.size <= self.max_bytes:
+                break
+            if result.spilled is None:
+                self.size -= result.size
+                result.spill()
+
+    def get(self, execution_count, index=None):
+        """Returns the result of statement index of a cell, its last by default"""
+        with self.lock:
+            if index is None:
+                keys = [key for key in self.results if key[0] == execution_count]
+                key = max(keys, default=None, key=lambda key: key[1])
+            else:
+                key = (execution_count, index)
+            if key not in self.results:
+                name = f"Out[{execution_count}]"
+                if index is not None:
+                    name += f"[{index}]"
+                raise LookupError(f"{name} is not in the result history")
+
+            self.results.move_to_end(key)
+            return self.results[key]
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.size = 0
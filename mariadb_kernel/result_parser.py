@@ -0,0 +1,138 @@
+"""Parser for the tab separated output of the MariaDB command line client
+
+When the kernel is configured with `"result_format": "tsv"`, the client is
+started with `-s --column-type-info` instead of `-s -H`. Every result set
+is then printed as a block of column metadata followed by the rows, one row
+per line and the values separated by tabs:
+
+Field   1:  `a`
+Catalog:    `def`
+...
+Type:       LONGLONG
+...
+
+a
+1
+
+The rows are decoded with the C parser of pandas straight into columnar
+arrays, HTML is only generated when the result is displayed.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import csv
+import io
+import re
+from typing import List
+
+import pandas
+
+from mariadb_kernel.result_set import Column, ResultSet
+
+_FIELD = re.compile(r"^Field\s+\d+:\s+`(.*)`$", re.MULTILINE)
+_TYPE = re.compile(r"^Type:\s+(\w+)", re.MULTILINE)
+_FLAGS = re.compile(r"^Flags:(.*)$", re.MULTILINE)
+_RESULT_SET_START = re.compile(r"^(?=Field\s+1:\s+`)", re.MULTILINE)
+# The empty line that ends the last column block of a result set
+_ROWS_START = re.compile(r"\n\r?\n(?!Field\s+\d+:)")
+
+# The client escapes these characters when printing tab separated values
+_ESCAPED = re.compile(r"\\([0tn\\])")
+_UNESCAPE = {"0": "\0", "t": "\t", "n": "\n", "\\": "\\"}
+
+
+def is_result_set(output):
+    return output.startswith("Field ")
+
+
+def _split_metadata(result_set):
+    """Splits a result set into its list of columns and its tab separated rows"""
+    # Each column block ends with an empty line, the rows come after the last one
+    blocks = result_set.split("\n\n")
+    columns = []
+    for i, block in enumerate(blocks):
+        field = _FIELD.search(block)
+        if not field:
+            return columns, "\n\n".join(blocks[i:])
+        column_type = _TYPE.search(block).group(1)
+        flags = _FLAGS.search(block)
+        # ENUM columns are reported as strings flagged ENUM
+        if flags and "ENUM" in flags.group(1).split():
+            column_type = "ENUM"
+        columns.append(Column(field.group(1), column_type))
+    return columns, ""
+
+
+def _unescape(frame):
+    for name, column in frame.items():
+        if not pandas.api.types.is_string_dtype(column):
+            continue
+        if column.str.contains("\\", regex=False).any():
+            frame[name] = column.str.replace(
+                _ESCAPED, lambda m: _UNESCAPE[m.group(1)], regex=True
+            )
+    return frame
+
+
+def _read_rows(columns, rows):
+    # The first line holds the column names, which were already read
+    # (unescaped) from the metadata. The values are kept as printed, they
+    # are converted according to the types of their columns afterwards
+    frame = pandas.read_csv(
+        io.StringIO(rows),
+        sep="\t",
+        engine="c",
+        quoting=csv.QUOTE_NONE,
+        skip_blank_lines=False,
+        keep_default_na=False,
+        na_filter=False,
+        dtype=str,
+        names=range(len(columns)),
+        skiprows=1,
+    )
+    return _unescape(frame)
+
+
+def _result_sets(output):
+    output = output.replace("\r\n", "\n")
+    return [result_set for result_set in _RESULT_SET_START.split(output) if result_set]
+
+
+def parse(output) -> List[pandas.DataFrame]:
+    """Parses the output of the client into one DataFrame per result set
+
+    The values are converted according to the types of their columns.
+    """
+    return [result_set.to_frame() for result_set in decode(output)]
+
+
+def decode(output) -> List[ResultSet]:
+    """Decodes the output of the client into one ResultSet per result set"""
+    result_sets = []
+    for result_set in _result_sets(output):
+        columns, rows = _split_metadata(result_set)
+        values = _read_rows(columns, rows)
+        result_sets.append(ResultSet(columns, values, len(result_set)))
+    return result_sets
+
+
+def preview(output, max_rows):
+    """Cuts a partially received output after its first max_rows rows
+
+    Returns the cut output along with the number of complete rows received
+    so far.
+    """
+    rows_start = _ROWS_START.search(output)
+    if not rows_start:
+        return "", 0
+
+    # Skip the line holding the column names
+    end = output.find("\n", rows_start.end())
+    if end == -1:
+        return "", 0
+
+    rows = output.count("\n", end + 1)
+    for _ in range(min(rows, max_rows)):
+        end = output.index("\n", end + 1)
+    return output[: end + 1], rows
@@ -0,0 +1,308 @@
+"""Result sets decoded once and shared by everything that uses them
+
+A statement output is decoded into ResultSet objects in a single pass. A
+ResultSet holds the columns of the result set and its values as the client
+printed them. The DataFrame of the result set (e.g. for last_select) and
+the HTML table displayed in the notebook are both built from it, so the
+output of the client never needs to be parsed twice.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+from decimal import Decimal
+from html import escape, unescape
+from typing import List, NamedTuple, Optional
+import weakref
+
+import pandas
+
+from mariadb_kernel.result_spill import SpilledResult
+
+# Result sets are displayed as tables of this class, styled by RESULT_STYLE
+RESULT_CLASS = "mariadb-result"
+RESULT_STYLE = (
+    "<style>"
+    f"table.{RESULT_CLASS}{{margin-left:0}}"
+    f"table.{RESULT_CLASS} th,table.{RESULT_CLASS} td"
+    "{text-align:left;white-space:pre}"
+    f"table.{RESULT_CLASS} tr.highlighted td{{background-color:#fde2e1}}"
+    "</style>"
+)
+STYLED_TABLE = f'<table border="1" class="{RESULT_CLASS}">'
+
+# Column types, as named by the client (mysql --column-type-info)
+_INTEGER_TYPES = {"TINY", "SHORT", "LONG", "LONGLONG", "INT24", "YEAR"}
+_FLOAT_TYPES = {"FLOAT", "DOUBLE"}
+_DECIMAL_TYPES = {"DECIMAL", "NEWDECIMAL"}
+_DATETIME_TYPES = {"DATE", "NEWDATE", "DATETIME", "TIMESTAMP"}
+NUMERIC_TYPES = _INTEGER_TYPES | _FLOAT_TYPES | _DECIMAL_TYPES
+
+# Table Schema types of the DataFrame dtype kinds sent as JSON values
+_FIELD_TYPES = {"b": "boolean", "i": "integer", "u": "integer", "f": "number"}
+# Table Schema types of the columns sent as printed, anything else is a string
+_SCHEMA_TYPES = {
+    "DECIMAL": "number",
+    "NEWDECIMAL": "number",
+    "DATE": "date",
+    "NEWDATE": "date",
+    "DATETIME": "datetime",
+    "TIMESTAMP": "datetime",
+    "TIME": "time",
+}
+
+
+class Column(NamedTuple):
+    name: str
+    # The type reported by the server, None when the output doesn't say
+    type: Optional[str] = None
+
+
+def rows_to_keep(rows, size, max_rows, max_bytes):
+    """How many of the rows of a result set of size bytes can be displayed"""
+    keep = min(rows, max_rows)
+    if size > max_bytes:
+        # Assume rows of about the same size
+        keep = min(keep, rows * max_bytes // size)
+    return max(keep, 2)
+
+
+def _integers(column):
+    strings = column.astype("string")
+    try:
+        return strings.astype("Int64")
+    except OverflowError:
+        # BIGINT UNSIGNED
+        return strings.astype("UInt64")
+
+
+def _decode_column(column, column_type):
+    """Converts a column of printed values, NULLs already NaN, to its type
+
+    Without the type of the column (e.g. `mysql -H` doesn't print them),
+    the column is converted to numbers when all its values are numbers.
+    """
+    if column_type is None:
+        try:
+            return pandas.to_numeric(column)
+        except (ValueError, TypeError):
+            return column
+
+    if column_type in _INTEGER_TYPES:
+        return _integers(column)
+    if column_type in _FLOAT_TYPES:
+        return column.astype("float64")
+    if column_type in _DECIMAL_TYPES:
+        # Exact, floats would round them
+        return column.map(Decimal, na_action="ignore")
+    if column_type in _DATETIME_TYPES:
+        # Zero dates (0000-00-00) are NaT
+        return pandas.to_datetime(column, format="ISO8601", errors="coerce")
+    if column_type == "TIME":
+        return pandas.to_timedelta(column, errors="coerce")
+    if column_type == "ENUM":
+        return column.astype("category")
+    return column
+
+
+class ResultSet:
+    def __init__(self, columns: List[Column], values: pandas.DataFrame, size):
+        self.columns = columns
+        # One column of strings per column of the result set, the values
+        # exactly as printed by the client (NULL included)
+        self.values = values
+        # Size of the output the result set was decoded from
+        self.size = size
+
+    def __len__(self):
+        return len(self.values)
+
+    def to_frame(self):
+        """Returns the result set as a DataFrame, NULLs and numbers decoded"""
+        columns = []
+        for i, result_column in enumerate(self.columns):
+            column = self.values.iloc[:, i]
+            column = _decode_column(column.where(column != "NULL"), result_column.type)
+            columns.append(column.reset_index(drop=True))
+
+        frame = pandas.concat(columns, axis=1) if columns else pandas.DataFrame()
+        frame.columns = [column.name for column in self.columns]
+        return frame
+
+    def head_and_tail(self, keep):
+        """The first and last of keep rows, with a row of "..." between them"""
+        if keep >= len(self.values):
+            return self
+        head = (keep + 1) // 2
+        ellipsis = pandas.DataFrame(
+            [["..."] * len(self.values.columns)], columns=self.values.columns
+        )
+        values = pandas.concat(
+            [
+                self.values.iloc[:head],
+                ellipsis,
+                self.values.iloc[len(self.values) - (keep - head) :],
+            ],
+            ignore_index=True,
+        )
+        return ResultSet(self.columns, values, self.size)
+
+    def _html_rows(self, rows, highlight):
+        for i, row in enumerate(rows.itertuples(index=False, name=None)):
+            yield '<tr class="highlighted"><td>' if i in highlight else "<tr><td>"
+            yield "</td><td>".join(escape(value) for value in row)
+            yield "</td></tr>"
+
+    def to_html(self, limit=None, highlight=()):
+        """Renders the result set as a table for display
+
+        When limit is given, only the first limit rows are rendered. The
+        rows at the positions in highlight stand out.
+        """
+        out = [f"{STYLED_TABLE}<tr>"]
+        out.extend(f"<th>{escape(column.name)}</th>" for column in self.columns)
+        out.append("</tr>")
+        rows = self.values if limit is None else self.values.iloc[:limit]
+        out.extend(self._html_rows(rows, set(highlight)))
+        out.append("</table>")
+        return "".join(out)
+
+    def to_text(self, limit=None):
+        """Renders the result set as a fixed-width table, like the client does"""
+        values = self.values if limit is None else self.values.iloc[:limit]
+        if not self.columns:
+            return ""
+
+        names = []
+        cells = None
+        borders = []
+        for i, column in enumerate(self.columns):
+            width = len(column.name)
+            if len(values):
+                width = max(width, values.iloc[:, i].str.len().max())
+            names.append(column.name.ljust(width))
+            padded = values.iloc[:, i].str.ljust(width)
+            cells = padded if cells is None else cells + " | " + padded
+            borders.append("-" * (width + 2))
+
+        border = "+" + "+".join(borders) + "+"
+        lines = [border, "| " + " | ".join(names) + " |", border]
+        lines.extend("| " + cells + " |")
+        lines.append(border)
+        return "\n".join(lines)
+
+    def to_dataresource(self, limit=None):
+        """Renders the result set as a Tabular Data Resource for data grids"""
+        rows = (
+            self
+            if limit is None
+            else ResultSet(self.columns, self.values.iloc[:limit], 0)
+        )
+        frame = rows.to_frame()
+        fields = []
+        columns = []
+        for i, (column, dtype) in enumerate(zip(self.columns, frame.dtypes)):
+            if dtype.kind in _FIELD_TYPES:
+                # Numbers are sent as JSON numbers
+                field_type = _FIELD_TYPES[dtype.kind]
+                values = frame.iloc[:, i].astype(object)
+            else:
+                # Anything else as printed, decimals keep their digits
+                field_type = _SCHEMA_TYPES.get(column.type, "string")
+                values = rows.values.iloc[:, i].astype(object)
+                values = values.where(values != "NULL")
+            fields.append({"name": column.name, "type": field_type})
+            # Missing values only become None in object columns, string
+            # columns would keep them as NaN, which isn't valid JSON
+            columns.append(values.where(values.notna(), None).tolist())
+
+        names = [column.name for column in self.columns]
+        data = [dict(zip(names, row)) for row in zip(*columns)]
+        return {"schema": {"fields": fields}, "data": data}
+
+
+class LazyFrame:
+    """The DataFrame of a result set, built the first time it is asked for
+
+    Most results are never read back by a magic command, so only the
+    decoded values are kept until then. spilled is given when the values
+    were written to disk (a SpilledResult of result_set.values), they are
+    then read back from there instead of being kept in memory.
+    """
+
+    def __init__(self, result_set: ResultSet, spilled=None):
+        self.rows = len(result_set)
+        self.columns = [column.name for column in result_set.columns]
+        self.empty = self.rows == 0 or not self.columns
+        # Size of the output of the result set, what keeping it in memory
+        # costs give or take
+        self.size = result_set.size
+        self.frame = None
+        # The frame built from the spilled values, while it is still in use
+        self.decoded = None
+        self.spilled = spilled
+        # Whether the spilled values are the DataFrame itself
+        self.spilled_frame = False
+        self.result_set = result_set
+        if spilled is not None:
+            self.result_set = ResultSet(result_set.columns, None, result_set.size)
+
+    def spill(self):
+        """Moves the values to disk, they are read back from there from now on"""
+        if self.spilled is not None:
+            return
+        if self.frame is not None:
+            self.spilled = SpilledResult(self.frame)
+            self.spilled_frame = True
+            self.frame = None
+        else:
+            self.spilled = SpilledResult(self.result_set.values)
+            self.result_set = ResultSet(self.result_set.columns, None, self.size)
+
+    def to_frame(self):
+        if self.spilled is not None:
+            # Not kept around, that would defeat the spilling, but not built
+            # again while the last one is in use either
+            values = self.spilled.to_frame()
+            if self.spilled_frame:
+                return values
+            frame = self.decoded() if self.decoded is not None else None
+            if frame is None:
+                frame = ResultSet(self.result_set.columns, values, 0).to_frame()
+                self.decoded = weakref.ref(frame)
+            return frame
+
+        if self.frame is None:
+            self.frame = self.result_set.to_frame()
+            # The values are in the frame now
+            self.result_set = None
+        return self.frame
+
+
+def _split_cells(row, cell):
+    # A row looks like <TR><TD>1</TD><TD>2</TD>, its </TR> already cut
+    start = row.index("<TR>") + len(f"<TR><{cell}>")
+    return row[start : -len(f"</{cell}>")].split(f"</{cell}><{cell}>")
+
+
+def decode_html(output) -> List[ResultSet]:
+    """Decodes the tables printed by `mysql -H` in one pass"""
+    result_sets = []
+    for table in output.split("<TABLE BORDER=1>")[1:]:
+        table = table[: table.index("</TABLE>")]
+        rows = table.split("</TR>")[:-1]
+        names = [unescape(name) for name in _split_cells(rows[0], "TH")]
+        values = pandas.DataFrame(
+            [_split_cells(row, "TD") for row in rows[1:]],
+            columns=range(len(names)),
+            dtype=object,
+        )
+        for i in values:
+            # The client escapes the values, which is rare enough to only
+            # be undone on the columns that need it
+            if values[i].str.contains("&", regex=False).any():
+                values[i] = values[i].map(unescape)
+        result_sets.append(
+            ResultSet([Column(name) for name in names], values, len(table))
+        )
+    return result_sets
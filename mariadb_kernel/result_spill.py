@@ -0,0 +1,119 @@
+"""Keeps large result sets on disk instead of in the kernel memory
+
+A SpilledResult writes the DataFrame of a result set into a temporary file
+and only loads it back when a magic command (e.g. %df, %bar) asks for it.
+The file is a sequence of uncompressed pickles of CHUNK_ROWS rows each, so
+that the pages of a result viewer are read back without the other rows: a
+page only loads the chunks it spans, a column is read one chunk at a time.
+Magic commands still get the whole DataFrame.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import os
+import pickle
+import tempfile
+import weakref
+
+import numpy
+import pandas
+
+# Rows pickled together, the smallest part of the file read back
+CHUNK_ROWS = 10000
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpilledResult:
+    def __init__(self, frame, directory=None, chunk_rows=CHUNK_ROWS):
+        self.rows = len(frame)
+        self.columns = list(frame.columns)
+        self.empty = frame.empty
+        self.chunk_rows = chunk_rows
+
+        fd, self.path = tempfile.mkstemp(prefix="mariadb_kernel_result_", dir=directory)
+        os.close(fd)
+        # The file goes away with the object, e.g. when the next result
+        # replaces it
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+        # The frame last read back, as long as something still uses it
+        self._loaded = None
+        # (number, DataFrame) of the chunk last read, until release()
+        self._chunk = None
+
+        # Where every chunk starts in the file, an empty frame still has
+        # one to keep its columns
+        self.offsets = []
+        with open(self.path, "wb") as file:
+            for start in range(0, max(self.rows, 1), chunk_rows):
+                self.offsets.append(file.tell())
+                pickle.dump(
+                    frame.iloc[start : start + chunk_rows],
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+    def _read_chunk(self, number):
+        with open(self.path, "rb") as file:
+            file.seek(self.offsets[number])
+            return pickle.load(file)
+
+    def chunk(self, number):
+        if self._chunk is None or self._chunk[0] != number:
+            self._chunk = (number, self._read_chunk(number))
+        return self._chunk[1]
+
+    def release(self):
+        """Forgets the chunk last read"""
+        self._chunk = None
+
+    def take(self, positions):
+        """The rows at positions, reading only the chunks they are in"""
+        positions = numpy.asarray(positions, dtype=numpy.int64)
+        chunks = positions // self.chunk_rows
+        # Each chunk is read once, the rows are put back in order after
+        by_chunk = numpy.argsort(chunks, kind="stable")
+        positions, chunks = positions[by_chunk], chunks[by_chunk]
+        parts = []
+        for number in numpy.unique(chunks):
+            in_chunk = positions[chunks == number] - number * self.chunk_rows
+            parts.append(self.chunk(int(number)).iloc[in_chunk])
+        if not parts:
+            return self.chunk(0).iloc[:0]
+        return pandas.concat(parts).iloc[numpy.argsort(by_chunk)]
+
+    def column(self, index):
+        """The column at index as a DataFrame, read one chunk at a time"""
+        return pandas.concat(
+            self._read_chunk(number).iloc[:, [index]]
+            for number in range(len(self.offsets))
+        )
+
+    def to_frame(self):
+        frame = self._loaded() if self._loaded is not None else None
+        if frame is None:
+            frame = pandas.concat(
+                self._read_chunk(number) for number in range(len(self.offsets))
+            )
+            self._loaded = weakref.ref(frame)
+        return frame
+
+    def close(self):
+        self._finalizer()
+
+
+def load(result):
+    """Returns the DataFrame of a result, whether it was spilled or not
+
+    result is either a DataFrame or an object standing in for one, which
+    builds it with to_frame() (e.g. SpilledResult, LazyFrame).
+    """
+    if isinstance(result, pandas.DataFrame):
+        return result
+    return result.to_frame()
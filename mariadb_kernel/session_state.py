@@ -0,0 +1,156 @@
+"""Tracks the session state that is lost when the client reconnects
+
+The server forgets everything about a session when its connection drops:
+the current database, the session variables and the user variables set by
+the notebook. The command line client also forgets its delimiter when it is
+restarted. SessionState watches the statements that ran successfully and
+gives back the statements that bring a new session to the same state.
+
+Evaluating the expression a variable was set to again on the new session
+doesn't give back its value (`SET @n = @n + 1`, `SET @start = NOW()`), so
+the values themselves are fetched from the server right after the SET ran
+and replayed as literals.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import re
+
+import sqlparse
+
+_USE = re.compile(r"^use\s+(`[^`]+`|\S+?)\s*;?$", re.IGNORECASE | re.DOTALL)
+_DELIMITER = re.compile(r"^delimiter\s+(\S+)", re.IGNORECASE)
+_SET = re.compile(r"^set\s+(.+?)\s*;?$", re.IGNORECASE | re.DOTALL)
+_SET_NAMES = re.compile(r"^(names|character\s+set|charset)\b", re.IGNORECASE)
+# SET statements that don't change the state of the session
+_SET_IGNORED = re.compile(
+    r"^(global\b|@@global\.|transaction\b|password\b|role\b|default\s+role\b|"
+    r"statement\b)",
+    re.IGNORECASE,
+)
+# A number as printed by the server, replayed unquoted to keep its type
+_NUMBER = r"^-?(0|[1-9][0-9]*)(\\.[0-9]+)?(e[-+]?[0-9]+)?$"
+_ASSIGNMENT = re.compile(
+    r"^(?:session\s+|local\s+)?(@@(?:session\.|local\.)?)?(@?[\w$.`]+)\s*:?=\s*(.+)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _split_assignments(assignments):
+    """Splits `a = 1, @b = f(1, 2)` on the commas outside of quotes and parentheses"""
+    parts = []
+    start = depth = 0
+    quote = None
+    for i, char in enumerate(assignments):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(assignments[start:i].strip())
+            start = i + 1
+    parts.append(assignments[start:].strip())
+    return parts
+
+
+class SessionState:
+    def __init__(self):
+        self.database = None
+        self.delimiter = ";"
+        # The SET NAMES or SET CHARACTER SET statement that ran last
+        self.names = None
+        # The value of every variable set as a SQL literal, None until it
+        # was fetched from the server
+        self.variables = {}
+
+    def _track_set(self, assignments):
+        if _SET_IGNORED.match(assignments):
+            return
+
+        if _SET_NAMES.match(assignments):
+            self.names = assignments
+            return
+
+        for assignment in _split_assignments(assignments):
+            match = _ASSIGNMENT.match(assignment)
+            if not match:
+                continue
+            name = match.group(2)
+            if not name.startswith("@"):
+                # System variables are case insensitive
+                name = f"@@{name.lower()}"
+            self.variables[name] = None
+
+    def track_statement(self, statement):
+        """Remembers the changes of state made by a single statement"""
+        statement = statement.strip()
+        match = _USE.match(statement)
+        if match:
+            self.database = match.group(1)
+            return
+        match = _SET.match(statement)
+        if match:
+            self._track_set(match.group(1))
+
+    def track(self, code, delimiter=";"):
+        """Remembers the changes of state made by code, which ran successfully"""
+        code = code.strip()
+        match = _DELIMITER.match(code)
+        if match:
+            self.delimiter = match.group(1)
+            return
+
+        if delimiter == ";":
+            statements = sqlparse.split(code)
+        else:
+            statements = code.split(delimiter)
+        for statement in statements:
+            self.track_statement(statement)
+
+    def capture_query(self):
+        """The SELECT returning the values not fetched yet, None if there aren't any
+
+        Every column is the value of a variable as a SQL literal, in the
+        order of uncaptured().
+        """
+        names = self.uncaptured()
+        if not names:
+            return None
+        literals = [
+            f"IF({name} IS NULL, 'NULL', "
+            f"IF({name} REGEXP '{_NUMBER}', {name}, QUOTE({name})))"
+            for name in names
+        ]
+        return f"SELECT {', '.join(literals)}"
+
+    def uncaptured(self):
+        """The variables whose values weren't fetched yet"""
+        return [name for name, value in self.variables.items() if value is None]
+
+    def captured(self, values):
+        """Stores the values returned by the capture_query() SELECT"""
+        for name, value in zip(self.uncaptured(), values):
+            self.variables[name] = value
+
+    def statements(self):
+        """The statements that restore the state on a new session
+
+        They all end with a ";", so they need to run before the delimiter
+        is changed.
+        """
+        statements = []
+        if self.database:
+            statements.append(f"USE {self.database};")
+        if self.names:
+            statements.append(f"SET {self.names};")
+        # Variables whose value couldn't be fetched aren't restored
+        for name, value in self.variables.items():
+            if value is not None:
+                statements.append(f"SET {name} = {value};")
+        return statements
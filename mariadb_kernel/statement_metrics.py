@@ -0,0 +1,85 @@
+"""Measures of the statements run by the cells
+
+The clients record, for every statement of a cell, the time it took as
+seen from the kernel and the size of its output. The native client also
+knows the number of rows the statement changed, the command line client
+doesn't print it. The kernel adds the number of rows returned once the
+output is decoded.
+
+The metrics of a statement are attached to the metadata of its display
+data, and their totals for the cell to the metadata of the execute_reply,
+both under the "mariadb_kernel" key.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+from typing import List, NamedTuple, Optional
+
+
+def _plural(count, noun):
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+
+def _size(size):
+    if size < 1024:
+        return _plural(size, "byte")
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+class StatementMetrics(NamedTuple):
+    # Seconds from sending the statement to receiving all of its output
+    wall_time: float
+    # Seconds the statement took by the clock of the server, None when the
+    # client can't tell
+    server_time: Optional[float] = None
+    # Rows inserted, updated or deleted, None for statements returning rows
+    affected_rows: Optional[int] = None
+    # Size of the output of the statement
+    bytes: int = 0
+    # Rows returned, None for statements that don't return a result set
+    rows: Optional[int] = None
+
+    def to_dict(self):
+        # pylint doesn't see the members NamedTuple adds to the class
+        return self._asdict()  # pylint: disable=no-member
+
+    def footer(self):
+        """A line like the one the command line client prints after a statement"""
+        if self.rows is not None:
+            summary = f"{_plural(self.rows, 'row')} in set"
+        elif self.affected_rows is not None:
+            summary = f"Query OK, {_plural(self.affected_rows, 'row')} affected"
+        else:
+            summary = "Query OK"
+
+        details = [f"{self.wall_time:.3f} sec"]
+        if self.server_time is not None:
+            details.append(f"server {self.server_time:.3f} sec")
+        details.append(_size(self.bytes))
+        return f"{summary} ({', '.join(details)})"
+
+
+def _total(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+def summarize(metrics: List[StatementMetrics]):
+    """The totals of the metrics of the statements of a cell"""
+    if not metrics:
+        return None
+
+    slowest = max(range(len(metrics)), key=lambda i: metrics[i].wall_time)
+    return {
+        "statements": len(metrics),
+        "wall_time": sum(statement.wall_time for statement in metrics),
+        "server_time": _total(statement.server_time for statement in metrics),
+        "affected_rows": _total(statement.affected_rows for statement in metrics),
+        "bytes": sum(statement.bytes for statement in metrics),
+        "rows": _total(statement.rows for statement in metrics),
+        # Position of the statement that took the longest in the cell
+        "slowest_statement": slowest,
+    }
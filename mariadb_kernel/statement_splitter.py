@@ -0,0 +1,155 @@
+"""Splits the SQL code of a cell into statements
+
+The splitter follows the rules of the mysql command line client: the
+delimiter is ignored inside quoted strings, identifiers and comments, and
+a DELIMITER line changes it for the rest of the cell. On top of that, with
+the default ";" delimiter, the ";" inside BEGIN ... END blocks and CASE
+statements don't end the statement, so stored programs can be created
+without changing the delimiter first.
+"""
+
+# Copyright (c) MariaDB Foundation.
+# Distributed under the terms of the Modified BSD License.
+
+import re
+from typing import List, NamedTuple
+
+_DELIMITER_COMMAND = re.compile(r"delimiter[ \t]+(\S+)[^\n]*(\n|$)", re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z0-9_$]+")
+_NEXT_WORD = re.compile(r"\s*([A-Za-z_]+|;)?")
+# END IF, END LOOP... close blocks whose start isn't tracked
+_END_OF_UNTRACKED = {"IF", "LOOP", "WHILE", "REPEAT", "FOR"}
+# The words that can follow END to name the block it closes
+_END_QUALIFIERS = _END_OF_UNTRACKED | {"CASE"}
+
+
+class Statement(NamedTuple):
+    sql: str
+    # The delimiter the statement was terminated with in the cell
+    delimiter: str
+
+
+class SplitCode(NamedTuple):
+    statements: List[Statement]
+    # The code left after the last delimiter, e.g. an unterminated statement
+    remainder: str
+    # The delimiter in effect at the end of the code
+    delimiter: str
+
+
+def _string_end(code, start):
+    """Returns the index after the quoted string or identifier at start"""
+    quote = code[start]
+    i = start + 1
+    while i < len(code):
+        char = code[i]
+        if char == "\\" and quote != "`":
+            i += 2
+            continue
+        if char == quote:
+            # A doubled quote stands for the quote itself
+            if code.startswith(quote, i + 1):
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return len(code)
+
+
+def _line_comment_at(code, i):
+    if code[i] == "#":
+        return True
+    # "--" only starts a comment when followed by a space or a control char
+    return code.startswith("--", i) and (i + 2 == len(code) or code[i + 2] in " \t\r\n")
+
+
+def _next_word(code, i):
+    return (_NEXT_WORD.match(code, i).group(1) or "").upper()
+
+
+def split(code, delimiter=";") -> SplitCode:
+    """Splits code into statements
+
+    The statements are returned without their delimiter and without the
+    line comments around them.
+    """
+    statements = []
+    # Where the code of the current statement starts and ends, None while
+    # only whitespace and line comments were seen
+    start = end = None
+    depth = 0
+    previous_word = ""
+    i = 0
+    while i < len(code):
+        char = code[i]
+
+        # The DELIMITER command can only come where a statement starts
+        if start is None and char in "dD":
+            command = _DELIMITER_COMMAND.match(code, i)
+            if command and (i == 0 or code[i - 1].isspace()):
+                delimiter = command.group(1)
+                i = command.end()
+                continue
+
+        if depth == 0 and code.startswith(delimiter, i):
+            if start is not None:
+                statements.append(Statement(code[start:end], delimiter))
+            start = end = None
+            previous_word = ""
+            i += len(delimiter)
+            continue
+
+        if char.isspace():
+            i += 1
+            continue
+
+        if _line_comment_at(code, i):
+            newline = code.find("\n", i)
+            i = len(code) if newline == -1 else newline + 1
+            continue
+
+        if start is None:
+            start = i
+
+        if char in "'\"`":
+            i = _string_end(code, i)
+        elif code.startswith("/*", i):
+            comment_end = code.find("*/", i + 2)
+            i = len(code) if comment_end == -1 else comment_end + 2
+        elif _WORD.match(char):
+            word_end = _WORD.match(code, i).end()
+            # The delimiter may be made of word characters, e.g. $$
+            delimiter_start = code.find(delimiter, i + 1, word_end + len(delimiter))
+            if delimiter_start != -1 and delimiter_start < word_end:
+                word_end = delimiter_start
+            word = code[i:word_end].upper()
+            if delimiter == ";":
+                depth = _block_depth(code, word_end, word, previous_word, depth)
+            previous_word = word
+            i = word_end
+        else:
+            i += 1
+        end = i
+
+    remainder = code[start:end] if start is not None else ""
+    return SplitCode(statements, remainder, delimiter)
+
+
+def _block_depth(code, word_end, word, previous_word, depth):
+    """Updates the depth of the BEGIN ... END blocks with the word just read"""
+    if word == "BEGIN":
+        following = _next_word(code, word_end)
+        # BEGIN; and BEGIN WORK start a transaction, not a block
+        if following in ("", ";", "WORK") or previous_word == "XA":
+            return depth
+        return depth + 1
+    if word in _END_QUALIFIERS and previous_word == "END":
+        # END already closed the block, e.g. END CASE
+        return depth
+    if word == "CASE":
+        return depth + 1
+    if word == "END" and depth > 0:
+        if _next_word(code, word_end) in _END_OF_UNTRACKED:
+            return depth
+        return depth - 1
+    return depth
@@ -21,6 +21,8 @@ def mariadb_server():
     server.stop()
 
 
-@pytest.fixture(params=["line", "bar", "pie", "df", "lsmagic", "load"])
+@pytest.fixture(
+    params=["line", "bar", "pie", "df", "lsmagic", "load", "browse", "profile"]
+)
 def magic_cmd(request):
     return request.param
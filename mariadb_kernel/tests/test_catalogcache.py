@@ -0,0 +1,144 @@
+from unittest.mock import Mock
+
+from ..code_completion import schema_fingerprint
+from ..code_completion.autocompleter import Refresher
+from ..code_completion.catalog_cache import CatalogCache, StaticCatalog
+
+
+IDENTITY = {"host": "db1", "port": "3306", "version": "11.4.2", "user": "u@%"}
+VERSION = {
+    "version": "11.4.2-MariaDB",
+    "version_comment": "MariaDB Server",
+    "plugins": "50:1234",
+}
+
+
+def mock_executor():
+    executor = Mock()
+    executor.dbname = "test"
+    executor.keywords.return_value = ["select"]
+    executor.sql_functions.return_value = ["abs"]
+    executor.databases.return_value = ["test"]
+    executor.tables.return_value = [("t",)]
+    executor.table_columns.return_value = [("t", "a")]
+    executor.users.return_value = [("'u'@'%'",)]
+    executor.functions.return_value = []
+    executor.show_candidates.return_value = [("tables",)]
+    executor.database_tables.return_value = [("test", "t")]
+    executor.catalog.return_value = {
+        "databases": ["test"],
+        "tables": [("t",)],
+        "columns": [("t", "a")],
+        "functions": [],
+        "database_tables": [("test", "t")],
+        "users": [("'u'@'%'",)],
+    }
+    executor.global_variables.return_value = ["max_connections"]
+    executor.session_variables.return_value = ["sql_mode"]
+    return executor
+
+
+def test_catalogcache_saves_and_loads_the_catalog(tmp_path):
+    cache = CatalogCache(Mock(), str(tmp_path / "cache"), IDENTITY)
+    assert cache.load() is None
+
+    cache.save({"dbname": "test"})
+    assert cache.load() == {"dbname": "test"}
+
+    # Another server or user doesn't get the catalog
+    other = CatalogCache(Mock(), str(tmp_path / "cache"), {**IDENTITY, "port": "3307"})
+    assert other.path != cache.path
+    assert other.load() is None
+
+
+def test_catalogcache_ignores_broken_files(tmp_path):
+    cache = CatalogCache(Mock(), str(tmp_path), IDENTITY)
+    with open(cache.path, "wb") as file:
+        file.write(b"not gzip")
+
+    assert cache.load() is None
+
+
+def test_catalogcache_refresher_starts_from_the_saved_catalog(tmp_path):
+    cache = CatalogCache(Mock(), str(tmp_path), IDENTITY)
+    refresher = Refresher(
+        mock_executor(), Mock(), cache, StaticCatalog(Mock(), str(tmp_path), VERSION)
+    )
+    refresher.refresh()
+    saved = refresher.wait_for_results()
+
+    executor = mock_executor()
+    executor.schema_fingerprint.return_value = schema_fingerprint.local(saved)
+    refresher = Refresher(
+        executor, Mock(), cache, StaticCatalog(Mock(), str(tmp_path), VERSION)
+    )
+
+    # No query before the catalog can be used
+    assert refresher.complete
+    executor.keywords.assert_not_called()
+    executor.databases.assert_not_called()
+    completer = refresher.completer
+    assert completer.dbmetadata["tables"]["test"] == {"t": ["*", "a"]}
+    assert completer.database_tables == [("test", "t")]
+    assert completer.users == ["'u'@'%'"]
+    assert "select" in completer.keywords
+
+    # Only what isn't fingerprinted is fetched again
+    refresher.refresh(set(), [])
+    refresher.wait_for_results()
+    executor.users.assert_called_once()
+    executor.global_variables.assert_not_called()
+    executor.tables.assert_not_called()
+    executor.database_tables.assert_not_called()
+
+
+def test_catalogcache_static_catalog_is_shared_by_servers_of_a_version(tmp_path):
+    fetch = Mock(return_value=["select", "from"])
+    static = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    assert static.get("keywords", fetch) == ["select", "from"]
+    assert static.get("keywords", fetch) == ["select", "from"]
+    fetch.assert_called_once()
+
+    # Another kernel reads it from disk
+    other = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    assert other.get("keywords", Mock()) == ["select", "from"]
+
+    # but not for another version
+    fetch = Mock(return_value=["select"])
+    newer = StaticCatalog(Mock(), str(tmp_path), {**VERSION, "version": "11.8.1"})
+    assert newer.get("keywords", fetch) == ["select"]
+    fetch.assert_called_once()
+
+
+def test_catalogcache_static_catalog_refetches(tmp_path):
+    static = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    static.get("global_variables", Mock(return_value=["a"]))
+    assert static.refetch("global_variables", Mock(return_value=["a", "b"])) == [
+        "a",
+        "b",
+    ]
+
+    other = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    assert other.get("global_variables", Mock()) == ["a", "b"]
+
+    # A failed fetch isn't kept on disk
+    static.get("functions", Mock(return_value=[]))
+    fetch = Mock(return_value=["abs"])
+    assert other.get("functions", fetch) == ["abs"]
+
+
+def test_catalogcache_static_catalog_depends_on_the_plugins(tmp_path):
+    static = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    static.get("global_variables", Mock(return_value=["a"]))
+
+    # INSTALL PLUGIN on this server doesn't change the variables of the
+    # other servers of the same version
+    static.plugins_changed("51:5678")
+    assert static.refetch("global_variables", Mock(return_value=["a", "b"])) == [
+        "a",
+        "b",
+    ]
+    other = StaticCatalog(Mock(), str(tmp_path), VERSION)
+    assert other.get("global_variables", Mock()) == ["a"]
+    same = StaticCatalog(Mock(), str(tmp_path), {**VERSION, "plugins": "51:5678"})
+    assert same.get("global_variables", Mock()) == ["a", "b"]
@@ -124,3 +124,18 @@ def test_client_config_path():
 
     with patch.dict("os.environ", {"JUPYTER_CONFIG_DIR": "/test/"}):
         assert cfg._config_path() == "/test/mariadb_config.json"
+
+
+def test_client_config_connection_args():
+    cfg = ClientConfig(Mock(), name="nonexistentcfg.json")  # default config
+
+    # Just like the command line client, use the socket for localhost
+    args = cfg.get_connection_args()
+    assert args["unix_socket"] == cfg.default_config["socket"]
+    assert "host" not in args
+
+    cfg.default_config.update({"host": "127.0.0.1", "port": "3307"})
+    args = cfg.get_connection_args()
+    assert args["host"] == "127.0.0.1"
+    assert args["port"] == 3307
+    assert "unix_socket" not in args
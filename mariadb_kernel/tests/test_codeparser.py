@@ -28,7 +28,7 @@ def test_parser_throws_when_no_delimiter_found():
     CodeParser(Mock(), cell, ";")
 
 
-def test_parser_get_sql():
+def test_parser_separates_sql_and_magics():
     sql = "select * from mysql.user;"
     linemagic = "%line_magic arg1 arg2"
     cellmagic = "%%delimiter"
@@ -36,14 +36,14 @@ def test_parser_get_sql():
 
     # Single line SQL is parsed correctly
     parser = CodeParser(Mock(), sql, ";")
-    statements = parser.get_sql()
+    statements = parser.get_statements()
     assert len(statements) == 1
-    assert statements[0] == sql
+    assert statements[0].sql == sql.rstrip(";")
 
     # Line magics are only permitted as singular in the cell,
     # everything else below the line magic cmd is ignored
     parser = CodeParser(Mock(), linemagic + "\n" + sql, ";")
-    statements = parser.get_sql()
+    statements = parser.get_statements()
     magics = parser.get_magics()
     assert len(statements) == 0
     assert len(magics) == 1
@@ -51,7 +51,7 @@ def test_parser_get_sql():
     # Parser sees the cell magic and gets its inline arguments right,
     # and the rest of the cell is considered a code argument for the magic command
     parser = CodeParser(Mock(), cellmagic + " " + cellmagic_args + "\n" + sql, ";")
-    statements = parser.get_sql()
+    statements = parser.get_statements()
     magics = parser.get_magics()
     assert len(statements) == 0
     assert len(magics) == 1
@@ -63,6 +63,24 @@ def test_parser_get_sql():
     sql = """select user,host from mysql.user
             where user='robert';"""
     parser = CodeParser(Mock(), sql, ";")
-    statements = parser.get_sql()
+    statements = parser.get_statements()
     assert len(statements) == 1
-    assert statements[0] == sql
+    assert statements[0].sql == sql.rstrip(";")
+
+
+def test_parser_get_statements():
+    cell = """create procedure p() begin select 1; select 2; end;
+delimiter //
+select 3//"""
+    parser = CodeParser(Mock(), cell, ";")
+    statements = parser.get_statements()
+    assert [statement.sql for statement in statements] == [
+        "create procedure p() begin select 1; select 2; end",
+        "select 3",
+    ]
+    assert [statement.delimiter for statement in statements] == [";", "//"]
+
+    # The delimiter changed within the cell is the one expected at the end
+    with pytest.raises(ValueError) as e:
+        CodeParser(Mock(), "delimiter //\nselect 1;", ";")
+    assert "delimiter `//`" in str(e.value)
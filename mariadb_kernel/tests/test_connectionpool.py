@@ -0,0 +1,89 @@
+import pytest
+from unittest.mock import patch, Mock
+
+from ..client_config import ClientConfig
+from ..connection_pool import ConnectionPool, PooledClient, PoolTimeoutError
+
+
+def create_pool(**config):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    cfg.default_config.update(config)
+    return ConnectionPool(mocklog, cfg)
+
+
+@patch("mariadb_kernel.connection_pool.create_client")
+def test_connection_pool_reuses_checked_in_clients(create_client):
+    pool = create_pool()
+
+    client = pool.checkout("completion")
+    client.start.assert_called_once()
+    pool.checkin(client, "completion")
+
+    assert pool.checkout("introspection") is client
+    assert pool.open_clients() == 1
+
+
+@patch("mariadb_kernel.connection_pool.create_client")
+def test_connection_pool_enforces_quotas(create_client):
+    create_client.side_effect = lambda log, config: Mock()
+    pool = create_pool(pool_size="2", pool_quotas={"magics": "1"})
+
+    client = pool.checkout("magics")
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout("magics", timeout=0.1)
+
+    # Other subsystems can still get a client, up to the pool size
+    other = pool.checkout("completion")
+    assert other is not client
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout("completion", timeout=0.1)
+
+    pool.checkin(client, "magics")
+    assert pool.checkout("completion") is client
+
+
+@patch("mariadb_kernel.connection_pool.create_client")
+def test_connection_pool_pings_idle_clients(create_client):
+    pool = create_pool()
+    pool.HEALTH_CHECK_INTERVAL = 0
+
+    client = pool.checkout("completion")
+    pool.checkin(client, "completion")
+    pool.checkout("completion")
+
+    client.ping.assert_called_once()
+
+
+@patch("mariadb_kernel.connection_pool.create_client")
+def test_connection_pool_close_stops_clients(create_client):
+    create_client.side_effect = lambda log, config: Mock()
+    pool = create_pool()
+
+    idle = pool.checkout("completion")
+    busy = pool.checkout("magics")
+    pool.checkin(idle, "completion")
+
+    pool.close()
+    idle.stop.assert_called_once()
+    busy.stop.assert_not_called()
+
+    pool.checkin(busy, "magics")
+    busy.stop.assert_called_once()
+    assert pool.open_clients() == 0
+
+
+@patch("mariadb_kernel.connection_pool.create_client")
+def test_pooled_client_keeps_the_current_database(create_client):
+    client = Mock()
+    client.session.database = None
+    client.iserror.return_value = False
+    create_client.return_value = client
+    pool = create_pool()
+
+    pooled = PooledClient(pool, "completion")
+    pooled.run_statement("use test;")
+    pooled.run_statement("select 1;")
+
+    client.run_statement.assert_any_call("USE test;")
+    assert not pooled.iserror()
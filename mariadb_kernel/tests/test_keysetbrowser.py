@@ -0,0 +1,116 @@
+from unittest.mock import Mock
+
+import pytest
+
+from ..keyset_browser import BrowseError, KeysetBrowser, KeysetBrowsers, KeysetQuery
+from ..maria_magics.browse import Browse
+from ..result_set import decode_html
+
+
+def test_keyset_query_rewrites_the_select():
+    query = KeysetQuery("SELECT id, name FROM t WHERE a = 1 ORDER BY t.`id`;")
+    assert query.key == "id"
+    assert query.page(None, 10) == (
+        "SELECT * FROM (SELECT id, name FROM t WHERE a = 1) AS browsed "
+        "ORDER BY browsed.`id` ASC LIMIT 10;"
+    )
+    assert query.page("it's", 10) == (
+        "SELECT * FROM (SELECT id, name FROM t WHERE a = 1) AS browsed "
+        "WHERE browsed.`id` > 'it\\'s' ORDER BY browsed.`id` ASC LIMIT 10;"
+    )
+
+    query = KeysetQuery("select * from t order by id desc")
+    assert query.page("5", 2) == (
+        "SELECT * FROM (select * from t) AS browsed "
+        "WHERE browsed.`id` < '5' ORDER BY browsed.`id` DESC LIMIT 2;"
+    )
+
+    # Numbers aren't compared as strings, nor as DOUBLE
+    query = KeysetQuery("select * from t order by id")
+    assert query.page("18014398509481985", 2, numeric=True) == (
+        "SELECT * FROM (select * from t) AS browsed "
+        "WHERE browsed.`id` > 18014398509481985 ORDER BY browsed.`id` ASC LIMIT 2;"
+    )
+    assert "> '1; drop'" in query.page("1; drop", 2, numeric=True)
+
+    for code in [
+        "DELETE FROM t ORDER BY id",
+        "SELECT * FROM t ORDER BY id LIMIT 5",
+        "SELECT * FROM t JOIN u ON t.id = u.t_id ORDER BY t.id",
+    ]:
+        with pytest.raises(BrowseError):
+            KeysetQuery(code)
+
+
+def _key_type(name):
+    return f"<TABLE BORDER=1><TR><TH>type</TH></TR><TR><TD>{name}</TD></TR></TABLE>"
+
+
+def _page(keys):
+    rows = "".join(f"<TR><TD>{key}</TD><TD>x</TD></TR>" for key in keys)
+    return f"<TABLE BORDER=1><TR><TH>ID</TH><TH>v</TH></TR>{rows}</TABLE>"
+
+
+def test_keyset_browser_fetches_pages_after_the_last_key():
+    client = Mock()
+    client.iserror.return_value = False
+    client.decode.side_effect = decode_html
+    client.run_statement.side_effect = [
+        _page([1, 2]),
+        _key_type("INTEGER"),
+        _page([3]),
+        _page([3]),
+    ]
+
+    browsers = KeysetBrowsers(capacity=2, page_size=2)
+    browser = KeysetBrowser(client, KeysetQuery("SELECT * FROM t ORDER BY id"), 2)
+    browsers.add(browser)
+
+    reply = browsers.reply({"id": "r1", "browser": browser.id, "page": 0})
+    assert reply["rows"] == [["1", "x"], ["2", "x"]]
+    assert not reply["last"]
+
+    reply = browsers.reply({"id": "r2", "browser": browser.id, "page": 1})
+    assert "WHERE browsed.`id` > 2 " in client.run_statement.call_args[0][0]
+    assert reply["rows"] == [["3", "x"]]
+    assert reply["last"]
+
+    # Pages already read can be fetched again, the next ones only in order
+    browsers.reply({"id": "r3", "browser": browser.id, "page": 1})
+    assert "WHERE browsed.`id` > 2 " in client.run_statement.call_args[0][0]
+    assert "error" in browsers.reply({"id": "r4", "browser": browser.id, "page": 5})
+    assert "error" in browsers.reply({"id": "r5", "browser": "gone", "page": 0})
+
+
+def test_keyset_browser_reports_duplicate_columns():
+    client = Mock()
+    client.iserror.return_value = True
+    client.error_message.return_value = "ERROR 1060 (42S21): Duplicate column name 'id'"
+    browser = KeysetBrowser(client, KeysetQuery("SELECT * FROM t, u ORDER BY id"), 2)
+
+    with pytest.raises(BrowseError) as e:
+        browser.page(0)
+    assert "distinct names" in str(e.value)
+
+
+def test_keyset_browser_starts_after_the_given_key():
+    client = Mock()
+    client.iserror.return_value = False
+    client.decode.side_effect = decode_html
+    client.run_statement.side_effect = [_key_type("INTEGER"), _page([3, 4])]
+
+    query = KeysetQuery("SELECT * FROM t ORDER BY id")
+    browser = KeysetBrowser(client, query, 2, after="2")
+    result_set = browser.page(0)
+    assert "WHERE browsed.`id` > 2 " in client.run_statement.call_args[0][0]
+    assert result_set.values.values.tolist() == [["3", "x"], ["4", "x"]]
+    assert browser.last_keys == ["4"]
+
+
+def test_browse_magic_prints_the_next_page():
+    magic = Browse({"args": "50 after='it s'", "code": ""})
+    assert magic._parse_args(10) == (50, "it s")
+    assert Browse({"args": "", "code": ""})._parse_args(10) == (10, None)
+    with pytest.raises(ValueError):
+        Browse({"args": "fifty", "code": ""})._parse_args(10)
+    assert magic._next_page(50, "o'k") == "Next page: %%browse 50 after='o'\"'\"'k'"
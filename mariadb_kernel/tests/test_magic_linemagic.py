@@ -2,6 +2,8 @@ from unittest.mock import Mock, ANY
 from pandas import DataFrame
 
 from ..maria_magics.line_magic import LineMagic
+from ..result_history import ResultHistory
+from ..result_spill import SpilledResult
 
 
 def test_line_magic_generate_plot_detects_empty_dataframe():
@@ -64,3 +66,27 @@ def test_line_magic_generate_plot_sends_display_data():
     lm.generate_plot(mockkernel, data, "line")
 
     mockkernel.send_response.assert_called_once_with(ANY, "display_data", ANY)
+
+
+def test_line_magic_generate_plot_loads_spilled_result():
+    mockkernel = Mock()
+    lm = LineMagic()
+    lm.args = ""
+
+    data = {"last_select": SpilledResult(DataFrame([1, 1]))}
+    lm.generate_plot(mockkernel, data, "line")
+
+    mockkernel.send_response.assert_called_once_with(ANY, "display_data", ANY)
+
+
+def test_line_magic_generate_plot_sends_error_for_unknown_reference():
+    mockkernel = Mock()
+    lm = LineMagic()
+    lm.args = "Out[7] x=a"
+
+    data = {"last_select": DataFrame([1, 1]), "history": ResultHistory(10, 100)}
+    lm.generate_plot(mockkernel, data, "line")
+
+    mockkernel._send_message.assert_called_once_with(
+        "stderr", "Out[7] is not in the result history"
+    )
@@ -1,10 +1,17 @@
+import asyncio
+import os
 import pytest
+import re
+import sys
+import time
 from subprocess import check_output
 from unittest.mock import patch, Mock
 from threading import Thread
 
 from ..mariadb_client import (
+    _Batch,
     MariaDBClient,
+    MariaREPL,
     ServerIsDownError,
     LoginError,
 )
@@ -164,3 +171,470 @@ def test_cocurrent_execute_run_statement(mariadb_server):
     thread_1.start()
     thread_2.start()
     thread_1.join()
+
+
+def test_statements_are_sourced_from_a_single_scratch_file(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+
+    client.start()
+
+    statement_file = client.maria_repl.statement_file_path
+    assert not statement_file.startswith(os.getcwd())
+
+    client.run_statement("select 1;")
+    client.run_statement("select 2;")
+
+    # The file is reused between statements and only removed with the session
+    assert client.maria_repl.statement_file_path == statement_file
+    assert os.path.exists(statement_file)
+
+    client.stop()
+
+    assert not os.path.exists(statement_file)
+
+
+def test_mariadb_client_tsv_result_format(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    cfg.default_config.update({"result_format": "tsv"})
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+
+    client.start()
+
+    result = client.run_statement("select 1 as a, 'x\ty' as b, NULL as c;")
+    assert client.is_result_set(result)
+
+    frame = client.result_frames(result)[0]
+    assert list(frame.columns) == ["a", "b", "c"]
+    assert frame["b"][0] == "x\ty"
+    assert frame["c"].isna().all()
+
+    assert '<table border="1" class="mariadb-result">' in client.styled_result(result)
+
+    result = client.run_statement("select a from not_a_table;")
+    assert client.iserror()
+    assert not client.is_result_set(result)
+
+
+def test_mariadb_client_html_preview():
+    cfg = ClientConfig(Mock(), name="nonexistentcfg.json")
+    cfg.default_config.update({"stream_preview_rows": "2"})
+    client = MariaDBClient(Mock(), cfg)
+
+    assert "--quick" in client.cmd
+
+    partial = "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD>1</TD></TR><TR><TD>2"
+    assert client.preview(partial) == (
+        "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD>1</TD></TR></TABLE>",
+        1,
+    )
+
+    partial += "</TD></TR><TR><TD>3</TD></TR><TR>"
+    preview, rows = client.preview(partial)
+    assert rows == 3
+    assert preview.endswith("<TR><TD>2</TD></TR></TABLE>")
+
+
+def test_mariadb_client_styled_result():
+    client = MariaDBClient(Mock(), ClientConfig(Mock(), name="nonexistentcfg.json"))
+
+    result = "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD> 1</TD></TR></TABLE>"
+    styled = client.styled_result(result)
+    # One stylesheet for the whole table, the cells are left as they are
+    assert styled.startswith("<style>")
+    assert styled.count("<style>") == 1
+    assert "style=" not in styled
+    assert styled.endswith(
+        '<table border="1" class="mariadb-result">'
+        "<TR><TH>a</TH></TR><TR><TD> 1</TD></TR></TABLE>"
+    )
+
+    assert client.styled_result("Query OK") == "Query OK"
+
+
+def test_mariadb_client_reports_progress(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    cfg.default_config.update({"stream_preview_rows": "10"})
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+
+    client.start()
+
+    progress = []
+    result = client.run_statement(
+        "select seq from seq_1_to_2000000;",
+        on_progress=lambda preview, rows: progress.append((preview, rows)),
+    )
+
+    assert result.count("</TR>") == 2000001
+    for preview, rows in progress:
+        assert preview.count("</TR>") <= 11
+        assert rows <= 2000000
+
+
+def test_mariadb_client_ping_holds_the_session_lock():
+    client = MariaDBClient(Mock(), ClientConfig(Mock(), name="nonexistentcfg.json"))
+    client.maria_repl = Mock()
+    locked = []
+
+    def run_command(command):
+        # The keepalive timer can't ping at the same time from its thread
+        thread = Thread(
+            target=lambda: locked.append(not client.lock.acquire(blocking=False))
+        )
+        thread.start()
+        thread.join()
+        return ""
+
+    client.maria_repl.run_command.side_effect = run_command
+    client.ping()
+
+    assert locked == [True]
+
+
+def test_maria_repl_matches_the_prompt_as_a_pattern():
+    # A client whose prompt names the current database
+    script = "print('MariaDB [test]> ', end='', flush=True); input()"
+    repl = MariaREPL(
+        f'{sys.executable} -c "{script}"',
+        orig_prompt=re.compile(r"MariaDB \[.*\]>[ \t]"),
+        prompt_change=None,
+        continuation_prompt=None,
+    )
+    repl.child.close(force=True)
+    repl.close()
+
+
+def test_mariadb_client_cancel_needs_connection_id():
+    mocklog = Mock()
+    client = MariaDBClient(mocklog, ClientConfig(mocklog, name="nonexistentcfg.json"))
+
+    client.cancel()
+
+    mocklog.error.assert_any_call(
+        "Can't cancel the statement, the connection id is unknown"
+    )
+
+
+def test_mariadb_client_interrupt_kills_the_statement(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+    assert client.connection_id is not None
+
+    # Simulate the user interrupting the kernel while the query runs
+    def interrupted_run_command(command, *args, **kwargs):
+        client.maria_repl.sendline(f"source {client.maria_repl.statement_file_path}")
+        raise KeyboardInterrupt
+
+    with open(client.maria_repl.statement_file_path, "w") as f:
+        f.write("select sleep(60);")
+    with patch.object(client.maria_repl, "run_command", interrupted_run_command):
+        result = client.run_statement("select sleep(60);", timeout=30)
+
+    assert client.iserror()
+    assert client.isinterrupted()
+    assert result.endswith("Query execution was interrupted")
+
+    # The session is still usable afterwards
+    result = client.run_statement("select 1;")
+    assert not client.isinterrupted()
+    assert result == "<TABLE BORDER=1><TR><TH>1</TH></TR><TR><TD>1</TD></TR></TABLE>"
+
+
+def test_mariadb_client_interrupt_stops_the_batch(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+    client.run_statement("create database if not exists test;")
+    client.run_statement("create or replace table test.t(a int);")
+
+    # Interrupting the kernel while the second statement runs
+    def interrupt():
+        time.sleep(1)
+        client.interrupted = True
+        client.cancel()
+
+    thread = Thread(target=interrupt)
+    thread.start()
+    results = client.run_batch(
+        [
+            "insert into test.t values (1)",
+            "select sleep(60)",
+            "insert into test.t values (3)",
+        ],
+        timeout=30,
+    )
+    thread.join()
+
+    assert len(results) == 2
+    assert client.isinterrupted()
+    result = client.run_statement("select a from test.t;")
+    assert result == "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD>1</TD></TR></TABLE>"
+
+
+def test_mariadb_client_interrupted_batch_isnt_sent_again():
+    cfg = ClientConfig(Mock(), name="nonexistentcfg.json")
+    client = MariaDBClient(Mock(), cfg)
+    # The client gives up on the batch once a statement fails
+    assert "--abort-source-on-error" in client.cmd
+
+    client.maria_repl = Mock()
+    client.maria_repl.awaiting_prompt = False
+    client.connection_id = 7
+    batches = []
+
+    def run_command(command, *args, **kwargs):
+        if command.startswith("delimiter //"):
+            batches.append(command)
+            raise KeyboardInterrupt
+        return ""
+
+    def wait_for_prompt(timeout):
+        # The first statement ran, the second one was killed
+        markers = re.findall(r"^'(.*)' \\p \\c$", batches[0], re.MULTILINE)
+        printed = "--------------\r\n'{}' \r\n--------------\r\n\r\n"
+        return (
+            printed.format(markers[0])
+            + printed.format(markers[1])
+            + "ERROR 1317 (70100): Query execution was interrupted"
+        )
+
+    client.maria_repl.run_command.side_effect = run_command
+    client.maria_repl.wait_for_prompt.side_effect = wait_for_prompt
+    with patch.object(client, "cancel"):
+        results = client.run_batch(["insert 1", "select sleep(60)", "insert 3"])
+
+    assert len(batches) == 1
+    assert len(results) == 2
+    assert client.isinterrupted()
+
+
+def test_mariadb_client_timeout_keeps_the_session(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+    client.run_statement("set @a = 42;")
+    connection_id = client.connection_id
+
+    result = client.run_statement("select sleep(2) as a;", timeout=0.5)
+    assert client.iserror()
+    assert result.startswith("The statement didn't complete in time")
+
+    # Neither killed nor reconnected, the next statement waits for it
+    result = client.run_statement("select @a;")
+    assert client.connection_id == connection_id
+    assert result == "<TABLE BORDER=1><TR><TH>@a</TH></TR><TR><TD>42</TD></TR></TABLE>"
+
+
+def test_mariadb_client_run_statement_async(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+
+    async def run_statement():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.1)
+
+        # The event loop should keep running while the query does
+        ticker = asyncio.ensure_future(tick())
+        result = await client.run_statement_async("select sleep(1) as a;")
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run_statement())
+
+    assert result == "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD>0</TD></TR></TABLE>"
+    assert ticks >= 5
+
+
+def test_mariadb_client_reconnects_and_restores_the_session(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+    client.run_statement("create database if not exists test;")
+    client.run_statement("use test;")
+    client.run_statement("set @a = 42;")
+    client.run_statement("set @n = 1;")
+    client.run_statement("set @n = @n + 1;")
+    connection_id = client.connection_id
+
+    # The server drops the connection, e.g. because of wait_timeout
+    killer = MariaDBClient(mocklog, cfg)
+    killer.start()
+    killer.run_statement(f"kill {connection_id};")
+    killer.stop()
+
+    client.run_statement("select 1;")
+    assert client.connection_id != connection_id
+
+    result = client.run_statement("select database(), @a, @n;")
+    assert result == (
+        "<TABLE BORDER=1><TR><TH>database()</TH><TH>@a</TH><TH>@n</TH></TR>"
+        "<TR><TD>test</TD><TD>42</TD><TD>2</TD></TR></TABLE>"
+    )
+
+
+def test_mariadb_client_run_batch_restores_the_session():
+    client = MariaDBClient(Mock(), ClientConfig(Mock(), name="nonexistentcfg.json"))
+    client.maria_repl = Mock()
+    client.maria_repl.awaiting_prompt = False
+    commands = []
+
+    def run_command(command, *args, **kwargs):
+        commands.append(command)
+        if command.startswith("delimiter"):
+            # Every marker of the batch, the statements print nothing
+            markers = re.findall(r"^'(.*)' \\p \\c$", command, re.MULTILINE)
+            return "".join(
+                f"--------------\r\n'{marker}' \r\n--------------\r\n\r\n"
+                for marker in markers
+            )
+        if command.startswith("SELECT IF("):
+            return "<TABLE BORDER=1><TR><TH>x</TH></TR><TR><TD>5</TD></TR></TABLE>"
+        return ""
+
+    client.maria_repl.run_command.side_effect = run_command
+    client.run_batch(["use test", "set @x = 2 + 3", "select @x"])
+    assert client.session.variables == {"@x": 5}
+
+    # The connection is lost, the new session gets the value back
+    commands.clear()
+    with patch.object(client, "_launch_client"):
+        client._reconnect()
+    assert commands[1:] == ["USE test;", "SET @x = 5;"]
+
+
+def test_mariadb_client_run_batch(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+
+    errors = []
+    results = client.run_batch(
+        [
+            "create database if not exists test",
+            "use test",
+            "select 1 as a",
+            "select a from not_a_table",
+            "create or replace procedure p() begin select 2 as b; end",
+            "call p()",
+        ],
+        on_result=lambda result: errors.append(client.iserror()),
+    )
+    assert len(results) == 6
+    assert errors == [False, False, False, True, False, False]
+    assert results[2] == (
+        "<TABLE BORDER=1><TR><TH>a</TH></TR><TR><TD>1</TD></TR></TABLE>"
+    )
+    assert "doesn't exist" in results[3]
+    assert results[5].startswith("<TABLE BORDER=1><TR><TH>b</TH></TR>")
+    assert client.session.database == "test"
+
+    # The delimiter of the session is left as it was
+    result = client.run_statement("select 3 as c;")
+    assert result == ("<TABLE BORDER=1><TR><TH>c</TH></TR><TR><TD>3</TD></TR></TABLE>")
+
+
+def test_mariadb_client_run_batch_records_statement_metrics(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+
+    metrics = []
+    client.run_batch(
+        [
+            "create database if not exists test",
+            "create or replace table test.t(a int)",
+            "insert into test.t values (1), (2)",
+            "select * from test.t",
+        ],
+        on_result=lambda result: metrics.append(client.statement_metrics()),
+    )
+    assert len(metrics) == 4
+    assert metrics[3].bytes > 0
+    for statement in metrics:
+        assert statement.wall_time >= 0
+        # The client doesn't print them
+        assert statement.affected_rows is None
+        assert statement.server_time is None
+
+
+def test_mariadb_client_run_batch_keeps_the_diagnostics(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+
+    results = client.run_batch(
+        [
+            "create database if not exists test",
+            "create or replace table test.t(a int)",
+            "insert into test.t values (1), (2), (3)",
+            "update test.t set a = a + 1 where a > 1",
+            "select row_count() as changed",
+        ]
+    )
+    assert results[4] == (
+        "<TABLE BORDER=1><TR><TH>changed</TH></TR><TR><TD>2</TD></TR></TABLE>"
+    )
+
+
+def test_mariadb_client_batch_runs_nothing_between_the_statements():
+    batch = _Batch(["update t set a = 1", "select row_count()"])
+    lines = batch.script(";").splitlines()
+    assert lines[2] == f"update t set a = 1//{batch.marker}//"
+    assert lines[4] == f"select row_count()//{batch.marker}//"
+    # The markers are printed by the client, never sent to the server
+    for line in lines[1::2]:
+        assert line.endswith("\\p \\c")
+
+    printed = "--------------\r\n'{}:{}' \r\n--------------\r\n\r\n"
+    output = (
+        printed.format(batch.marker, "start")
+        + printed.format(batch.marker, 0)
+        + "<TABLE BORDER=1><TR><TH>row_count()</TH></TR>"
+        + "<TR><TD>1</TD></TR></TABLE>"
+        + printed.format(batch.marker, 1)
+    )
+    assert batch.completed(output) == [
+        "",
+        "<TABLE BORDER=1><TR><TH>row_count()</TH></TR><TR><TD>1</TD></TR></TABLE>",
+    ]
+    assert batch.pending(output) == ""
@@ -0,0 +1,42 @@
+from unittest.mock import Mock
+
+from ..client_config import ClientConfig
+from ..kernel import MariaDBKernel
+from ..result_cursor import MIME_TYPE, ResultCursors
+from ..result_set import decode_html
+
+
+def display_kernel():
+    # Only what displaying results needs, no client is started
+    kernel = MariaDBKernel.__new__(MariaDBKernel)
+    kernel.client_config = ClientConfig(Mock(), name="nonexistentcfg.json")
+    kernel.result_cursors = ResultCursors(10, 100)
+    return kernel
+
+
+def result_set(rows):
+    cells = "".join(f"<TR><TD>{i}</TD></TR>" for i in range(rows))
+    return decode_html(f"<TABLE BORDER=1><TR><TH>a</TH></TR>{cells}</TABLE>")[0]
+
+
+def test_kernel_displays_large_results_without_a_viewer():
+    kernel = display_kernel()
+
+    # More than a page, the whole result is still in the HTML
+    [data] = kernel._display_result("", [result_set(150)], [None])
+    assert data["text/html"].count("<tr>") == 151
+    assert data[MIME_TYPE]["cursors"][0]["total"] == 150
+
+    # Over max_display_rows, the first and last rows
+    [data] = kernel._display_result("", [result_set(1500)], [None])
+    assert data["text/html"].count("<tr>") == 1002
+    assert "<td>0</td>" in data["text/html"]
+    assert "<td>1499</td>" in data["text/html"]
+    assert "1500 rows in set, 500 rows in the middle are not displayed" in (
+        data["text/html"]
+    )
+    assert MIME_TYPE in data
+
+    # A page or less has no cursor
+    [data] = kernel._display_result("", [result_set(100)], [None])
+    assert MIME_TYPE not in data
@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from pymysql.constants import FIELD_TYPE, FLAG
+
+from ..mariadb_client import ServerIsDownError, LoginError
+from ..mariadb_native_client import MariaDBNativeClient, _column_types, html_table
+from ..client_config import ClientConfig
+from ..client_factory import create_client
+
+
+def test_html_table_renders_like_the_mysql_client():
+    assert (
+        html_table(["a", "b"], [(1, None), ("<x>", "y")])
+        == "<TABLE BORDER=1><TR><TH>a</TH><TH>b</TH></TR><TR><TD>1</TD>"
+        "<TD>NULL</TD></TR><TR><TD>&lt;x&gt;</TD><TD>y</TD></TR></TABLE>"
+    )
+
+
+def test_html_table_renders_binary_strings_like_the_mysql_client():
+    assert html_table(["b"], [(b"text",), (b"\xff\x00",)]) == (
+        "<TABLE BORDER=1><TR><TH>b</TH></TR><TR><TD>text</TD></TR>"
+        "<TR><TD>0xFF00</TD></TR></TABLE>"
+    )
+
+
+def test_mariadb_native_client_reads_enum_columns_from_flags():
+    fields = [
+        SimpleNamespace(type_code=FIELD_TYPE.STRING, flags=FLAG.ENUM),
+        SimpleNamespace(type_code=FIELD_TYPE.STRING, flags=FLAG.BINARY),
+        SimpleNamespace(type_code=FIELD_TYPE.LONGLONG, flags=FLAG.NOT_NULL),
+    ]
+    cursor = SimpleNamespace(_result=SimpleNamespace(fields=fields))
+
+    assert _column_types(cursor) == ["ENUM", "STRING", "LONGLONG"]
+
+
+def test_client_factory_selects_backend():
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+
+    assert type(create_client(mocklog, cfg)).__name__ == "MariaDBClient"
+
+    cfg.default_config.update({"client_backend": "native"})
+    assert type(create_client(mocklog, cfg)) == MariaDBNativeClient
+
+
+def test_mariadb_native_client_splits_statements():
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    client = MariaDBNativeClient(mocklog, cfg)
+
+    assert client._split("select 1; select ';';\n") == ["select 1", "select ';'"]
+
+    assert client.run_statement("delimiter //") == "Query OK"
+    assert client._split("create procedure p() begin select 1; end//") == [
+        "create procedure p() begin select 1; end"
+    ]
+
+
+def test_mariadb_native_client_raises_when_server_is_down():
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    cfg.default_config.update({"host": "127.0.0.1", "port": "1"})
+
+    client = MariaDBNativeClient(mocklog, cfg)
+
+    with pytest.raises(ServerIsDownError):
+        client.start()
+
+    mocklog.error.assert_any_call("MariaDB client failed to start")
+    mocklog.error.assert_any_call("Most probably the MariaDB server is not started")
+
+
+def test_mariadb_native_client_raises_when_credentials_are_wrong(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    mariadb_server(mocklog, cfg)
+
+    cfg.default_config.update({"user": "root", "password": "somewrongpassword"})
+    client = MariaDBNativeClient(mocklog, cfg)
+
+    with pytest.raises(LoginError):
+        client.start()
+
+
+def test_mariadb_native_client_run_statement(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBNativeClient(mocklog, cfg)
+    client.start()
+
+    result = client.run_statement("select 1;")
+    assert result == "<TABLE BORDER=1><TR><TH>1</TH></TR><TR><TD>1</TD></TR></TABLE>"
+    description, rows = client.result_sets[0]
+    assert description[0][0] == "1"
+    assert rows == ((1,),)
+
+    result = client.run_statement("select a from not_a_table;")
+    assert result.startswith("No database")
+    assert client.iserror()
+    assert result == client.error_message()
+
+    client.run_statement("create database if not exists test;")
+    result = client.run_statement("use test;")
+    assert result == "Query OK"
+    assert not client.iserror()
+
+    client.stop()
+
+
+def test_mariadb_native_client_run_statement_async(mariadb_server):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog, name="nonexistentcfg.json")  # default config
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBNativeClient(mocklog, cfg)
+    client.start()
+
+    result = asyncio.run(client.run_statement_async("select 1; select 2;"))
+
+    assert not client.iserror()
+    assert result == (
+        "<TABLE BORDER=1><TR><TH>1</TH></TR><TR><TD>1</TD></TR></TABLE>\n"
+        "<TABLE BORDER=1><TR><TH>2</TH></TR><TR><TD>2</TD></TR></TABLE>"
+    )
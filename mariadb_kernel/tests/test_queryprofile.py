@@ -0,0 +1,107 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+from pandas import DataFrame
+
+from ..maria_magics.profile import Profile
+from ..query_profile import breakdown, most_expensive, operations
+from ..result_set import Column, ResultSet
+
+PLAN = {
+    "query_block": {
+        "select_id": 1,
+        "r_loops": 1,
+        "r_total_time_ms": 10.0,
+        "filesort": {
+            "sort_key": "c.`name`",
+            "r_loops": 1,
+            "r_total_time_ms": 2.0,
+            "temporary_table": {
+                "nested_loop": [
+                    {
+                        "table": {
+                            "table_name": "o",
+                            "access_type": "ALL",
+                            "r_loops": 1,
+                            "rows": 1000,
+                            "r_rows": 5000,
+                            "r_table_time_ms": 6.0,
+                            "r_other_time_ms": 1.0,
+                            "filtered": 100,
+                            "r_filtered": 100,
+                        }
+                    },
+                    {
+                        "table": {
+                            "table_name": "c",
+                            "access_type": "eq_ref",
+                            "r_loops": 5000,
+                            "rows": 1,
+                            "r_rows": 1,
+                            "r_table_time_ms": 0.5,
+                            "r_other_time_ms": 0.1,
+                            "filtered": 100,
+                            "r_filtered": 50,
+                        }
+                    },
+                ]
+            },
+        },
+    }
+}
+
+
+def test_operations_flatten_the_plan():
+    found = operations(PLAN)
+    assert [(operation.name, operation.depth) for operation in found] == [
+        ("query_block #1", 0),
+        ("filesort", 1),
+        ("table o (ALL)", 2),
+        ("table c (eq_ref)", 2),
+    ]
+    assert found[2].estimated_rows == 1000
+    assert found[2].actual_rows == 5000
+    assert found[2].time_ms == 7.0
+    assert found[3].loops == 5000
+
+    # Query blocks are not highlighted, they hold everything else
+    assert most_expensive(found, 2) == [2, 1]
+
+    values = breakdown(found).values
+    assert values.iloc[2].tolist() == [
+        "    table o (ALL)",
+        "1",
+        "1000",
+        "5000",
+        "100.00",
+        "7.000",
+        "70.0",
+    ]
+
+
+def test_profile_magic_displays_the_breakdown():
+    analyze = ResultSet([Column("ANALYZE")], DataFrame([[json.dumps(PLAN)]]), 0)
+    kernel = Mock()
+    kernel.get_delimiter.return_value = ";"
+    kernel.mariadb_client.run_statement_async = AsyncMock(return_value="")
+    kernel.mariadb_client.iserror.return_value = False
+    kernel.mariadb_client.decode.return_value = [analyze]
+
+    magic = Profile({"args": "", "code": "select * from o join c;"})
+    asyncio.run(magic.execute(kernel, {}))
+
+    kernel.mariadb_client.run_statement_async.assert_awaited_once_with(
+        "ANALYZE FORMAT=JSON select * from o join c;", timeout=None
+    )
+    rendered = kernel._render_result.call_args
+    assert rendered.kwargs["highlight"] == [2, 1, 3]
+    kernel.send_response.assert_called_once()
+
+    kernel.reset_mock()
+    magic = Profile({"args": "", "code": "select 1; select 2;"})
+    asyncio.run(magic.execute(kernel, {}))
+    kernel._send_message.assert_called_once_with(
+        "stderr", "%%profile takes a cell holding a single statement"
+    )
+    kernel.mariadb_client.run_statement_async.assert_not_awaited()
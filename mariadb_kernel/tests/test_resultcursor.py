@@ -0,0 +1,90 @@
+from unittest.mock import Mock
+
+from ..result_cursor import ResultCursor, ResultCursors
+from ..result_set import decode_html
+from ..result_spill import SpilledResult
+
+
+def _result_set():
+    rows = "".join(
+        f"<TR><TD>{i}</TD><TD>{value}</TD></TR>"
+        for i, value in enumerate(["10", "9", "NULL", "100"])
+    )
+    return decode_html(f"<TABLE BORDER=1><TR><TH>i</TH><TH>v</TH></TR>{rows}</TABLE>")[
+        0
+    ]
+
+
+def test_result_cursor_pages():
+    result_set = _result_set()
+    for spilled in (None, SpilledResult(result_set.values)):
+        cursor = ResultCursor(result_set, spilled)
+        page = cursor.page(1, 2)
+        assert page == {"offset": 1, "total": 4, "rows": [["1", "9"], ["2", "NULL"]]}
+
+        # Numbers sort as numbers, NULLs come last
+        page = cursor.page(0, 4, sort=1)
+        assert [row[1] for row in page["rows"]] == ["9", "10", "100", "NULL"]
+        page = cursor.page(0, 2, sort=1, ascending=False)
+        assert [row[1] for row in page["rows"]] == ["100", "10"]
+
+        assert cursor.page(10, 2)["rows"] == []
+
+
+def test_result_cursors_reply_to_page_requests():
+    cursors = ResultCursors(capacity=2, page_size=3)
+    first = ResultCursor(_result_set())
+    cursors.add(first)
+
+    reply = cursors.reply({"id": "r1", "cursor": first.id})
+    assert reply["id"] == "r1"
+    assert reply["total"] == 4
+    assert len(reply["rows"]) == 3
+
+    reply = cursors.reply({"id": "r2", "cursor": first.id, "sort": 7})
+    assert "error" in reply
+
+    # Only the last cursors are kept
+    cursors.add(ResultCursor(_result_set()))
+    cursors.add(ResultCursor(_result_set()))
+    reply = cursors.reply({"id": "r3", "cursor": first.id})
+    assert "no longer available" in reply["error"]
+
+
+def test_result_cursors_read_only_the_spilled_pages():
+    cursors = ResultCursors(capacity=2, page_size=2)
+    first, second = (
+        ResultCursor(_result_set(), SpilledResult(_result_set().values, chunk_rows=2))
+        for _ in range(2)
+    )
+    cursors.add(first)
+    cursors.add(second)
+    reads = Mock(wraps=first.spilled._read_chunk)
+    first.spilled._read_chunk = reads
+
+    assert cursors.reply({"cursor": first.id, "offset": 2})["rows"] == [
+        ["2", "NULL"],
+        ["3", "100"],
+    ]
+    assert cursors.reply({"cursor": first.id, "offset": 2})["rows"]
+    reads.assert_called_once_with(1)
+
+    # Only the cursor browsed last keeps the rows it read in memory
+    cursors.reply({"cursor": second.id})
+    assert first.spilled._chunk is None
+    assert second.spilled._chunk is not None
+
+
+def test_result_cursors_serve_comms():
+    cursors = ResultCursors(capacity=2, page_size=2)
+    cursor = ResultCursor(_result_set())
+    cursors.add(cursor)
+
+    comm = Mock()
+    cursors.open_comm(comm, {"content": {"data": {}}})
+    comm.send.assert_not_called()
+
+    on_msg = comm.on_msg.call_args[0][0]
+    on_msg({"content": {"data": {"id": 1, "cursor": cursor.id, "offset": 2}}})
+    reply = comm.send.call_args[0][0]
+    assert reply["rows"] == [["2", "NULL"], ["3", "100"]]
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from ..result_history import ResultHistory, load, split_reference
+from ..result_set import LazyFrame, decode_html
+
+
+def _result(values):
+    rows = "".join(f"<TR><TD>{value}</TD></TR>" for value in values)
+    return LazyFrame(
+        decode_html(f"<TABLE BORDER=1><TR><TH>a</TH></TR>{rows}</TABLE>")[0]
+    )
+
+
+def test_split_reference():
+    assert split_reference("Out[12] x=a y=b") == ((12, None), "x=a y=b")
+    assert split_reference("x=a Out[3][1]") == ((3, 1), "x=a")
+    assert split_reference("x=a") == (None, "x=a")
+    assert split_reference("title=MyOut[1]") == (None, "title=MyOut[1]")
+
+
+def test_result_history_finds_results_of_cells():
+    history = ResultHistory(capacity=3, max_bytes=10**6)
+    history.add(1, 0, _result([1]))
+    history.add(2, 0, _result([2]))
+    history.add(2, 2, _result([3]))
+
+    data = {"last_select": _result([4]), "history": history}
+    assert load(data, "x=a")[0]["a"].tolist() == [4]
+    assert load(data, "Out[2] x=a")[0]["a"].tolist() == [3]
+    assert load(data, "Out[2][0]")[0]["a"].tolist() == [2]
+    with pytest.raises(LookupError):
+        load(data, "Out[2][1]")
+
+    # The least recently used result goes first
+    history.get(1)
+    history.add(3, 0, _result([5]))
+    with pytest.raises(LookupError):
+        history.get(2, 2)
+    assert load(data, "Out[2]")[0]["a"].tolist() == [2]
+
+
+def test_result_history_spills_to_disk():
+    history = ResultHistory(capacity=10, max_bytes=1)
+    first = _result([1, 2])
+    first.to_frame()
+    second = _result([3])
+    history.add(1, 0, first)
+    history.add(2, 0, second)
+
+    # Only the most recent result stays in memory
+    assert first.spilled is not None and os.path.exists(first.spilled.path)
+    assert second.spilled is None
+    assert history.size == second.size
+    assert first.to_frame()["a"].tolist() == [1, 2]
@@ -0,0 +1,85 @@
+from ..result_parser import (
+    decode,
+    is_result_set,
+    parse,
+    preview,
+)
+
+# Output of `select 1 as a, 'x' as b` with --column-type-info, as seen
+# through the client pty
+METADATA = (
+    "Field   1:  `a`\r\n"
+    "Catalog:    `def`\r\n"
+    "Database:   ``\r\n"
+    "Table:      ``\r\n"
+    "Org_table:  ``\r\n"
+    "Type:       LONGLONG\r\n"
+    "Collation:  binary (63)\r\n"
+    "Length:     1\r\n"
+    "Max_length: 1\r\n"
+    "Decimals:   0\r\n"
+    "Flags:      NOT_NULL BINARY NUM \r\n"
+    "\r\n"
+    "Field   2:  `b`\r\n"
+    "Catalog:    `def`\r\n"
+    "Database:   ``\r\n"
+    "Table:      ``\r\n"
+    "Org_table:  ``\r\n"
+    "Type:       VAR_STRING\r\n"
+    "Collation:  utf8mb4_general_ci (45)\r\n"
+    "Length:     4\r\n"
+    "Max_length: 1\r\n"
+    "Decimals:   39\r\n"
+    "Flags:      NOT_NULL \r\n"
+    "\r\n"
+)
+
+
+def test_parse_tab_separated_result():
+    output = METADATA + "a\tb\r\n1\tx\r\nNULL\ty\\tz\r\n3\t\r\n"
+
+    assert is_result_set(output)
+    assert not is_result_set("ERROR 1064 (42000)")
+    assert not is_result_set("Name: 'SELECT'")
+
+    frames = parse(output)
+    assert len(frames) == 1
+    frame = frames[0]
+    assert list(frame.columns) == ["a", "b"]
+    assert len(frame) == 3
+    assert frame["a"].isna().tolist() == [False, True, False]
+    assert frame["a"].sum() == 4
+    # Escaped tabs are decoded, empty strings are not NULL
+    assert frame["b"].tolist() == ["x", "y\tz", ""]
+
+
+def test_parse_multiple_and_empty_result_sets():
+    output = METADATA + "a\tb\r\n" + METADATA + "a\tb\r\n1\tx\r\n"
+
+    frames = parse(output)
+    assert len(frames) == 2
+    assert frames[0].empty
+    assert list(frames[0].columns) == ["a", "b"]
+    assert len(frames[1]) == 1
+
+
+def test_preview_of_partial_output():
+    # Nothing to show until the column names were received
+    assert preview(METADATA[:100], 2) == ("", 0)
+    assert preview(METADATA + "a\tb", 2) == ("", 0)
+
+    output = METADATA + "a\tb\r\n1\tx\r\n2\ty\r\n3\tz\r\n4\t"
+    cut, rows = preview(output, 2)
+    assert rows == 3
+    assert parse(cut)[0]["a"].tolist() == [1, 2]
+
+
+def test_decode_reads_enum_columns_from_flags():
+    metadata = METADATA.replace("Type:       VAR_STRING", "Type:       STRING")
+    metadata = metadata.replace(
+        "Flags:      NOT_NULL \r\n", "Flags:      NOT_NULL ENUM \r\n"
+    )
+    result_set = decode(metadata + "a\tb\r\n1\tx\r\n")[0]
+
+    assert [column.type for column in result_set.columns] == ["LONGLONG", "ENUM"]
+    assert result_set.to_frame()["b"].dtype == "category"
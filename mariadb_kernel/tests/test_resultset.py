@@ -0,0 +1,172 @@
+import json
+import os
+from decimal import Decimal
+from unittest.mock import patch
+from pandas import DataFrame
+
+from ..result_set import Column, LazyFrame, ResultSet, decode_html
+from ..result_parser import decode
+from ..result_spill import SpilledResult, load
+from .test_resultparser import METADATA
+
+
+def test_decode_html():
+    output = (
+        "<TABLE BORDER=1><TR><TH>a</TH><TH>b &amp; c</TH></TR>"
+        "<TR><TD>1</TD><TD>x &lt;y&gt;</TD></TR>"
+        "<TR><TD>NULL</TD><TD></TD></TR></TABLE>"
+        "<TABLE BORDER=1><TR><TH>d</TH></TR></TABLE>"
+    )
+    result_sets = decode_html(output)
+    assert len(result_sets) == 2
+
+    result_set = result_sets[0]
+    assert result_set.columns == [Column("a"), Column("b & c")]
+    assert len(result_set) == 2
+    # The values are kept as the client printed them
+    assert result_set.values.values.tolist() == [["1", "x <y>"], ["NULL", ""]]
+
+    frame = result_set.to_frame()
+    assert list(frame.columns) == ["a", "b & c"]
+    assert frame["a"].isna().tolist() == [False, True]
+    assert frame["a"].sum() == 1
+    assert frame["b & c"][0] == "x <y>"
+
+    assert len(result_sets[1]) == 0
+    assert result_sets[1].to_frame().empty
+
+
+def test_decode_tab_separated():
+    output = METADATA + "a\tb\r\n1\tx\r\nNULL\ty\\tz\r\n"
+    result_sets = decode(output)
+    assert len(result_sets) == 1
+    result_set = result_sets[0]
+    assert result_set.columns == [Column("a", "LONGLONG"), Column("b", "VAR_STRING")]
+    assert result_set.values.values.tolist() == [["1", "x"], ["NULL", "y\tz"]]
+    assert result_set.to_frame()["a"].sum() == 1
+
+
+def test_tab_separated_nulls_are_json_nulls():
+    output = METADATA + "a\tb\r\n1\tNULL\r\nNULL\ty\r\n"
+    data = decode(output)[0].to_dataresource()["data"]
+    assert data == [{"a": 1, "b": None}, {"a": None, "b": "y"}]
+    json.dumps(data, allow_nan=False)
+
+
+def test_result_set_to_html():
+    rows = "".join(f"<TR><TD>{i}</TD></TR>" for i in range(10))
+    result_set = decode_html(f"<TABLE BORDER=1><TR><TH>a</TH></TR>{rows}</TABLE>")[0]
+
+    html = result_set.to_html()
+    assert html.startswith('<table border="1" class="mariadb-result">')
+    assert html.count("<tr>") == 11
+    assert "style=" not in html
+
+    html = result_set.to_html(limit=4)
+    assert html.count("<tr>") == 5
+    assert "<td>3</td>" in html and "<td>4</td>" not in html
+
+
+def test_result_set_head_and_tail():
+    rows = "".join(f"<TR><TD>{i}</TD></TR>" for i in range(10))
+    result_set = decode_html(f"<TABLE BORDER=1><TR><TH>a</TH></TR>{rows}</TABLE>")[0]
+
+    cut = result_set.head_and_tail(5)
+    assert cut.values.iloc[:, 0].tolist() == ["0", "1", "2", "...", "8", "9"]
+    assert cut.columns == result_set.columns
+    assert result_set.head_and_tail(10) is result_set
+
+
+def test_lazy_frame_is_built_on_first_access():
+    rows = "".join(f"<TR><TD>{i}</TD></TR>" for i in range(3))
+    result_set = decode_html(f"<TABLE BORDER=1><TR><TH>a</TH></TR>{rows}</TABLE>")[0]
+
+    with patch.object(ResultSet, "to_frame", autospec=True) as to_frame:
+        to_frame.return_value = DataFrame({"a": [0, 1, 2]})
+        lazy = LazyFrame(result_set)
+        assert lazy.rows == 3
+        assert lazy.columns == ["a"]
+        assert not lazy.empty
+        to_frame.assert_not_called()
+
+        assert load(lazy) is load(lazy)
+        to_frame.assert_called_once()
+    # The decoded values are released once the frame is built
+    assert lazy.result_set is None
+
+
+def test_lazy_frame_spills_its_values():
+    rows = "".join(f"<TR><TD>{i}</TD><TD>NULL</TD></TR>" for i in range(3))
+    result_set = decode_html(
+        f"<TABLE BORDER=1><TR><TH>a</TH><TH>b</TH></TR>{rows}</TABLE>"
+    )[0]
+
+    lazy = LazyFrame(result_set, SpilledResult(result_set.values))
+    assert os.path.exists(lazy.spilled.path)
+    assert lazy.result_set.values is None
+
+    frame = load(lazy)
+    assert list(frame.columns) == ["a", "b"]
+    assert frame["a"].tolist() == [0, 1, 2]
+    assert frame["b"].isna().all()
+
+
+def test_result_set_to_text_and_dataresource():
+    rows = "<TR><TD>1</TD><TD>bob</TD></TR><TR><TD>10</TD><TD>NULL</TD></TR>"
+    result_set = decode_html(
+        f"<TABLE BORDER=1><TR><TH>id</TH><TH>name</TH></TR>{rows}</TABLE>"
+    )[0]
+
+    assert result_set.to_text() == (
+        "+----+------+\n"
+        "| id | name |\n"
+        "+----+------+\n"
+        "| 1  | bob  |\n"
+        "| 10 | NULL |\n"
+        "+----+------+"
+    )
+    assert result_set.to_text(limit=1).count("\n") == 4
+
+    assert result_set.to_dataresource() == {
+        "schema": {
+            "fields": [
+                {"name": "id", "type": "integer"},
+                {"name": "name", "type": "string"},
+            ]
+        },
+        "data": [{"id": 1, "name": "bob"}, {"id": 10, "name": None}],
+    }
+    assert len(result_set.to_dataresource(limit=1)["data"]) == 1
+
+
+def test_result_set_to_frame_uses_column_types():
+    columns = [
+        Column("id", "LONGLONG"),
+        Column("price", "NEWDECIMAL"),
+        Column("day", "DATE"),
+        Column("size", "ENUM"),
+        Column("code", "VAR_STRING"),
+        Column("ratio", "DOUBLE"),
+    ]
+    values = DataFrame(
+        [
+            ["9007199254740993", "0.10", "2021-03-04", "small", "007", "0.5"],
+            ["NULL", "NULL", "0000-00-00", "large", "NULL", "NULL"],
+        ],
+        dtype=object,
+    )
+    frame = ResultSet(columns, values, 0).to_frame()
+
+    assert str(frame["id"].dtype) == "Int64"
+    # No precision lost on ids past 2**53
+    assert frame["id"][0] == 9007199254740993
+    assert frame["id"].isna()[1]
+    assert frame["price"][0] == Decimal("0.10")
+    assert str(frame["day"].dtype).startswith("datetime64")
+    assert frame["day"].isna()[1]
+    assert frame["size"].dtype == "category"
+    # Strings that look like numbers stay strings
+    assert frame["code"][0] == "007"
+    assert frame["ratio"].dtype == "float64"
+
+    assert ResultSet(columns, values, 0).to_dataresource()["data"][0]["price"] == "0.10"
@@ -0,0 +1,43 @@
+import gc
+import os
+from pandas import DataFrame
+
+from ..result_spill import SpilledResult, load
+
+
+def test_spilled_result_is_loaded_back():
+    frame = DataFrame({"a": [1, 2, 3], "b": ["x", None, "z"]})
+
+    spilled = SpilledResult(frame)
+    assert os.path.exists(spilled.path)
+    assert spilled.rows == 3
+    assert spilled.columns == ["a", "b"]
+    assert not spilled.empty
+
+    assert load(spilled).equals(frame)
+    # DataFrames that were never spilled are returned as they are
+    assert load(frame) is frame
+
+
+def test_spilled_result_file_is_removed_with_the_result():
+    spilled = SpilledResult(DataFrame({"a": [1]}))
+    path = spilled.path
+
+    del spilled
+    gc.collect()
+
+    assert not os.path.exists(path)
+
+
+def test_spilled_result_reads_only_the_chunks_asked_for():
+    frame = DataFrame({"a": range(25)})
+    spilled = SpilledResult(frame, chunk_rows=10)
+
+    assert spilled.take([24, 3, 13]).values.tolist() == [[24], [3], [13]]
+    assert spilled.take([]).empty
+    assert spilled.column(0).equals(frame)
+    assert load(spilled).equals(frame)
+
+    spilled.release()
+    assert spilled.take([11, 12]).values.tolist() == [[11], [12]]
+    assert spilled._chunk[0] == 1
@@ -0,0 +1,64 @@
+from ..session_state import SessionState
+
+
+def test_session_state_tracks_database_and_variables():
+    state = SessionState()
+
+    state.track("use test;")
+    state.track("SET @a = 1, @b = concat('x,', @a);")
+    state.track("set session SQL_MODE = 'ANSI'")
+    state.track("SET @@session.max_statement_time=10;")
+    assert state.uncaptured() == ["@a", "@b", "@@sql_mode", "@@max_statement_time"]
+    state.captured(["1", "'x,1'", "'ANSI'", "10.000000"])
+    state.track("SET @a := @a + 1;")
+    assert state.uncaptured() == ["@a"]
+    # Nothing is replayed before its value is known
+    assert state.statements() == [
+        "USE test;",
+        "SET @b = 'x,1';",
+        "SET @@sql_mode = 'ANSI';",
+        "SET @@max_statement_time = 10.000000;",
+    ]
+    state.captured(["2"])
+
+    # The values are replayed, not the expressions they were set to
+    assert state.statements() == [
+        "USE test;",
+        "SET @a = 2;",
+        "SET @b = 'x,1';",
+        "SET @@sql_mode = 'ANSI';",
+        "SET @@max_statement_time = 10.000000;",
+    ]
+
+
+def test_session_state_capture_query_quotes_all_but_numbers():
+    state = SessionState()
+    assert state.capture_query() is None
+
+    state.track("SET @a = NOW(), @@sql_mode = 'ANSI';")
+    query = state.capture_query()
+    assert query.startswith("SELECT IF(@a IS NULL, 'NULL', IF(@a REGEXP ")
+    assert query.endswith(", @@sql_mode, QUOTE(@@sql_mode)))")
+
+
+def test_session_state_ignores_statements_not_changing_the_session():
+    state = SessionState()
+
+    state.track("select 1;")
+    state.track("SET GLOBAL max_connections = 10;")
+    state.track("SET @@global.max_connections = 10;")
+    state.track("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE;")
+    state.track("create procedure p() begin set @a = 1; end")
+
+    assert state.statements() == []
+
+
+def test_session_state_tracks_delimiter():
+    state = SessionState()
+
+    state.track("delimiter //")
+    state.track("use test//", delimiter=state.delimiter)
+    state.track("SET NAMES utf8mb4//", delimiter=state.delimiter)
+
+    assert state.delimiter == "//"
+    assert state.statements() == ["USE test;", "SET NAMES utf8mb4;"]
@@ -5,7 +5,9 @@ from ..mariadb_client import MariaDBClient
 from ..mariadb_server import MariaDBServer
 from ..client_config import ClientConfig
 
-from ..code_completion.sql_fetch import SqlFetch
+from ..code_completion.sql_fetch import CATALOG_SECTION, SqlFetch
+from ..mariadb_native_client import html_table
+from ..result_set import decode_html
 from unittest.mock import Mock
 
 import unittest
@@ -1298,3 +1300,69 @@ def test_mariadb_sql_fetch_get_specific_table_columns_list(
     assert set(["Host", "User", "Password"]).issubset(
         sql_fetch.get_specific_table_columns_list("user", "mysql")
     )
+
+
+def test_mariadb_sql_fetch_catalog(mariadb_server: Type[MariaDBServer]):
+    mocklog = Mock()
+    cfg = ClientConfig(mocklog)  # default config
+
+    mariadb_server(mocklog, cfg)
+
+    client = MariaDBClient(mocklog, cfg)
+    client.start()
+    client.run_statement("create database t1;")
+    client.run_statement("use t1;")
+    client.run_statement("create table table1(a int, b int);")
+    sql_fetch = SqlFetch(client, mocklog)
+
+    catalog = sql_fetch.catalog()
+
+    assert "t1" in catalog["databases"]
+    assert catalog["tables"] == [("table1",)]
+    assert catalog["columns"] == [("table1", "a"), ("table1", "b")]
+    # No functions in t1, the section is still found
+    assert catalog["functions"] == []
+    assert ("t1", "table1") in catalog["database_tables"]
+    assert set(catalog["users"]) == set(sql_fetch.users())
+    client.run_statement("drop database t1;")
+
+
+def test_mariadb_sql_fetch_catalog_decodes_the_sections():
+    sections = [
+        ("databases", ["Database"], [["test"], ["123"]]),
+        ("tables", ["Tables_in_test"], [["t"]]),
+        ("columns", ["TABLE_NAME", "COLUMN_NAME"], [["t", "a"], ["t", "b"]]),
+        # Empty result sets aren't printed by the client
+        ("functions", None, []),
+        ("database_tables", ["TABLE_SCHEMA", "TABLE_NAME"], [["test", "t"]]),
+        ("users", ["All_Users"], [["'root'@'localhost'"]]),
+    ]
+    output = ""
+    for name, columns, rows in sections:
+        output += html_table([CATALOG_SECTION], [[name]])
+        if columns:
+            output += html_table(columns, rows)
+
+    client = Mock()
+    client.iserror.return_value = False
+    client.decode = decode_html
+    client.result_frames = lambda result: [
+        result_set.to_frame() for result_set in decode_html(result)
+    ]
+    client.run_statement.side_effect = [
+        html_table(["DATABASE()"], [["test"]]),
+        output,
+    ]
+    sql_fetch = SqlFetch(client, Mock())
+
+    assert sql_fetch.catalog() == {
+        "databases": ["test", "123"],
+        "tables": [("t",)],
+        "columns": [("t", "a"), ("t", "b")],
+        "functions": [],
+        "database_tables": [("test", "t")],
+        "users": [("'root'@'localhost'",)],
+    }
+    # A single round trip
+    script = client.run_statement.call_args.args[0]
+    assert script.count(CATALOG_SECTION) == len(sections)
@@ -0,0 +1,218 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from ..code_completion import schema_fingerprint, statement_kind
+from ..code_completion.autocompleter import _FINGERPRINT_INTERVAL, Refresher
+from ..code_completion.statement_kind import classify
+
+
+def test_statementkind_reads_and_writes_change_nothing():
+    for sql in [
+        "SELECT * FROM t",
+        "select(1)",
+        "  -- a comment\n SHOW TABLES",
+        "INSERT INTO t VALUES (1)",
+        "UPDATE t SET a = 1",
+        "begin",
+        "SET @a = 1",
+        "SET GLOBAL max_connections = 10",
+        "CREATE INDEX i ON t (a)",
+    ]:
+        assert classify(sql).slices == frozenset(), sql
+
+    assert classify("SELECT 1").kind == statement_kind.READ_ONLY
+    assert classify("DELETE FROM t").kind == statement_kind.DML
+    assert classify("set names utf8").kind == statement_kind.SET
+
+
+def test_statementkind_table_ddl_lists_the_tables():
+    kind = classify("ALTER TABLE t ADD COLUMN b INT")
+    assert kind.kind == statement_kind.DDL
+    assert kind.slices == {statement_kind.TABLES}
+    assert kind.tables == ((None, "t"),)
+
+    assert classify("create or replace table `my t` (a int)").tables == (
+        (None, "my t"),
+    )
+    assert classify("DROP TABLE IF EXISTS a, db.b").tables == (
+        (None, "a"),
+        ("db", "b"),
+    )
+    assert classify("RENAME TABLE a TO b, c TO d").tables == (
+        (None, "a"),
+        (None, "b"),
+        (None, "c"),
+        (None, "d"),
+    )
+    assert classify("ALTER TABLE a RENAME TO b").tables == ((None, "a"), (None, "b"))
+    assert classify("ALTER TABLE a RENAME COLUMN x TO y").tables == ((None, "a"),)
+    assert classify("CREATE VIEW v AS SELECT 1").tables == ((None, "v"),)
+
+
+def test_statementkind_other_slices():
+    assert classify("USE test").slices == {statement_kind.CURRENT_DATABASE}
+    assert classify("DROP DATABASE d").slices == {statement_kind.DATABASES}
+    assert classify("ALTER DATABASE d CHARACTER SET utf8").slices == frozenset()
+    assert classify("CREATE FUNCTION f() RETURNS INT RETURN 1").slices == {
+        statement_kind.FUNCTIONS
+    }
+    assert classify("CREATE USER u").slices == {statement_kind.USERS}
+    assert classify("GRANT SELECT ON *.* TO u").kind == statement_kind.GRANT
+    assert classify("INSTALL SONAME 'ha_blackhole'").slices == {
+        statement_kind.VARIABLES,
+        statement_kind.FUNCTIONS,
+    }
+
+
+def test_statementkind_unknown_statements_refresh_everything():
+    for sql in ["CALL p()", "/*!40101 DROP TABLE t */", "EXECUTE stmt"]:
+        kind = classify(sql)
+        assert kind.kind == statement_kind.UNKNOWN
+        assert kind.slices == {statement_kind.ALL}
+
+
+def test_statementkind_affected_merges_the_statements():
+    slices, tables = statement_kind.affected(
+        ["ALTER TABLE t ADD b INT", "SELECT 1", "DROP TABLE t", "CREATE USER u"]
+    )
+    assert slices == {statement_kind.TABLES, statement_kind.USERS}
+    assert tables == [(None, "t")]
+
+
+def start_refresher():
+    executor = Mock()
+    executor.dbname = "test"
+    executor.keywords.return_value = []
+    executor.sql_functions.return_value = []
+    executor.databases.return_value = ["test"]
+    executor.tables.return_value = [("t",), ("u",)]
+    executor.table_columns.return_value = [("t", "a"), ("u", "b")]
+    executor.users.return_value = []
+    executor.functions.return_value = []
+    executor.show_candidates.return_value = []
+    executor.database_tables.return_value = [("test", "t"), ("test", "u")]
+    executor.catalog.return_value = {
+        "databases": ["test"],
+        "tables": [("t",), ("u",)],
+        "columns": [("t", "a"), ("u", "b")],
+        "functions": [],
+        "database_tables": [("test", "t"), ("test", "u")],
+        "users": [],
+    }
+    executor.global_variables.return_value = []
+    executor.session_variables.return_value = []
+    refresher = Refresher(executor, Mock())
+    refresher.refresh()
+    refresher.wait_for_results()
+    # Nothing changed on the server since
+    executor.schema_fingerprint.return_value = schema_fingerprint.local(
+        refresher.completer
+    )
+    return refresher, executor
+
+
+def test_statementkind_refresher_refreshes_only_the_changed_table():
+    refresher, executor = start_refresher()
+    executor.reset_mock()
+    executor.columns_of.return_value = [
+        ("test", "t", "a"),
+        ("test", "t", "c"),
+        ("test", "v", "x"),
+    ]
+
+    previous = refresher.completer
+    # The fingerprints of the server after the statements ran
+    executor.schema_fingerprint.return_value = schema_fingerprint.local(
+        SimpleNamespace(
+            dbname="test",
+            databases=["test"],
+            database_tables=[("test", "t"), ("test", "v")],
+            dbmetadata={
+                "tables": {"test": {"t": ["*", "a", "c"], "v": ["*", "x"]}},
+                "functions": {},
+            },
+        )
+    )
+    refresher.refresh({statement_kind.TABLES}, [(None, "t"), (None, "u"), (None, "v")])
+    completer = refresher.wait_for_results()
+
+    executor.columns_of.assert_called_once_with(
+        [("test", "t"), ("test", "u"), ("test", "v")]
+    )
+    executor.tables.assert_not_called()
+    executor.table_columns.assert_not_called()
+    executor.database_tables.assert_not_called()
+    relations = completer.dbmetadata["tables"]["test"]
+    assert relations == {"t": ["*", "a", "c"], "v": ["*", "x"]}
+    assert sorted(completer.database_tables) == [("test", "t"), ("test", "v")]
+    # The catalog in use isn't changed while it is refreshed
+    assert previous.dbmetadata["tables"]["test"] == {
+        "t": ["*", "a"],
+        "u": ["*", "b"],
+    }
+
+
+def test_statementkind_refresher_skips_statements_changing_nothing():
+    refresher, executor = start_refresher()
+    executor.reset_mock()
+
+    # The catalog was just loaded
+    refresher.refresh(set(), [])
+    refresher.wait_for_results()
+    executor.schema_fingerprint.assert_not_called()
+
+    refresher.checked_at -= _FINGERPRINT_INTERVAL
+    refresher.refresh(set(), [])
+    refresher.wait_for_results()
+    executor.schema_fingerprint.assert_called_once()
+
+    refresher.refresh({statement_kind.USERS}, [])
+    refresher.wait_for_results()
+
+    executor.users.assert_called_once()
+    executor.databases.assert_not_called()
+    executor.global_variables.assert_not_called()
+
+
+def test_statementkind_refresher_skips_slices_the_fingerprint_didnt_change():
+    refresher, executor = start_refresher()
+    executor.reset_mock()
+
+    # e.g. the ALTER TABLE failed
+    refresher.refresh({statement_kind.TABLES}, [(None, "t")])
+    refresher.wait_for_results()
+
+    executor.schema_fingerprint.assert_called_once()
+    executor.columns_of.assert_not_called()
+    executor.tables.assert_not_called()
+
+
+def test_statementkind_refresher_catches_changes_of_other_sessions():
+    refresher, executor = start_refresher()
+    executor.reset_mock()
+    executor.schema_fingerprint.return_value = {
+        **executor.schema_fingerprint.return_value,
+        schema_fingerprint.FUNCTIONS: "1:1234",
+    }
+    executor.functions.return_value = [("f",)]
+
+    # Even after cells changing nothing, once in a while
+    refresher.checked_at -= _FINGERPRINT_INTERVAL
+    refresher.refresh(set(), [])
+    completer = refresher.wait_for_results()
+
+    executor.functions.assert_called_once()
+    executor.tables.assert_not_called()
+    assert list(completer.dbmetadata["functions"]["test"]) == ["f"]
+
+
+def test_statementkind_refresher_without_fingerprint_follows_the_statements():
+    refresher, executor = start_refresher()
+    executor.reset_mock()
+    executor.schema_fingerprint.side_effect = Exception("access denied")
+    executor.columns_of.return_value = [("test", "t", "a")]
+
+    refresher.refresh({statement_kind.TABLES}, [(None, "t")])
+    refresher.wait_for_results()
+
+    executor.columns_of.assert_called_once_with([("test", "t")])
@@ -0,0 +1,28 @@
+from ..statement_metrics import StatementMetrics, summarize
+
+
+def test_statement_metrics_footer():
+    metrics = StatementMetrics(0.0123, 0.01, None, 2048, rows=3)
+    assert metrics.footer() == "3 rows in set (0.012 sec, server 0.010 sec, 2.0 KiB)"
+
+    metrics = StatementMetrics(0.5, affected_rows=1, bytes=0)
+    assert metrics.footer() == "Query OK, 1 row affected (0.500 sec, 0 bytes)"
+
+
+def test_summarize_statement_metrics():
+    assert summarize([]) is None
+
+    totals = summarize(
+        [
+            StatementMetrics(0.1, 0.05, None, 100, rows=2),
+            StatementMetrics(0.3, None, 4, 0),
+            StatementMetrics(0.2, 0.1, None, 50, rows=1),
+        ]
+    )
+    assert totals["statements"] == 3
+    assert round(totals["wall_time"], 3) == 0.6
+    assert round(totals["server_time"], 3) == 0.15
+    assert totals["affected_rows"] == 4
+    assert totals["rows"] == 3
+    assert totals["bytes"] == 150
+    assert totals["slowest_statement"] == 1
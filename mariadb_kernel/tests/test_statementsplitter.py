@@ -0,0 +1,90 @@
+from ..statement_splitter import split, Statement
+
+
+def test_split_statements():
+    split_code = split("select 1; select 2;\nselect 3;")
+    assert split_code.statements == [
+        Statement("select 1", ";"),
+        Statement("select 2", ";"),
+        Statement("select 3", ";"),
+    ]
+    assert split_code.remainder == ""
+    assert split_code.delimiter == ";"
+
+    # The code after the last delimiter is left over
+    split_code = split("select 1; select 2")
+    assert split_code.statements == [Statement("select 1", ";")]
+    assert split_code.remainder == "select 2"
+
+
+def test_split_ignores_delimiter_in_strings_and_comments():
+    code = """select 'a;b', "c;d", `e;f`, 'it''s;', 'x\\';y';
+    -- a comment; with a delimiter
+    # another one;
+    select /* ; */ 2;"""
+    split_code = split(code)
+    assert [statement.sql for statement in split_code.statements] == [
+        """select 'a;b', "c;d", `e;f`, 'it''s;', 'x\\';y'""",
+        "select /* ; */ 2",
+    ]
+    assert split_code.remainder == ""
+
+
+def test_split_keeps_begin_end_blocks_together():
+    procedure = """create procedure p()
+begin
+    declare i int default 0;
+    while i < 3 do
+        set i = i + 1;
+    end while;
+    select case when i = 3 then 'ok' else 'ko' end;
+end"""
+    split_code = split(f"{procedure};\ncall p();")
+    assert [statement.sql for statement in split_code.statements] == [
+        procedure,
+        "call p()",
+    ]
+
+    # BEGIN starting a transaction isn't a block
+    split_code = split("begin; insert into t values (1); begin work; commit;")
+    assert len(split_code.statements) == 4
+
+
+def test_split_tells_case_statements_from_case_expressions():
+    # The CASE statement ends with END CASE, the CASE expression in its
+    # ELSE branch with END
+    procedure = """create procedure p(i int)
+begin
+    case i
+        when 1 then select 'one';
+        else begin
+            select case when i > 1 then 'many' else 'none' end;
+        end;
+    end case;
+    select 'done';
+end"""
+    split_code = split(f"{procedure};\ncall p(1);")
+    assert [statement.sql for statement in split_code.statements] == [
+        procedure,
+        "call p(1)",
+    ]
+    assert split_code.remainder == ""
+
+
+def test_split_follows_delimiter_command():
+    code = """delimiter //
+create function f() returns int return 1//
+select f()//
+delimiter ;
+select 1;"""
+    split_code = split(code)
+    assert split_code.statements == [
+        Statement("create function f() returns int return 1", "//"),
+        Statement("select f()", "//"),
+        Statement("select 1", ";"),
+    ]
+    assert split_code.delimiter == ";"
+
+    split_code = split("delimiter $$\nselect 1$$", ";")
+    assert split_code.delimiter == "$$"
+    assert split_code.statements == [Statement("select 1", "$$")]